@@ -1,31 +1,59 @@
 import sqlite3
-import shutil
 from datetime import datetime
 import os
-import schedule
+import json
+import glob
+import hashlib
+import logging
+import threading
 import time
+from datetime import timedelta
 from tqdm import tqdm
 
-def backup_database():
-    print("\n=== Starting Database Backup Process ===")
+import logging_config
+import process_metrics
+
+BACKUP_DIR = "database_backups"
+BACKUP_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+METRICS_FILE = "backup_metrics.json"
+
+backup_duration = process_metrics.histogram('crm_backup_duration_seconds', 'Time to take one backup snapshot',
+                                            buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+backup_runs = process_metrics.counter('crm_backup_runs_total', 'Scheduled backup runs by outcome', ['outcome'])
+last_backup_success = process_metrics.gauge('crm_backup_last_success_timestamp_seconds',
+                                            'When the last successful backup finished, since the epoch')
+
+logger = logging.getLogger('crm.backup')
+
+# Grandfather-father-son retention: how many of the newest hourly/daily/weekly/monthly
+# buckets keep their latest snapshot. A backup survives if any tier keeps it.
+RETENTION_TIERS = {"hourly": 24, "daily": 7, "weekly": 4, "monthly": 12}
+
+# Rows inserted, updated or deleted, counted by triggers so thresholds work in WAL mode too
+CHANGE_TABLE = "backup_change_count"
+CHANGE_TRIGGER_PREFIX = "backup_count_"
+# Bookkeeping tables whose writes are not application changes
+UNCOUNTED_TABLES = (CHANGE_TABLE, "replication_log", "replication_state")
+
+def backup_database(db_path='crm.db', backup_dir=BACKUP_DIR, retention=None):
+    logger.info("Starting database backup", extra={'db_path': db_path})
     
     # Create backups directory if it doesn't exist
-    backup_dir = "database_backups"
     if not os.path.exists(backup_dir):
         os.makedirs(backup_dir)
-        print("✓ Created backup directory")
+        logger.info("Created backup directory", extra={'backup_dir': backup_dir})
     
     # Show spinning progress indicator for each step
     with tqdm(total=5, desc="Backup Progress") as pbar:
         # Generate backup filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime(BACKUP_TIMESTAMP_FORMAT)
         backup_file = os.path.join(backup_dir, f"crm_backup_{timestamp}.db")
         pbar.set_description("Initializing backup")
         pbar.update(1)
         
         try:
             # Connect to the source database
-            source_conn = sqlite3.connect('crm.db')
+            source_conn = sqlite3.connect(db_path)
             cursor = source_conn.cursor()
             pbar.set_description("Connected to source database")
             pbar.update(1)
@@ -33,16 +61,18 @@ def backup_database():
             # Get all table names and create backup file
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
             tables = cursor.fetchall()
-            shutil.copy2('crm.db', backup_file)
+            backup_conn = sqlite3.connect(backup_file)
+            source_conn.backup(backup_conn)  # Consistent even while the app is writing
+            change_count = read_change_count(backup_conn)  # As of the snapshot, not of the live database
             pbar.set_description("Created backup file")
             pbar.update(1)
             
             # Verify backup
-            backup_conn = sqlite3.connect(backup_file)
             backup_cursor = backup_conn.cursor()
             
             # Verify each table with nested progress bar
             pbar.set_description("Verifying tables")
+            table_counts = {}
             for table in tqdm(tables, desc="Table Verification", leave=False):
                 table_name = table[0]
                 cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
@@ -52,60 +82,471 @@ def backup_database():
                 
                 if source_count != backup_count:
                     raise ValueError(f"Backup verification failed for table {table_name}")
+                table_counts[table_name] = backup_count
             pbar.update(1)
             
+            source_conn.close()
+            backup_conn.close()
+            
+            # Record what was captured so restores can be chosen without opening each file
+            manifest = write_backup_manifest(backup_file, timestamp, table_counts, change_count)
+            
             # Clean up old backups
-            cleanup_old_backups(backup_dir, 7)
+            apply_retention(backup_dir, retention or RETENTION_TIERS)
             pbar.set_description("Cleaned up old backups")
             pbar.update(1)
             
-            source_conn.close()
-            backup_conn.close()
-            
             backup_size = os.path.getsize(backup_file) / (1024 * 1024)  # Convert to MB
-            print(f"\n✓ Backup completed successfully:")
-            print(f"  - File: {backup_file}")
-            print(f"  - Size: {backup_size:.2f} MB")
-            print(f"  - Tables backed up: {len(tables)}")
-            return True
+            logger.info("Backup completed", extra={'file': backup_file, 'size_mb': round(backup_size, 2),
+                                                   'tables': len(tables)})
+            manifest["path"] = backup_file
+            return manifest
             
         except Exception as e:
-            print(f"\n❌ Backup failed: {str(e)}")
+            logger.exception("Backup failed", extra={'file': backup_file})
             if os.path.exists(backup_file):
                 os.remove(backup_file)
+            if os.path.exists(manifest_path(backup_file)):
+                os.remove(manifest_path(backup_file))
             return False
 
+def manifest_path(backup_file):
+    """Return the path of the JSON manifest stored next to a backup file"""
+    return os.path.splitext(backup_file)[0] + ".json"
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in chunks so large databases are never read into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_backup_manifest(backup_file, timestamp, table_counts, change_count=None):
+    """Write the manifest describing a completed backup"""
+    manifest = {
+        "file": os.path.basename(backup_file),
+        "created_at": datetime.strptime(timestamp, BACKUP_TIMESTAMP_FORMAT).isoformat(),
+        "size_bytes": os.path.getsize(backup_file),
+        "sha256": file_sha256(backup_file),
+        "tables": table_counts,
+        "change_count": change_count,
+    }
+    with open(manifest_path(backup_file), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def read_backup_manifest(backup_file):
+    """Load a backup's manifest, falling back to what the filename tells us"""
+    path = manifest_path(backup_file)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    # Backups taken before manifests existed only carry their timestamp in the name
+    stem = os.path.splitext(os.path.basename(backup_file))[0]
+    created_at = datetime.strptime(stem[len("crm_backup_"):], BACKUP_TIMESTAMP_FORMAT)
+    return {
+        "file": os.path.basename(backup_file),
+        "created_at": created_at.isoformat(),
+        "size_bytes": os.path.getsize(backup_file),
+        "sha256": None,
+        "tables": None,
+        "change_count": None,
+    }
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Return the manifests of all snapshots in backup_dir, oldest first"""
+    backups = []
+    for backup_file in glob.glob(os.path.join(backup_dir, "crm_backup_*.db")):
+        try:
+            manifest = read_backup_manifest(backup_file)
+        except ValueError:
+            continue  # Not one of ours
+        manifest["path"] = backup_file
+        backups.append(manifest)
+    backups.sort(key=lambda m: m["created_at"])
+    return backups
+
+def select_backup(backup_dir=BACKUP_DIR, name=None, before=None):
+    """Pick a snapshot by file name, or the newest one taken at or before a timestamp"""
+    backups = list_backups(backup_dir)
+    if name:
+        for manifest in backups:
+            if manifest["file"] == os.path.basename(name):
+                return manifest
+        raise ValueError(f"No backup named {name} in {backup_dir}")
+
+    if before:
+        cutoff = before.isoformat() if isinstance(before, datetime) else datetime.fromisoformat(before).isoformat()
+        backups = [m for m in backups if m["created_at"] <= cutoff]
+    if not backups:
+        raise ValueError(f"No backup found in {backup_dir}" + (f" before {before}" if before else ""))
+    return backups[-1]
+
+def restore_database(backup_file, target_db='crm.db', allow_fk_violations=False):
+    """Restore a snapshot over target_db, verifying it before the swap.
+
+    The snapshot's sha256 is compared with its manifest, then it is copied with
+    the SQLite backup API into a temporary file next to target_db, checked with
+    integrity_check and foreign_key_check, and only then moved over target_db
+    with os.replace so readers never see a partial database. Returns a dict of
+    step timings in seconds.
+    """
+    logger.info("Restoring database", extra={'backup_file': backup_file, 'target_db': target_db})
+    timings = {}
+    started = time.perf_counter()
+    temp_db = target_db + ".restore"
+    if os.path.exists(temp_db):
+        os.remove(temp_db)
+
+    try:
+        # A damaged snapshot can still pass integrity_check; compare it with the hash taken at backup time
+        step = time.perf_counter()
+        expected = read_backup_manifest(backup_file)["sha256"] if os.path.exists(manifest_path(backup_file)) else None
+        if expected:
+            if file_sha256(backup_file) != expected:
+                raise ValueError(f"Checksum mismatch: {os.path.basename(backup_file)} does not match its manifest")
+            timings["checksum"] = time.perf_counter() - step
+            logger.info("Checksum matches manifest", extra={'seconds': round(timings['checksum'], 3)})
+        else:
+            logger.warning("No checksum recorded for %s, skipping the comparison", os.path.basename(backup_file))
+
+        source_conn = restore_conn = None
+        try:
+            # Copy page by page through the backup API instead of trusting a raw file copy
+            step = time.perf_counter()
+            source_conn = sqlite3.connect(f"file:{backup_file}?mode=ro", uri=True)
+            restore_conn = sqlite3.connect(temp_db)
+            with tqdm(desc="Copying pages", unit="page") as pbar:
+                def progress(status, remaining, total):
+                    pbar.total = total
+                    pbar.n = total - remaining
+                    pbar.refresh()
+                source_conn.backup(restore_conn, pages=1024, progress=progress)
+            timings["copy"] = time.perf_counter() - step
+            logger.info("Copied snapshot", extra={'seconds': round(timings['copy'], 3)})
+
+            # Verify the copy before it goes anywhere near the live database
+            step = time.perf_counter()
+            integrity = [row[0] for row in restore_conn.execute("PRAGMA integrity_check")]
+            timings["integrity_check"] = time.perf_counter() - step
+            if integrity != ["ok"]:
+                raise ValueError(f"Integrity check failed: {'; '.join(integrity[:5])}")
+            logger.info("Integrity check passed", extra={'seconds': round(timings['integrity_check'], 3)})
+
+            step = time.perf_counter()
+            violations = restore_conn.execute("PRAGMA foreign_key_check").fetchall()
+            timings["foreign_key_check"] = time.perf_counter() - step
+            if violations:
+                table, row_id, parent = violations[0][:3]
+                message = f"{len(violations)} foreign key violation(s), e.g. {table} row {row_id} -> {parent}"
+                if not allow_fk_violations:
+                    raise ValueError(message)
+                logger.warning("Restoring despite %s", message)
+            else:
+                logger.info("Foreign key check passed", extra={'seconds': round(timings['foreign_key_check'], 3)})
+        finally:
+            # Closed on every path; an open handle would keep the .restore file from being removed on Windows
+            for conn in (source_conn, restore_conn):
+                if conn is not None:
+                    conn.close()
+
+        # Atomically swap the verified copy in and drop journal files from the old database
+        step = time.perf_counter()
+        os.replace(temp_db, target_db)
+        for suffix in ("-wal", "-shm", "-journal"):
+            if os.path.exists(target_db + suffix):
+                os.remove(target_db + suffix)
+        timings["swap"] = time.perf_counter() - step
+
+        timings["total"] = time.perf_counter() - started
+        logger.info("Restore completed", extra={'seconds': round(timings['total'], 3)})
+        return timings
+
+    except Exception as e:
+        logger.error("Restore failed: %s", e, extra={'backup_file': backup_file})
+        if os.path.exists(temp_db):
+            os.remove(temp_db)
+        raise
+
+def remove_backup(backup_file):
+    """Delete a backup and its manifest"""
+    os.remove(backup_file)
+    if os.path.exists(manifest_path(backup_file)):
+        os.remove(manifest_path(backup_file))
+    logger.info("Removed old backup", extra={'file': os.path.basename(backup_file)})
+
 def cleanup_old_backups(backup_dir, days_to_keep):
     """Remove backups older than specified days"""
-    current_time = datetime.now()
-    for filename in os.listdir(backup_dir):
-        if filename.startswith("crm_backup_") and filename.endswith(".db"):
-            file_path = os.path.join(backup_dir, filename)
-            file_age = datetime.now() - datetime.fromtimestamp(os.path.getctime(file_path))
-            
-            if file_age.days > days_to_keep:
-                os.remove(file_path)
-                print(f"Removed old backup: {filename}")
+    cutoff = (datetime.now() - timedelta(days=days_to_keep)).isoformat()
+    for manifest in list_backups(backup_dir):
+        if manifest["created_at"] < cutoff:
+            remove_backup(manifest["path"])
 
-def schedule_backup():
-    """Schedule daily backup"""
-    schedule.every().day.at("00:00").do(backup_database)
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+# Bucket keys for each retention tier; snapshots sharing a key are redundant
+RETENTION_BUCKETS = {
+    "hourly": lambda t: t.strftime("%Y%m%d%H"),
+    "daily": lambda t: t.strftime("%Y%m%d"),
+    "weekly": lambda t: "%d-W%02d" % t.isocalendar()[:2],
+    "monthly": lambda t: t.strftime("%Y%m"),
+}
+
+def backups_to_keep(backups, tiers=RETENTION_TIERS):
+    """Return the paths a grandfather-father-son policy keeps.
+
+    For every tier the newest snapshot of each of its most recent buckets is
+    kept, e.g. hourly=24 keeps the last backup of each of the last 24 hours
+    that have one.
+    """
+    keep = set()
+    newest_first = sorted(backups, key=lambda m: m["created_at"], reverse=True)
+    for tier, count in tiers.items():
+        seen = set()
+        for manifest in newest_first:
+            if len(seen) >= count:
+                break
+            bucket = RETENTION_BUCKETS[tier](datetime.fromisoformat(manifest["created_at"]))
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(manifest["path"])
+    return keep
+
+def apply_retention(backup_dir=BACKUP_DIR, tiers=RETENTION_TIERS):
+    """Prune snapshots that no retention tier keeps"""
+    backups = list_backups(backup_dir)
+    keep = backups_to_keep(backups, tiers)
+    for manifest in backups:
+        if manifest["path"] not in keep:
+            remove_backup(manifest["path"])
+
+def install_change_count(conn):
+    """Count every row inserted, updated or deleted, and return the schema version now covered.
+
+    The change counter in the file header only moves in rollback-journal mode
+    and PRAGMA data_version only says that something was committed, so neither
+    tells how much changed. Triggers on every table add one per changed row to
+    a one-row table. Run again after a schema change so new tables are
+    counted; a schema change since the last run counts as one change.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} (
+                id INTEGER PRIMARY KEY CHECK(id = 1),
+                changes INTEGER NOT NULL,
+                schema_version INTEGER
+            )
+        ''')
+        conn.execute(f"INSERT OR IGNORE INTO {CHANGE_TABLE} (id, changes) VALUES (1, 0)")
+        counted_version = conn.execute(f"SELECT schema_version FROM {CHANGE_TABLE} WHERE id = 1").fetchone()[0]
+        schema_changed = counted_version is not None and \
+            counted_version != conn.execute("PRAGMA schema_version").fetchone()[0]
+
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        wanted = {f"{CHANGE_TRIGGER_PREFIX}{table}_{event.lower()}": (table, event)
+                  for (table,) in tables if table not in UNCOUNTED_TABLES
+                  for event in ("INSERT", "UPDATE", "DELETE")}
+        triggers = conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                                (CHANGE_TRIGGER_PREFIX + "%",))
+        existing = {row[0] for row in triggers}
+        for name in existing - set(wanted):
+            conn.execute(f'DROP TRIGGER "{name}"')
+        for name in set(wanted) - existing:
+            table, event = wanted[name]
+            conn.execute(f'''
+                CREATE TRIGGER "{name}" AFTER {event} ON "{table}"
+                BEGIN
+                    UPDATE {CHANGE_TABLE} SET changes = changes + 1 WHERE id = 1;
+                END
+            ''')
+
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        conn.execute(f"UPDATE {CHANGE_TABLE} SET changes = changes + ?, schema_version = ? WHERE id = 1",
+                     (1 if schema_changed else 0, schema_version))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return schema_version
+
+def read_change_count(conn):
+    """Return the rows changed since counting was installed, or None if it never was"""
+    try:
+        row = conn.execute(f"SELECT changes FROM {CHANGE_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+class BackupScheduler:
+    """Long-running backup service with tiered retention and change-triggered runs.
+
+    A snapshot is taken at the start of every hour (or every day at midnight
+    when no hourly tier is kept), skipped if no row changed since the previous
+    one, plus an extra snapshot as soon as change_threshold rows have been
+    inserted, updated or deleted (see install_change_count). Between runs the
+    thread sleeps until the next run is due, waking only every
+    change_poll_seconds to read the count when change-triggered runs are
+    enabled.
+    """
+
+    def __init__(self, db_path='crm.db', backup_dir=BACKUP_DIR, tiers=None,
+                 change_threshold=None, change_poll_seconds=30):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.tiers = tiers or RETENTION_TIERS
+        self.change_threshold = change_threshold
+        self.change_poll_seconds = change_poll_seconds
+        self.metrics = {
+            "runs": 0,
+            "skipped": 0,
+            "failures": 0,
+            "last_run": None,
+        }
+        self._stop = threading.Event()
+        self._conn = None
+        self._schema_version = None
+        self._last_count = None
+
+        backups = list_backups(backup_dir)
+        if backups:
+            self._last_count = backups[-1].get("change_count")
+
+    def next_scheduled_run(self, now):
+        """Return when the next regular backup is due"""
+        if self.tiers.get("hourly"):
+            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        return datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+    def pending_changes(self):
+        """Count rows changed since the last backup, or None if there is no backup to compare with"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if self._conn.execute("PRAGMA schema_version").fetchone()[0] != self._schema_version:
+            self._schema_version = install_change_count(self._conn)
+        count = read_change_count(self._conn)
+        if self._last_count is None:
+            return None  # Unknown history, treat as changed
+        return count - self._last_count
+
+    def run_backup(self, trigger):
+        """Take one snapshot unless nothing changed, and record metrics"""
+        changes = self.pending_changes()
+        if changes == 0:
+            self.metrics["skipped"] += 1
+            backup_runs.labels('skipped').inc()
+            logger.info("No changes since last backup, skipping run", extra={'trigger': trigger})
+            self.write_metrics()
+            return None
+
+        started = time.perf_counter()
+        manifest = backup_database(self.db_path, self.backup_dir, self.tiers)
+        duration = time.perf_counter() - started
+        backup_duration.observe(duration)
+
+        self.metrics["runs"] += 1
+        if manifest:
+            self._last_count = manifest.get("change_count")
+            backup_runs.labels('success').inc()
+            last_backup_success.set(time.time())
+        else:
+            self.metrics["failures"] += 1
+            backup_runs.labels('failure').inc()
+        self.metrics["last_run"] = {
+            "trigger": trigger,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_seconds": round(duration, 3),
+            "size_bytes": manifest["size_bytes"] if manifest else None,
+            "success": bool(manifest),
+        }
+        self.write_metrics()
+        return manifest
+
+    def write_metrics(self):
+        """Publish metrics as JSON in the backup directory for monitoring"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        path = os.path.join(self.backup_dir, METRICS_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.metrics, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def run_forever(self):
+        """Run until stop() is called"""
+        next_run = self.next_scheduled_run(datetime.now())
+        logger.info("Next scheduled backup at %s", next_run.isoformat(timespec='seconds'))
+        while not self._stop.is_set():
+            wait = (next_run - datetime.now()).total_seconds()
+            if self.change_threshold:
+                wait = min(wait, self.change_poll_seconds)
+            if wait > 0 and self._stop.wait(wait):
+                break
+
+            if datetime.now() >= next_run:
+                self.run_backup("scheduled")
+                next_run = self.next_scheduled_run(datetime.now())
+            elif self.change_threshold:
+                changes = self.pending_changes()
+                if changes is not None and changes >= self.change_threshold:
+                    self.run_backup(f"{changes} changes")
+
+    def stop(self):
+        self._stop.set()
+
+def schedule_backup(change_threshold=None):
+    """Run the backup service in the foreground"""
+    scheduler = BackupScheduler(change_threshold=change_threshold)
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        logger.info("Database backup service stopped")
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Database Backup Utility')
     parser.add_argument('--schedule', action='store_true', help='Run as scheduled service')
+    parser.add_argument('--change-threshold', type=int, metavar='N',
+                        help='With --schedule, take an extra backup once N rows have been inserted, '
+                             'updated or deleted')
     parser.add_argument('--manual', action='store_true', help='Run single manual backup')
+    parser.add_argument('--list', action='store_true', help='List available backups and their manifests')
+    parser.add_argument('--restore', nargs='?', const='', metavar='BACKUP_FILE',
+                        help='Restore a backup (defaults to the newest, see --before)')
+    parser.add_argument('--before', metavar='TIMESTAMP',
+                        help='With --restore, use the newest backup taken at or before this ISO timestamp')
+    parser.add_argument('--target', default='crm.db', help='Database file to restore into')
+    parser.add_argument('--allow-fk-violations', action='store_true',
+                        help='Restore even if foreign_key_check reports violations')
+    parser.add_argument('--metrics-port', type=int, default=process_metrics.METRICS_PORT,
+                        help='With --schedule, serve Prometheus metrics on this port (default: $CRM_METRICS_PORT)')
     
     args = parser.parse_args()
+    logging_config.configure_logging()
     
-    if args.schedule:
-        print("Database backup service started...")
-        schedule_backup()
+    if args.list:
+        backups = list_backups()
+        if not backups:
+            print("No backups found.")
+        for manifest in backups:
+            size = manifest["size_bytes"] / (1024 * 1024)
+            tables = manifest["tables"]
+            rows = sum(tables.values()) if tables else "?"
+            print(f"{manifest['file']}  {manifest['created_at']}  {size:.2f} MB  {rows} rows")
+    elif args.restore is not None:
+        try:
+            manifest = select_backup(name=args.restore or None, before=args.before)
+            timings = restore_database(manifest["path"], args.target, args.allow_fk_violations)
+        except ValueError as e:
+            print(f"Restore aborted: {e}")
+            raise SystemExit(1)
+        for step, seconds in timings.items():
+            print(f"  - {step}: {seconds:.3f}s")
+    elif args.schedule:
+        if args.metrics_port:
+            process_metrics.start_metrics_server(args.metrics_port)
+            logger.info("Serving metrics on http://%s:%s/metrics", process_metrics.METRICS_HOST, args.metrics_port)
+        logger.info("Database backup service started")
+        schedule_backup(args.change_threshold)
     else:  # Default to manual backup if no args provided
         print("Starting manual backup...")
         start_time = datetime.now()
@@ -0,0 +1,345 @@
+"""Benchmarks for the CRM data functions, tracked per git commit.
+
+    python benchmark_suite.py                        # small and medium scales
+    python benchmark_suite.py --scales large --functions get_budget_line_items
+    python benchmark_suite.py --set-baseline         # make this commit the one to beat
+
+Each scale is a database from generate_data (cached under
+CRM_BENCHMARK_DATA and rebuilt when the generator changes). Every function
+is called with a mix of typical and heaviest inputs (the budget with the
+most line items, the line item with the most expenses) and the timings are
+summarised as percentiles. Results are stored in CRM_BENCHMARK_RESULTS as
+JSON keyed by git commit, and the run fails (exit status 1) when a
+function's median has grown by more than --threshold over the baseline
+commit: the one marked with --set-baseline (the first clean run marks
+itself), or else the most recently recorded other commit. Runs with
+uncommitted changes are stored as <commit>-dirty, so a change can be
+measured against the commit it is based on before committing it.
+"""
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+import query_metrics
+from generate_data import DEFAULT_SEED, SCALES, generate_database
+from replicate_db import REPLICA_ENV_VAR
+
+RESULTS_PATH = os.environ.get('CRM_BENCHMARK_RESULTS', 'benchmark_results.json')
+DATA_DIR = os.environ.get('CRM_BENCHMARK_DATA', 'benchmark_data')
+DEFAULT_SCALES = ('small', 'medium')
+DEFAULT_REPEAT = 30
+MAX_SECONDS_PER_FUNCTION = 10.0  # Stop repeating a slow function once it has had this long
+MIN_SAMPLES = 3
+DEFAULT_THRESHOLD = 0.25  # Fail when the median grows by more than 25%...
+MIN_REGRESSION_MS = 0.5   # ...and by at least this much, so sub-millisecond jitter is not a regression
+PERCENTILES = {'p50': 0.50, 'p90': 0.90, 'p95': 0.95, 'p99': 0.99}
+SAMPLED_IDS = 50  # Typical inputs drawn per function, in addition to the heaviest one
+SEARCH_TERMS = ['Smith', 'ol', 'Nguyen', 'Papadopoulos', 'a', 'Zz']
+# Sources whose changes alter the generated databases
+GENERATOR_SOURCES = ('generate_data.py', 'setup_db.py')
+
+# Function to interpolate a percentile from sorted values
+def percentile(values, fraction):
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize(samples_ms):
+    """min/percentiles/max/mean in milliseconds of one function's timings"""
+    values = sorted(samples_ms)
+    summary = {'samples': len(values), 'min_ms': values[0]}
+    for name, fraction in PERCENTILES.items():
+        summary[f'{name}_ms'] = percentile(values, fraction)
+    summary['max_ms'] = values[-1]
+    summary['mean_ms'] = sum(values) / len(values)
+    return {name: round(value, 4) if isinstance(value, float) else value for name, value in summary.items()}
+
+# Function to return the database for a scale, generating it the first time
+def scale_database(scale, counts, data_dir=DATA_DIR, seed=DEFAULT_SEED):
+    digest = hashlib.sha256(json.dumps(counts, sort_keys=True).encode('utf-8'))
+    root = os.path.dirname(os.path.abspath(__file__))
+    for source in GENERATOR_SOURCES:
+        with open(os.path.join(root, source), 'rb') as f:
+            digest.update(f.read())
+    db_path = os.path.join(data_dir, f"{scale}_{seed}_{digest.hexdigest()[:12]}.db")
+    if not os.path.exists(db_path):
+        os.makedirs(data_dir, exist_ok=True)
+        # Older databases for this scale were built by a previous generator
+        for name in os.listdir(data_dir):
+            if name.startswith(f"{scale}_{seed}_") and name.endswith('.db'):
+                os.remove(os.path.join(data_dir, name))
+        print(f"Generating {scale} database...")
+        generate_database(db_path, counts, seed, progress=False)
+    return db_path
+
+def connect_read_only(db_path):
+    conn = query_metrics.connect(f'file:{db_path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# Function to pick the inputs each function is called with: a sample of typical ids plus the heaviest
+def benchmark_inputs(db_path, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        def ids(table, heaviest_sql):
+            count = conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0] or 0
+            sample = [rng.randint(1, count) for _ in range(SAMPLED_IDS)] if count else []
+            heaviest = conn.execute(heaviest_sql).fetchone()
+            return ([heaviest[0]] if heaviest else []) + sample  # First, so every run times it
+        inputs = {
+            'budget_ids': ids('budgets', '''
+                SELECT budget_id FROM budget_line_items GROUP BY budget_id ORDER BY COUNT(*) DESC LIMIT 1
+            '''),
+            'line_item_ids': ids('budget_line_items', '''
+                SELECT line_item_id FROM expenses GROUP BY line_item_id ORDER BY COUNT(*) DESC LIMIT 1
+            '''),
+            'search_terms': SEARCH_TERMS,
+        }
+        contact = conn.execute('''
+            SELECT c.name, c.email, c.phone, d.document_name, a.interest, a.reason, a.skillsets, s.image
+            FROM application_documents d
+            JOIN contacts c ON c.id = d.contact_id
+            JOIN applications a ON a.contact_id = c.id
+            JOIN signatures s ON s.hash = d.signature_hash
+            ORDER BY d.id LIMIT 1
+        ''').fetchone()
+        inputs['document'] = tuple(contact) if contact else (
+            'Jane Smith', 'jane.smith@example.com', '0987654321', 'Application Form 2',
+            'Web Developer', 'Want to build websites and web applications.', 'HTML, CSS, JavaScript', None)
+        return inputs
+    finally:
+        conn.close()
+
+# Function to build the benchmarked calls; each takes the sample index and cycles through its inputs
+def benchmark_functions(db_path, inputs, backup_dir):
+    from backup_db import backup_database
+    from crm_services.contacts import search_contacts
+    from pages import budget_line_items
+    from pages.document_generator import create_document
+
+    def pick(values, index):
+        return values[index % len(values)]
+
+    def search_contact_by_name(index):
+        # The contacts page runs this same query; importing the page would start its outbox worker
+        conn = connect_read_only(db_path)
+        try:
+            return search_contacts(conn, pick(inputs['search_terms'], index))
+        finally:
+            conn.close()
+
+    name, email, phone, document_name, interest, reason, skillsets, signature = inputs['document']
+    return {
+        'get_budget_line_items': lambda i: budget_line_items.get_budget_line_items(pick(inputs['budget_ids'], i)),
+        'get_budget_details': lambda i: budget_line_items.get_budget_details(pick(inputs['budget_ids'], i)),
+        'calculate_line_item_totals':
+            lambda i: budget_line_items.calculate_line_item_totals(pick(inputs['line_item_ids'], i)),
+        'get_line_item_expenses':
+            lambda i: budget_line_items.get_line_item_expenses(pick(inputs['line_item_ids'], i)),
+        'search_contact_by_name': search_contact_by_name,
+        'create_document': lambda i: create_document(name, email, phone, document_name, interest, reason, skillsets,
+                                                     signature, '2025-01-01 09:00:00'),
+        'backup_database': lambda i: backup_database(db_path, backup_dir),
+    }
+
+FUNCTIONS = ('get_budget_line_items', 'get_budget_details', 'calculate_line_item_totals', 'get_line_item_expenses',
+             'search_contact_by_name', 'create_document', 'backup_database')
+# Expensive at scale and dominated by disk speed; a few samples are enough
+REPEAT_LIMITS = {'backup_database': MIN_SAMPLES}
+
+# Function to time one function: a warm-up call, then up to repeat timed calls with the collector paused
+def time_function(call, repeat=DEFAULT_REPEAT, max_seconds=MAX_SECONDS_PER_FUNCTION):
+    call(0)
+    samples = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        deadline = time.perf_counter() + max_seconds
+        for index in range(repeat):
+            started = time.perf_counter()
+            call(index)
+            samples.append((time.perf_counter() - started) * 1000)
+            if len(samples) >= MIN_SAMPLES and started > deadline:
+                break
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+# Function to benchmark the functions against one database; returns a summary per function
+def run_scale(db_path, functions=FUNCTIONS, repeat=DEFAULT_REPEAT, max_seconds=MAX_SECONDS_PER_FUNCTION,
+              seed=DEFAULT_SEED):
+    from pages import budget_line_items
+    inputs = benchmark_inputs(db_path, seed)
+    backup_dir = tempfile.mkdtemp(prefix='crm_benchmark_backups_')
+    opener = lambda: connect_read_only(db_path)
+    results = {}
+    try:
+        # The page functions open their own connections; point them at this scale's database, not a replica
+        with mock.patch.object(budget_line_items, 'get_db_connection', opener), \
+                mock.patch.dict(os.environ, {REPLICA_ENV_VAR: ''}):
+            calls = benchmark_functions(db_path, inputs, backup_dir)
+            for name in functions:
+                samples = time_function(calls[name], min(repeat, REPEAT_LIMITS.get(name, repeat)), max_seconds)
+                results[name] = summarize(samples)
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    return results
+
+def git_commit():
+    """(commit hash, whether tracked files have uncommitted changes), or ('unknown', False) outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return {'baseline': None, 'runs': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_results(results, path=RESULTS_PATH):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def run_key(commit, dirty):
+    """Runs with uncommitted changes are kept apart from the commit's own, so they can be compared with it"""
+    return f"{commit}-dirty" if dirty else commit
+
+# Function to add a run's results under its commit, keeping scales measured by earlier runs of the same commit
+def record_run(results, commit, dirty, scale_results, seed=DEFAULT_SEED):
+    run = results['runs'].setdefault(run_key(commit, dirty), {'results': {}})
+    run.update({
+        'commit': commit,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'dirty': dirty,
+        'seed': seed,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    })
+    for scale, functions in scale_results.items():
+        run['results'].setdefault(scale, {}).update(functions)
+    return run
+
+def find_baseline(results, key, baseline=None):
+    """The run to compare against: the given commit, the marked baseline, the clean run of a dirty
+    run's commit, or else the latest other committed run"""
+    runs = results['runs']
+    if baseline:
+        matches = [other for other in runs if other.startswith(baseline) and not other.endswith('-dirty')]
+        if len(matches) != 1:
+            raise ValueError(f"Baseline {baseline!r} matches {len(matches)} recorded commits")
+        return matches[0]
+    if results.get('baseline') in runs and results['baseline'] != key:
+        return results['baseline']
+    if key.endswith('-dirty') and key[:-len('-dirty')] in runs:
+        return key[:-len('-dirty')]
+    others = [(run['recorded_at'], other) for other, run in runs.items()
+              if other != key and not other.endswith('-dirty')]
+    return max(others)[1] if others else None
+
+# Function to compare a run with the baseline; returns one row per function measured by both
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD, metric='p50'):
+    rows = []
+    key = f'{metric}_ms'
+    for scale, functions in current.items():
+        for name, summary in functions.items():
+            before = baseline.get(scale, {}).get(name)
+            if not before:
+                continue
+            change = summary[key] / before[key] - 1 if before[key] else 0.0
+            rows.append({
+                'scale': scale,
+                'function': name,
+                'baseline_ms': before[key],
+                'current_ms': summary[key],
+                'change': change,
+                'regressed': change > threshold and summary[key] - before[key] >= MIN_REGRESSION_MS,
+            })
+    return rows
+
+if __name__ == "__main__":
+    import argparse
+    import logging_config
+    parser = argparse.ArgumentParser(description='CRM Data Function Benchmarks')
+    parser.add_argument('--scales', nargs='+', choices=SCALES, default=list(DEFAULT_SCALES),
+                        help='Data scales to run (default: small medium)')
+    parser.add_argument('--functions', nargs='+', choices=FUNCTIONS, default=list(FUNCTIONS),
+                        help='Only benchmark these functions')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed calls per function')
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS_PER_FUNCTION,
+                        help='Stop repeating a function after this long (it still gets at least 3 calls)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed for the generated data and inputs')
+    parser.add_argument('--results', default=RESULTS_PATH, help='JSON file holding results by commit')
+    parser.add_argument('--baseline', metavar='COMMIT', help='Compare against this commit (a prefix is enough)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative slowdown before failing (default: 0.25)')
+    parser.add_argument('--metric', choices=PERCENTILES, default='p50', help='Percentile compared with the baseline')
+    parser.add_argument('--set-baseline', action='store_true', help='Mark this commit as the baseline')
+    parser.add_argument('--no-save', action='store_true', help="Don't record this run")
+
+    args = parser.parse_args()
+    logging_config.configure_logging(level='WARNING')  # Keep backup progress records out of the report
+
+    commit, dirty = git_commit()
+    scale_results = {}
+    for scale in args.scales:
+        db_path = scale_database(scale, SCALES[scale], seed=args.seed)
+        scale_results[scale] = run_scale(db_path, args.functions, args.repeat, args.max_seconds, args.seed)
+        print(f"\n{scale} ({os.path.basename(db_path)})")
+        print(f"  {'function':<28}{'n':>4}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+        for name, summary in scale_results[scale].items():
+            print(f"  {name:<28}{summary['samples']:>4}{summary['p50_ms']:>11.2f}{summary['p95_ms']:>11.2f}"
+                  f"{summary['p99_ms']:>11.2f}{summary['max_ms']:>11.2f}")
+
+    results = load_results(args.results)
+    try:
+        baseline = find_baseline(results, run_key(commit, dirty), args.baseline)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+
+    regressions = []
+    if baseline:
+        rows = compare_results(scale_results, results['runs'][baseline]['results'], args.threshold, args.metric)
+        print(f"\nCompared with {baseline[:12]} ({args.metric}, threshold {args.threshold:.0%})")
+        for row in rows:
+            mark = '❌' if row['regressed'] else '✓'
+            print(f"  {mark} {row['scale']:<8}{row['function']:<28}{row['baseline_ms']:>10.2f} ->"
+                  f"{row['current_ms']:>10.2f} ms  {row['change']:+.1%}")
+        regressions = [row for row in rows if row['regressed']]
+    else:
+        print("\nNo other run recorded to compare with")
+
+    if not args.no_save:
+        record_run(results, commit, dirty, scale_results, args.seed)
+        if args.set_baseline or (results.get('baseline') is None and not dirty):
+            results['baseline'] = run_key(commit, dirty)
+        save_results(results, args.results)
+        print(f"✓ Saved results for {commit[:12]}{' with uncommitted changes' if dirty else ''} to {args.results}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} function(s) regressed beyond {args.threshold:.0%}")
+        sys.exit(1)
@@ -0,0 +1,67 @@
+import sqlite3
+from io import BytesIO, RawIOBase
+
+# Large enough to amortise per-call overhead, small enough to keep memory flat
+CHUNK_SIZE = 64 * 1024
+
+class SubstrBlobReader(RawIOBase):
+    """Read-only file object over a BLOB using substr() for SQLite builds or
+    Python versions without incremental blob I/O (Connection.blobopen is 3.11+)."""
+
+    def __init__(self, conn, table, column, rowid):
+        self._conn = conn
+        self._query = f'SELECT substr("{column}", ?, ?) FROM "{table}" WHERE rowid = ?'
+        self._rowid = rowid
+        self._position = 0
+        row = conn.execute(f'SELECT length("{column}") FROM "{table}" WHERE rowid = ?', (rowid,)).fetchone()
+        if row is None or row[0] is None:
+            raise ValueError(f"No {table}.{column} blob at rowid {rowid}")
+        self._length = row[0]
+
+    def readable(self):
+        return True
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        size = min(size, self._length - self._position)
+        if size <= 0:
+            return b""
+        # substr() on a BLOB counts bytes from 1
+        chunk = self._conn.execute(self._query, (self._position + 1, size, self._rowid)).fetchone()[0]
+        self._position += len(chunk)
+        return bytes(chunk)
+
+def open_blob(conn, table, column, rowid):
+    """Open a BLOB for chunked reading with incremental blob I/O where available"""
+    if hasattr(conn, 'blobopen'):
+        return conn.blobopen(table, column, rowid, readonly=True)
+    return SubstrBlobReader(conn, table, column, rowid)
+
+def iter_blob(conn, table, column, rowid, chunk_size=CHUNK_SIZE):
+    """Yield a BLOB in chunks without materialising it in Python"""
+    with open_blob(conn, table, column, rowid) as blob:
+        while True:
+            chunk = blob.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def read_blob(conn, table, column, rowid, chunk_size=CHUNK_SIZE):
+    """Read a whole BLOB into a BytesIO, filled chunk by chunk"""
+    buffer = BytesIO()
+    for chunk in iter_blob(conn, table, column, rowid, chunk_size):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+def copy_blob(conn, table, column, rowid, destination, chunk_size=CHUNK_SIZE):
+    """Stream a BLOB into a writable file object; returns the number of bytes copied"""
+    copied = 0
+    for chunk in iter_blob(conn, table, column, rowid, chunk_size):
+        destination.write(chunk)
+        copied += len(chunk)
+    return copied
@@ -0,0 +1,31 @@
+"""Headless CRM data operations.
+
+Every function takes an open sqlite3 connection (see crm_services.db.connect)
+and returns plain dicts, so batch jobs, the CLI (python -m crm_services) and
+the Streamlit pages share one implementation without importing Streamlit.
+crm_services.api serves the same operations as a local JSON HTTP API.
+"""
+from crm_services.db import (
+    DB_PATH, ServiceError, ValidationError, NotFoundError, connect, read_connection
+)
+from crm_services.contacts import (
+    is_valid_email, list_contacts, count_contacts, get_contact, search_contacts,
+    create_contact, create_contacts, update_contact, delete_contact
+)
+from crm_services.budgets import (
+    list_budgets, count_budgets, get_budget, create_budget, create_budgets, update_budget, delete_budget,
+    get_budget_details, budget_tree, budget_trees
+)
+from crm_services.line_items import (
+    list_line_items, count_line_items, get_line_item, create_line_item, create_line_items, update_line_item,
+    delete_line_item, validate_budget_allocation, line_item_totals, line_item_dashboard
+)
+from crm_services.products import (
+    list_products, count_products, get_product, create_product, create_products, update_product, delete_product
+)
+from crm_services.expenses import list_expenses, count_expenses, get_expense, add_expense, add_expenses
+from crm_services.applications import (
+    list_applications, count_applications, get_application, create_application, create_applications
+)
+from crm_services.documents import list_documents, count_documents, get_document
+from crm_services.resources import RESOURCES
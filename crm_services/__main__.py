@@ -0,0 +1,111 @@
+"""Command line access to the CRM data without Streamlit.
+
+    python -m crm_services contacts list --limit 20
+    python -m crm_services budgets list --parent 3
+    python -m crm_services contacts create --data '{"name": "Ada", ...}'
+    python -m crm_services expenses create --file expenses.jsonl
+    python -m crm_services budgets update 4 --data '{"status": "Completed"}'
+    python -m crm_services contacts update 7 --file changes.json
+    python -m crm_services budgets tree --parent 3
+
+Records are printed as JSON lines. --file takes a JSON array or JSON lines
+('-' reads stdin) and is inserted in a single transaction.
+"""
+import argparse
+import json
+import sys
+import time
+
+from crm_services.db import DB_PATH, ServiceError, check_fields, connect, read_connection
+from crm_services.resources import RESOURCES
+
+def load_records(args):
+    if args.data:
+        data = json.loads(args.data)
+        return data if isinstance(data, list) else [data]
+    source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+    with source:
+        text = source.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def print_records(records):
+    for record in records:
+        print(json.dumps(record, default=str))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m crm_services', description='CRM Data Command Line')
+    parser.add_argument('resource', choices=sorted(RESOURCES), help='Kind of record')
+    parser.add_argument('action', choices=['list', 'count', 'get', 'create', 'update', 'delete', 'tree'])
+    parser.add_argument('id', nargs='?', type=int, help='Record id for get, update, delete and tree')
+    parser.add_argument('--parent', type=int, help='Filter listings by contact, budget or line item id')
+    parser.add_argument('--limit', type=int, help='Maximum records to list')
+    parser.add_argument('--offset', type=int, default=0, help='Records to skip when listing')
+    parser.add_argument('--data', help='JSON object (or array) of fields for create and update')
+    parser.add_argument('--file', help="JSON array or JSON lines file of records to create ('-' for stdin)")
+    parser.add_argument('--db', help='Database to use (default: $CRM_DB or crm.db)')
+
+    args = parser.parse_args(argv)
+    resource = RESOURCES[args.resource]
+    if args.action not in resource:
+        parser.error(f"{args.resource} do not support {args.action}")
+    if args.action in ('get', 'update', 'delete') and args.id is None:
+        parser.error(f"{args.action} needs a record id")
+    if args.action in ('create', 'update') and not (args.data or args.file):
+        parser.error(f"{args.action} needs --data or --file")
+
+    if args.resource == 'documents':
+        # Databases created before the signature store need its columns first; imported
+        # here because it pulls in numpy and Pillow, which other commands do not need
+        from crm_services.signatures import ensure_signature_store
+        ensure_signature_store(args.db or DB_PATH)
+
+    filters = {resource['parent']: args.parent} if resource['parent'] and args.parent is not None else {}
+    reading = args.action in ('list', 'count', 'get', 'tree')
+    conn = read_connection(args.db) if reading else connect(args.db)
+    try:
+        if args.action == 'list':
+            print_records(resource['list'](conn, limit=args.limit, offset=args.offset, **filters))
+        elif args.action == 'count':
+            print(resource['count'](conn, **filters))
+        elif args.action == 'get':
+            record = resource['get'](conn, args.id)
+            if record is None:
+                print(f"❌ No {args.resource} record {args.id}", file=sys.stderr)
+                return 1
+            print_records([record])
+        elif args.action == 'tree':
+            ids = [args.id] if args.id is not None else None
+            print_records(resource['tree'](conn, ids, **filters))
+        elif args.action == 'create':
+            records = load_records(args)
+            start_time = time.perf_counter()
+            ids = resource['create'](conn, records)
+            duration = time.perf_counter() - start_time
+            print(f"✓ Created {len(ids)} {args.resource} in {duration:.3f} seconds: ids {ids[0]}-{ids[-1]}"
+                  if ids else "✓ Nothing to create", file=sys.stderr)
+        elif args.action == 'update':
+            records = load_records(args)
+            if len(records) != 1 or not isinstance(records[0], dict):
+                print("❌ update takes one JSON object of fields", file=sys.stderr)
+                return 1
+            check_fields(records[0], resource['columns'])
+            if not resource['update'](conn, args.id, **records[0]):
+                print(f"❌ No {args.resource} record {args.id}", file=sys.stderr)
+                return 1
+            print(f"✓ Updated {args.resource} {args.id}", file=sys.stderr)
+        elif args.action == 'delete':
+            if not resource['delete'](conn, args.id):
+                print(f"❌ No {args.resource} record {args.id}", file=sys.stderr)
+                return 1
+            print(f"✓ Deleted {args.resource} {args.id}", file=sys.stderr)
+    except ServiceError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""Local JSON HTTP API over the CRM data.
+
+    python -m crm_services.api --port 8502
+
+    GET    /api/<resource>?limit=&offset=&<parent>=   page of records plus the total
+    GET    /api/<resource>/<id>                        one record
+    GET    /api/budgets/<id>/tree                      a budget with its line items, products and expenses
+    GET    /api/budgets/tree?contact_id=|ids=1,2       several budget trees in one query
+    POST   /api/<resource>                             create from an object, or a bulk array
+    PATCH  /api/<resource>/<id>                        update the given fields
+    DELETE /api/<resource>/<id>                        delete
+
+Resources are contacts, budgets, line_items, products and expenses; listings
+filter by their parent (contact_id, budget_id or line_item_id). GET responses
+carry an ETag derived from SQLite's data_version, so clients polling with
+If-None-Match get 304 Not Modified without a query until something commits.
+Requests are served by threads sharing a fixed pool of connections over
+keep-alive HTTP/1.1. With --metrics-port, request latency and pool usage
+are exposed for Prometheus (see process_metrics). Every response carries an
+X-Request-ID (the client's, or a new one) that is also attached to the
+request's log records; the access log keeps 1 request in ACCESS_LOG_SAMPLE
+unless --verbose.
+"""
+import argparse
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import logging_config
+import process_metrics
+from crm_services.db import DB_PATH, ServiceError, ValidationError, NotFoundError, check_fields, connect
+from crm_services.resources import RESOURCES
+
+API_RESOURCES = ('contacts', 'budgets', 'line_items', 'products', 'expenses')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BODY_BYTES = 10 * 1024 * 1024
+ACCESS_LOG_SAMPLE = 100
+
+logger = logging.getLogger('crm.api')
+access_logger = logging.getLogger('crm.api.access')
+
+request_duration = process_metrics.histogram('crm_api_request_duration_seconds', 'API request handling time',
+                                             ['method'])
+requests_total = process_metrics.counter('crm_api_requests_total', 'API responses sent', ['method', 'status'])
+pool_connections = process_metrics.gauge('crm_api_pool_connections', 'API database connections by state',
+                                         ['state'])
+pool_waits = process_metrics.counter('crm_api_pool_waits_total', 'Requests that waited for a free connection')
+
+class ConnectionPool:
+    """A fixed number of connections shared by the request threads.
+
+    Connections are opened on first use and handed out most-recently-used
+    first, so a lightly loaded server keeps reusing one warm connection.
+    """
+    def __init__(self, db_path=None, size=8):
+        self.db_path = db_path or DB_PATH
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                return connect(self.db_path, check_same_thread=False)
+        pool_waits.inc()
+        return self.idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.closed:
+            conn.close()
+        else:
+            self.idle.put(conn)
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class DataVersion:
+    """Database-wide change counter for ETags.
+
+    PRAGMA data_version changes whenever another connection commits, so a
+    connection that never writes sees every commit, whether made through the
+    pool, the Streamlit app or a batch job. The per-process token keeps ETags
+    from one server run from matching the next.
+    """
+    def __init__(self, db_path=None):
+        self.conn = sqlite3.connect(db_path or DB_PATH, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.token = uuid.uuid4().hex[:8]
+
+    def etag(self):
+        with self.lock:
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        return f'"{self.token}-{version}"'
+
+    def close(self):
+        self.conn.close()
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# Function to reuse a sane client-supplied request id, or make one up
+def request_id(incoming):
+    if incoming and len(incoming) <= 64 and incoming.isascii() and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex[:12]
+
+def parse_int(value, name, minimum=0):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"{name} must be an integer")
+    if number < minimum:
+        raise APIError(400, f"{name} must be at least {minimum}")
+    return number
+
+class CRMRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so clients skip a TCP handshake per request
+    server_version = 'CRMAPI/1.0'
+    # Headers and body go out in separate writes; with Nagle on, the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.handle_api('POST')
+
+    def do_PATCH(self):
+        self.handle_api('PATCH')
+
+    def do_DELETE(self):
+        self.handle_api('DELETE')
+
+    def handle_api(self, method):
+        self.body_read = False
+        self.status = None
+        self.request_id = request_id(self.headers.get('X-Request-ID'))
+        started = time.perf_counter()
+        with logging_config.log_context(request_id=self.request_id):
+            try:
+                self.dispatch(method)
+            finally:
+                duration = time.perf_counter() - started
+                request_duration.labels(method).observe(duration)
+                access_logger.info("%s %s %s", method, self.path, self.status, extra={
+                    'status': self.status, 'ms': round(duration * 1000, 2),
+                    'sample': 1 if self.server.verbose else ACCESS_LOG_SAMPLE})
+
+    def dispatch(self, method):
+        try:
+            resource_name, record_id, view, query = self.route()
+            resource = RESOURCES[resource_name]
+            if method == 'GET':
+                etag = self.server.versions.etag()
+                if etag in self.headers.get('If-None-Match', ''):
+                    self.send_json(304, None, etag)
+                    return
+                with self.server.pool.connection() as conn:
+                    if view == 'tree':
+                        body = self.get_tree(conn, resource, resource_name, record_id, query)
+                    elif record_id is not None:
+                        body = self.get_record(conn, resource, resource_name, record_id)
+                    else:
+                        body = self.list_records(conn, resource, query)
+                self.send_json(200, body, etag)
+            elif view:
+                raise APIError(405, f"{method} is not supported on {self.path}")
+            elif method == 'POST' and record_id is None:
+                records = self.read_json()
+                records = records if isinstance(records, list) else [records]
+                if not all(isinstance(record, dict) for record in records):
+                    raise APIError(400, "Expected a JSON object or an array of objects")
+                with self.server.pool.connection() as conn:
+                    ids = resource['create'](conn, records)
+                self.send_json(201, {'ids': ids})
+            elif method == 'PATCH' and record_id is not None and 'update' in resource:
+                fields = self.read_json()
+                if not isinstance(fields, dict):
+                    raise APIError(400, "Expected a JSON object of fields")
+                # Checked before the call: a body key such as "budget_id" would clash with its parameters
+                check_fields(fields, resource['columns'])
+                with self.server.pool.connection() as conn:
+                    if not resource['update'](conn, record_id, **fields):
+                        raise NotFoundError(f"No {resource_name} record {record_id}")
+                    record = resource['get'](conn, record_id)
+                self.send_json(200, record)
+            elif method == 'DELETE' and record_id is not None and 'delete' in resource:
+                with self.server.pool.connection() as conn:
+                    if not resource['delete'](conn, record_id):
+                        raise NotFoundError(f"No {resource_name} record {record_id}")
+                self.send_json(204, None)
+            else:
+                raise APIError(405, f"{method} is not supported on {self.path}")
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)})
+        except ValidationError as e:
+            self.send_json(400, {'error': str(e)})
+        except NotFoundError as e:
+            self.send_json(404, {'error': str(e)})
+        except (ServiceError, sqlite3.IntegrityError) as e:
+            self.send_json(409, {'error': str(e)})
+        except sqlite3.Error as e:
+            logger.exception("Database error")
+            self.send_json(500, {'error': "Database error"})
+
+    def route(self):
+        """Split /api/<resource>[/<id>][/tree] into its parts"""
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        view = parts.pop() if len(parts) > 2 and parts[-1] == 'tree' else None
+        if len(parts) not in (2, 3) or parts[0] != 'api' or parts[1] not in API_RESOURCES:
+            raise APIError(404, f"Unknown endpoint {url.path}")
+        if view and 'tree' not in RESOURCES[parts[1]]:
+            raise APIError(404, f"{parts[1]} have no tree view")
+        record_id = parse_int(parts[2], 'id', 1) if len(parts) == 3 else None
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return parts[1], record_id, view, query
+
+    def get_record(self, conn, resource, resource_name, record_id):
+        record = resource['get'](conn, record_id)
+        if record is None:
+            raise NotFoundError(f"No {resource_name} record {record_id}")
+        return record
+
+    def get_tree(self, conn, resource, resource_name, record_id, query):
+        """One record's tree, or the trees of ?ids=1,2,3 and/or the parent given in the query"""
+        if record_id is not None:
+            trees = resource['tree'](conn, [record_id])
+            if not trees:
+                raise NotFoundError(f"No {resource_name} record {record_id}")
+            return trees[0]
+        ids = [parse_int(value, 'ids', 1) for value in query['ids'].split(',')] if query.get('ids') else None
+        parent = resource['parent']
+        filters = {parent: parse_int(query[parent], parent)} if parent and parent in query else {}
+        if ids is None and not filters:
+            raise APIError(400, f"Give ids or {parent} to load {resource_name} trees")
+        return {'items': resource['tree'](conn, ids, **filters)}
+
+    def list_records(self, conn, resource, query):
+        limit = min(parse_int(query.get('limit', DEFAULT_PAGE_SIZE), 'limit', 1), MAX_PAGE_SIZE)
+        offset = parse_int(query.get('offset', 0), 'offset')
+        parent = resource['parent']
+        filters = {parent: parse_int(query[parent], parent)} if parent and parent in query else {}
+        items = resource['list'](conn, limit=limit, offset=offset, **filters)
+        total = resource['count'](conn, **filters)
+        return {
+            'items': items,
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'next_offset': offset + limit if offset + limit < total else None,
+        }
+
+    def read_json(self):
+        length = parse_int(self.headers.get('Content-Length', 0), 'Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise APIError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+        body = self.rfile.read(length)
+        self.body_read = True
+        try:
+            return json.loads(body or b'null')
+        except ValueError:
+            raise APIError(400, "Request body is not valid JSON")
+
+    def send_json(self, status, body, etag=None):
+        # An unread request body would be parsed as the next request on this connection
+        unread = 0
+        if not self.body_read:
+            length = self.headers.get('Content-Length') or '0'
+            unread = int(length) if length.isdigit() else MAX_BODY_BYTES + 1
+        if 0 < unread <= MAX_BODY_BYTES:
+            self.rfile.read(unread)
+        payload = b'' if body is None else json.dumps(body, default=str, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.status = status
+        requests_total.labels(self.command, str(status)).inc()
+        self.send_header('X-Request-ID', self.request_id)
+        if unread > MAX_BODY_BYTES:
+            self.send_header('Connection', 'close')
+        if etag:
+            self.send_header('ETag', etag)
+        if payload:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def log_request(self, code='-', size='-'):
+        pass  # handle_api writes the access log, with the timing and request id
+
+    def log_message(self, format, *args):
+        # Malformed requests rejected by http.server before they reach handle_api
+        logger.warning(format, *args, extra={'client': self.client_address[0]})
+
+class CRMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db_path=None, pool_size=8, verbose=False):
+        super().__init__(address, CRMRequestHandler)
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.versions = DataVersion(db_path)
+        self.verbose = verbose
+        pool_connections.labels('open').set_function(lambda: self.pool.opened)
+        pool_connections.labels('idle').set_function(self.pool.idle.qsize)
+        pool_connections.labels('in_use').set_function(lambda: self.pool.opened - self.pool.idle.qsize())
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+        self.versions.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CRM JSON HTTP API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: localhost only)')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--db', help='Database to serve (default: $CRM_DB or crm.db)')
+    parser.add_argument('--pool-size', type=int, default=8, help='Database connections shared by requests')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    parser.add_argument('--metrics-port', type=int, default=process_metrics.METRICS_PORT,
+                        help='Serve Prometheus metrics on this port (default: $CRM_METRICS_PORT, off)')
+    args = parser.parse_args(argv)
+    logging_config.configure_logging()
+
+    server = CRMServer((args.host, args.port), args.db, args.pool_size, args.verbose)
+    if args.metrics_port:
+        process_metrics.start_metrics_server(args.metrics_port)
+        logger.info("Serving metrics on http://%s:%s/metrics", process_metrics.METRICS_HOST, args.metrics_port)
+    logger.info("Serving CRM API on http://%s:%s/api/ (Ctrl+C to stop)", args.host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from crm_services.db import fetch_all, fetch_one, page_clause, insert_rows
+
+APPLICATION_COLUMNS = ['contact_id', 'interest', 'reason', 'skillsets']
+
+def list_applications(conn, contact_id=None, limit=None, offset=0):
+    clause, params = page_clause(limit, offset)
+    if contact_id is None:
+        return fetch_all(conn, f'SELECT * FROM applications ORDER BY id{clause}', params)
+    return fetch_all(conn, f'SELECT * FROM applications WHERE contact_id = ? ORDER BY id{clause}',
+                     (contact_id, *params))
+
+def count_applications(conn, contact_id=None):
+    if contact_id is None:
+        return conn.execute('SELECT COUNT(*) FROM applications').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM applications WHERE contact_id = ?', (contact_id,)).fetchone()[0]
+
+def get_application(conn, application_id):
+    return fetch_one(conn, 'SELECT * FROM applications WHERE id = ?', (application_id,))
+
+def create_applications(conn, applications):
+    return insert_rows(conn, 'applications', APPLICATION_COLUMNS, applications)
+
+def create_application(conn, **application):
+    return create_applications(conn, [application])[0]
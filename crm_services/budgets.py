@@ -0,0 +1,166 @@
+import json
+
+from crm_services.db import NotFoundError, fetch_all, fetch_one, page_clause, insert_rows, update_row, delete_row
+
+BUDGET_COLUMNS = ['contact_id', 'budget_name', 'total_budget', 'start_date', 'end_date', 'currency', 'status']
+
+def list_budgets(conn, contact_id=None, limit=None, offset=0):
+    clause, params = page_clause(limit, offset)
+    if contact_id is None:
+        return fetch_all(conn, f'SELECT * FROM budgets ORDER BY id{clause}', params)
+    return fetch_all(conn, f'SELECT * FROM budgets WHERE contact_id = ? ORDER BY id{clause}', (contact_id, *params))
+
+def count_budgets(conn, contact_id=None):
+    if contact_id is None:
+        return conn.execute('SELECT COUNT(*) FROM budgets').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM budgets WHERE contact_id = ?', (contact_id,)).fetchone()[0]
+
+def get_budget(conn, budget_id):
+    return fetch_one(conn, 'SELECT * FROM budgets WHERE id = ?', (budget_id,))
+
+def create_budgets(conn, budgets):
+    return insert_rows(conn, 'budgets', BUDGET_COLUMNS, budgets)
+
+def create_budget(conn, **budget):
+    return create_budgets(conn, [budget])[0]
+
+def update_budget(conn, budget_id, **fields):
+    return update_row(conn, 'budgets', budget_id, fields, BUDGET_COLUMNS)
+
+def delete_budget(conn, budget_id):
+    return delete_row(conn, 'budgets', budget_id)
+
+def get_budget_details(conn, budget_id):
+    """Budget totals: allocated to line items, spent on expenses and left to allocate"""
+    return fetch_one(conn, '''
+        WITH budget_summary AS (
+            SELECT
+                b.id,
+                b.budget_name,
+                b.total_budget,
+                b.currency,
+                COALESCE(SUM(bli.allocated_amount), 0) as total_allocated
+            FROM budgets b
+            LEFT JOIN budget_line_items bli ON b.id = bli.budget_id
+            WHERE b.id = ?
+            GROUP BY b.id, b.budget_name, b.total_budget, b.currency
+        ),
+        expense_summary AS (
+            SELECT
+                b.id,
+                COALESCE(SUM(e.amount * e.quantity), 0) as total_spent
+            FROM budgets b
+            LEFT JOIN budget_line_items bli ON b.id = bli.budget_id
+            LEFT JOIN expenses e ON bli.id = e.line_item_id
+            WHERE b.id = ?
+            GROUP BY b.id
+        )
+        SELECT
+            bs.*,
+            es.total_spent,
+            CASE
+                WHEN bs.total_allocated > bs.total_budget THEN 0
+                ELSE bs.total_budget - bs.total_allocated
+            END as remaining_budget
+        FROM budget_summary bs
+        LEFT JOIN expense_summary es ON bs.id = es.id
+    ''', (budget_id, budget_id))
+
+# Each level is aggregated once with GROUP BY and embedded in its parent with json(),
+# so the whole hierarchy costs one statement and one pass per table, however many
+# budgets are loaded. Expenses hang off their product; a line item's spent total
+# also counts expenses whose product has since been deleted.
+BUDGET_TREE_SQL = '''
+    WITH chosen AS (
+        SELECT * FROM budgets b WHERE {where}
+    ),
+    items AS (
+        SELECT * FROM budget_line_items WHERE budget_id IN (SELECT id FROM chosen)
+    ),
+    item_expenses AS (
+        SELECT * FROM expenses WHERE line_item_id IN (SELECT id FROM items)
+    ),
+    product_expenses AS (
+        SELECT
+            product_id,
+            json_group_array(json_object(
+                'id', id, 'amount', amount, 'quantity', quantity, 'total_amount', amount * quantity,
+                'date_incurred', date_incurred, 'description', description, 'status', status
+            )) AS expenses,
+            SUM(amount * quantity) AS spent
+        FROM item_expenses
+        GROUP BY product_id
+    ),
+    item_products AS (
+        SELECT
+            p.line_item_id,
+            json_group_array(json_object(
+                'id', p.id, 'product_name', p.product_name, 'product_group', p.product_group, 'rate', p.rate,
+                'frequency', p.frequency, 'service_name', p.service_name, 'status', p.status,
+                'spent', COALESCE(pe.spent, 0), 'expenses', json(COALESCE(pe.expenses, '[]'))
+            )) AS products
+        FROM products p
+        LEFT JOIN product_expenses pe ON pe.product_id = p.id
+        WHERE p.line_item_id IN (SELECT id FROM items)
+        GROUP BY p.line_item_id
+    ),
+    item_spent AS (
+        SELECT line_item_id, SUM(amount * quantity) AS spent FROM item_expenses GROUP BY line_item_id
+    ),
+    budget_items AS (
+        SELECT
+            i.budget_id,
+            json_group_array(json_object(
+                'id', i.id, 'line_item_name', i.line_item_name, 'allocated_amount', i.allocated_amount,
+                'status', i.status, 'spent', COALESCE(s.spent, 0), 'products', json(COALESCE(ip.products, '[]'))
+            )) AS line_items,
+            COALESCE(SUM(i.allocated_amount), 0) AS allocated,
+            COALESCE(SUM(s.spent), 0) AS spent
+        FROM items i
+        LEFT JOIN item_products ip ON ip.line_item_id = i.id
+        LEFT JOIN item_spent s ON s.line_item_id = i.id
+        GROUP BY i.budget_id
+    )
+    SELECT json_group_array(json_object(
+        'id', b.id, 'contact_id', b.contact_id, 'budget_name', b.budget_name, 'total_budget', b.total_budget,
+        'start_date', b.start_date, 'end_date', b.end_date, 'currency', b.currency, 'status', b.status,
+        'allocated', COALESCE(bi.allocated, 0), 'spent', COALESCE(bi.spent, 0),
+        'line_items', json(COALESCE(bi.line_items, '[]'))
+    ))
+    FROM chosen b
+    LEFT JOIN budget_items bi ON bi.budget_id = b.id
+'''
+
+def budget_trees(conn, budget_ids=None, contact_id=None):
+    """Budgets with their line items, products and expenses nested inside, in one query.
+
+    Selects the given budget ids and/or a contact's budgets (all budgets if neither
+    is given). Every level carries its spent total; lists are ordered by id, and
+    expenses by date incurred.
+    """
+    conditions, params = [], []
+    if budget_ids is not None:
+        conditions.append("b.id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(budget_id) for budget_id in budget_ids]))
+    if contact_id is not None:
+        conditions.append("b.contact_id = ?")
+        params.append(contact_id)
+    sql = BUDGET_TREE_SQL.format(where=' AND '.join(conditions) or '1')
+    budgets = json.loads(conn.execute(sql, params).fetchone()[0])
+
+    # SQLite before 3.44 cannot order inside json_group_array, so order the small lists here
+    budgets.sort(key=lambda budget: budget['id'])
+    for budget in budgets:
+        budget['line_items'].sort(key=lambda item: item['id'])
+        for item in budget['line_items']:
+            item['products'].sort(key=lambda product: product['id'])
+            for product in item['products']:
+                product['expenses'].sort(key=lambda expense: (expense['date_incurred'] or '', expense['id']))
+    return budgets
+
+def budget_tree(conn, budget_id):
+    """One budget's full hierarchy (see budget_trees)"""
+    budgets = budget_trees(conn, [budget_id])
+    if not budgets:
+        raise NotFoundError(f"Budget {budget_id} not found")
+    return budgets[0]
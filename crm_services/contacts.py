@@ -0,0 +1,49 @@
+import re
+
+from crm_services.db import ValidationError, fetch_all, fetch_one, page_clause, insert_rows, update_row, delete_row
+
+CONTACT_COLUMNS = ['title', 'gender', 'name', 'email', 'phone', 'message',
+                   'address_line', 'suburb', 'postcode', 'state', 'country']
+REQUIRED_CONTACT_COLUMNS = ['name', 'email', 'phone', 'message']
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
+def is_valid_email(email):
+    return email is not None and EMAIL_PATTERN.match(str(email)) is not None
+
+def validate_contact(contact, partial=False):
+    if not partial:
+        missing = [column for column in REQUIRED_CONTACT_COLUMNS if contact.get(column) in (None, '')]
+        if missing:
+            raise ValidationError(f"Missing required fields: {', '.join(missing)}")
+    if 'email' in contact and not is_valid_email(contact['email']):
+        raise ValidationError(f"Invalid email address: {contact['email']!r}")
+
+def list_contacts(conn, limit=None, offset=0):
+    clause, params = page_clause(limit, offset)
+    return fetch_all(conn, f'SELECT * FROM contacts ORDER BY id{clause}', params)
+
+def count_contacts(conn):
+    return conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+
+def get_contact(conn, contact_id):
+    return fetch_one(conn, 'SELECT * FROM contacts WHERE id = ?', (contact_id,))
+
+def search_contacts(conn, name):
+    return fetch_all(conn, 'SELECT * FROM contacts WHERE name LIKE ?', ('%' + name + '%',))
+
+def create_contacts(conn, contacts):
+    """Validate and insert contacts in one transaction; returns their ids"""
+    contacts = list(contacts)
+    for contact in contacts:
+        validate_contact(contact)
+    return insert_rows(conn, 'contacts', CONTACT_COLUMNS, contacts)
+
+def create_contact(conn, **contact):
+    return create_contacts(conn, [contact])[0]
+
+def update_contact(conn, contact_id, **fields):
+    validate_contact(fields, partial=True)
+    return update_row(conn, 'contacts', contact_id, fields, CONTACT_COLUMNS)
+
+def delete_contact(conn, contact_id):
+    return delete_row(conn, 'contacts', contact_id)
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+
+import query_metrics
+from replicate_db import open_read_replica
+
+# Database used by the services and CLI; CRM_DB overrides it for batch jobs and tests
+DB_PATH = os.environ.get('CRM_DB', 'crm.db')
+
+class ServiceError(Exception):
+    """Base class for errors raised by the service layer"""
+
+class ValidationError(ServiceError, ValueError):
+    """Input that cannot be stored, e.g. a malformed email or an unknown field"""
+
+class NotFoundError(ServiceError, LookupError):
+    """The requested record does not exist"""
+
+def connect(db_path=None, check_same_thread=True):
+    """Open a read-write connection with named-column rows"""
+    conn = query_metrics.connect(db_path or DB_PATH, timeout=30, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def read_connection(db_path=None, primary=None):
+    """Open a connection for read-only work.
+
+    Served by the read replica (CRM_READ_REPLICA) when no db_path is given and
+    the replica has caught up with the primary, so a read right after a write
+    still sees it. Otherwise the primary is read: primary() when given, as the
+    pages pass their get_db_connection, else connect(db_path).
+    """
+    conn = primary() if primary is not None else connect(db_path)
+    if conn is None or db_path is not None:
+        return conn
+    replica = open_read_replica(conn)
+    if replica is None:
+        return conn
+    conn.close()
+    return replica
+
+def fetch_all(conn, sql, params=()):
+    """Run a query and return its rows as plain dicts, whatever the connection's row_factory"""
+    cursor = conn.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def fetch_one(conn, sql, params=()):
+    rows = fetch_all(conn, sql, params)
+    return rows[0] if rows else None
+
+def page_clause(limit=None, offset=0):
+    """LIMIT/OFFSET clause and parameters for paginated listings"""
+    if limit is None:
+        return "", ()
+    return " LIMIT ? OFFSET ?", (int(limit), int(offset or 0))
+
+def check_fields(fields, allowed):
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+def insert_rows(conn, table, columns, records):
+    """Insert dicts into table in one transaction; returns the new row ids.
+
+    Only the fields a record gives are written, so omitted columns keep their defaults.
+    """
+    records = list(records)
+    for record in records:
+        check_fields(record, columns)
+    with conn:
+        return [insert_row(conn, table, columns, record) for record in records]
+
+def insert_row(conn, table, columns, record):
+    """Insert one already checked dict inside the caller's transaction; returns its row id"""
+    given = [column for column in columns if column in record]
+    if given:
+        sql = f'INSERT INTO {table} ({", ".join(given)}) VALUES ({", ".join("?" for _ in given)})'
+    else:
+        sql = f'INSERT INTO {table} DEFAULT VALUES'
+    return conn.execute(sql, tuple(record[column] for column in given)).lastrowid
+
+def update_row(conn, table, row_id, fields, allowed):
+    """Set the given fields on one row; returns True if the row exists"""
+    check_fields(fields, allowed)
+    if not fields:
+        return fetch_one(conn, f'SELECT id FROM {table} WHERE id = ?', (row_id,)) is not None
+    assignments = ', '.join(f'{column} = ?' for column in fields)
+    with conn:
+        cursor = conn.execute(f'UPDATE {table} SET {assignments} WHERE id = ?', (*fields.values(), row_id))
+    return cursor.rowcount > 0
+
+def delete_row(conn, table, row_id):
+    """Delete one row; returns True if it existed"""
+    with conn:
+        cursor = conn.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+    return cursor.rowcount > 0
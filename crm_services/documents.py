@@ -0,0 +1,23 @@
+from crm_services.db import fetch_all, fetch_one, page_clause
+
+# Document metadata only; signature images stay in the signatures table
+DOCUMENT_FIELDS = '''
+    d.id, d.contact_id, d.document_name, d.document_path, d.timestamp, d.signature_hash,
+    (d.signature_hash IS NOT NULL OR d.signature IS NOT NULL) AS signed
+'''
+
+def list_documents(conn, contact_id=None, limit=None, offset=0):
+    clause, params = page_clause(limit, offset)
+    if contact_id is None:
+        return fetch_all(conn, f'SELECT {DOCUMENT_FIELDS} FROM application_documents d ORDER BY d.id{clause}', params)
+    return fetch_all(conn, f'''
+        SELECT {DOCUMENT_FIELDS} FROM application_documents d WHERE d.contact_id = ? ORDER BY d.id{clause}
+    ''', (contact_id, *params))
+
+def count_documents(conn, contact_id=None):
+    if contact_id is None:
+        return conn.execute('SELECT COUNT(*) FROM application_documents').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM application_documents WHERE contact_id = ?', (contact_id,)).fetchone()[0]
+
+def get_document(conn, document_id):
+    return fetch_one(conn, f'SELECT {DOCUMENT_FIELDS} FROM application_documents d WHERE d.id = ?', (document_id,))
@@ -0,0 +1,53 @@
+from crm_services.db import fetch_all, fetch_one, page_clause, check_fields, insert_row
+
+EXPENSE_COLUMNS = ['line_item_id', 'product_id', 'amount', 'quantity', 'date_incurred', 'description', 'status']
+
+def list_expenses(conn, line_item_id=None, limit=None, offset=0):
+    """Expenses with their product, newest first"""
+    clause, params = page_clause(limit, offset)
+    where, where_params = ("WHERE e.line_item_id = ?", (line_item_id,)) if line_item_id is not None else ("", ())
+    return fetch_all(conn, f'''
+        SELECT
+            e.id,
+            e.line_item_id,
+            e.product_id,
+            e.amount,
+            e.quantity,
+            e.amount * e.quantity as total_amount,
+            e.date_incurred,
+            e.description,
+            p.product_name,
+            p.frequency,
+            p.service_name
+        FROM expenses e
+        JOIN products p ON e.product_id = p.id
+        {where}
+        ORDER BY e.date_incurred DESC, e.id DESC{clause}
+    ''', (*where_params, *params))
+
+def count_expenses(conn, line_item_id=None):
+    if line_item_id is None:
+        return conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM expenses WHERE line_item_id = ?', (line_item_id,)).fetchone()[0]
+
+def get_expense(conn, expense_id):
+    return fetch_one(conn, 'SELECT * FROM expenses WHERE id = ?', (expense_id,))
+
+def add_expenses(conn, expenses):
+    """Record expenses and add them to their line items' spent_amount, in one transaction"""
+    expenses = list(expenses)
+    for expense in expenses:
+        check_fields(expense, EXPENSE_COLUMNS)
+    ids = []
+    with conn:
+        for expense in expenses:
+            ids.append(insert_row(conn, 'expenses', EXPENSE_COLUMNS, expense))
+            conn.execute('''
+                UPDATE budget_line_items
+                SET spent_amount = COALESCE(spent_amount, 0) + ?
+                WHERE id = ?
+            ''', ((expense.get('amount') or 0) * (expense.get('quantity') or 0), expense.get('line_item_id')))
+    return ids
+
+def add_expense(conn, **expense):
+    return add_expenses(conn, [expense])[0]
@@ -0,0 +1,144 @@
+import json
+
+from crm_services.db import NotFoundError, fetch_all, fetch_one, page_clause, insert_rows, update_row
+
+LINE_ITEM_COLUMNS = ['budget_id', 'line_item_name', 'allocated_amount', 'status']
+
+def list_line_items(conn, budget_id=None, limit=None, offset=0):
+    """Line items with spending totalled from their expenses"""
+    clause, params = page_clause(limit, offset)
+    where, where_params = ("WHERE bli.budget_id = ?", (budget_id,)) if budget_id is not None else ("", ())
+    return fetch_all(conn, f'''
+        SELECT
+            bli.id,
+            bli.budget_id,
+            bli.line_item_name,
+            bli.allocated_amount,
+            COALESCE(SUM(e.amount * e.quantity), 0) as spent_amount,
+            bli.status,
+            b.currency
+        FROM budget_line_items bli
+        JOIN budgets b ON b.id = bli.budget_id
+        LEFT JOIN expenses e ON bli.id = e.line_item_id
+        {where}
+        GROUP BY bli.id, bli.line_item_name, bli.allocated_amount, bli.status, b.currency
+        ORDER BY bli.id{clause}
+    ''', (*where_params, *params))
+
+def count_line_items(conn, budget_id=None):
+    if budget_id is None:
+        return conn.execute('SELECT COUNT(*) FROM budget_line_items').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM budget_line_items WHERE budget_id = ?', (budget_id,)).fetchone()[0]
+
+def get_line_item(conn, line_item_id):
+    return fetch_one(conn, 'SELECT * FROM budget_line_items WHERE id = ?', (line_item_id,))
+
+def create_line_items(conn, line_items):
+    return insert_rows(conn, 'budget_line_items', LINE_ITEM_COLUMNS, line_items)
+
+def create_line_item(conn, **line_item):
+    return create_line_items(conn, [line_item])[0]
+
+def update_line_item(conn, line_item_id, **fields):
+    return update_row(conn, 'budget_line_items', line_item_id, fields, LINE_ITEM_COLUMNS)
+
+def delete_line_item(conn, line_item_id):
+    """Delete a line item together with its products"""
+    with conn:
+        conn.execute('DELETE FROM products WHERE line_item_id = ?', (line_item_id,))
+        cursor = conn.execute('DELETE FROM budget_line_items WHERE id = ?', (line_item_id,))
+    return cursor.rowcount > 0
+
+def validate_budget_allocation(conn, budget_id, new_allocation, line_item_id=None):
+    """True if allocating new_allocation keeps the budget's line items within its total"""
+    budget = fetch_one(conn, 'SELECT total_budget FROM budgets WHERE id = ?', (budget_id,))
+    if budget is None:
+        raise NotFoundError(f"Budget {budget_id} not found")
+    if line_item_id:
+        current_total = conn.execute('''
+            SELECT SUM(allocated_amount) FROM budget_line_items WHERE budget_id = ? AND id != ?
+        ''', (budget_id, line_item_id)).fetchone()[0] or 0
+    else:
+        current_total = conn.execute('''
+            SELECT SUM(allocated_amount) FROM budget_line_items WHERE budget_id = ?
+        ''', (budget_id,)).fetchone()[0] or 0
+    return (current_total + new_allocation) <= budget['total_budget']
+
+def line_item_totals(conn, line_item_id):
+    """Allocated, spent and remaining amounts of one line item"""
+    result = fetch_one(conn, '''
+        WITH expense_totals AS (
+            SELECT
+                line_item_id,
+                SUM(amount * quantity) as total_spent
+            FROM expenses
+            WHERE line_item_id = ?
+            GROUP BY line_item_id
+        )
+        SELECT
+            bli.allocated_amount,
+            COALESCE(et.total_spent, 0) as total_spent
+        FROM budget_line_items bli
+        LEFT JOIN expense_totals et ON bli.id = et.line_item_id
+        WHERE bli.id = ?
+    ''', (line_item_id, line_item_id))
+    if result is None:
+        raise NotFoundError(f"Line item {line_item_id} not found")
+    return {
+        'allocated_amount': float(result['allocated_amount']),
+        'total_spent': float(result['total_spent']),
+        'remaining': float(result['allocated_amount'] - result['total_spent'])
+    }
+
+def line_item_dashboard(conn, line_item_id, expense_limit=None, expense_offset=0):
+    """Everything the line item panels show, fetched in a single query.
+
+    Returns the line item (with its budget's currency), its products, one page of
+    expenses (newest first) with the total expense count, and the allocated/spent/
+    remaining totals, as built by SQLite's JSON functions in one round trip.
+    """
+    row = conn.execute('''
+        SELECT json_object(
+            'line_item', (
+                SELECT json_object('id', bli.id, 'budget_id', bli.budget_id, 'line_item_name', bli.line_item_name,
+                                   'allocated_amount', bli.allocated_amount, 'status', bli.status,
+                                   'currency', b.currency)
+                FROM budget_line_items bli
+                JOIN budgets b ON b.id = bli.budget_id
+                WHERE bli.id = :id
+            ),
+            'products', (
+                SELECT json_group_array(json_object(
+                    'id', id, 'product_name', product_name, 'product_group', product_group, 'rate', rate,
+                    'frequency', frequency, 'service_name', service_name, 'description', description,
+                    'status', status))
+                FROM (SELECT * FROM products WHERE line_item_id = :id ORDER BY id)
+            ),
+            'expenses', (
+                SELECT json_group_array(json_object(
+                    'id', id, 'product_id', product_id, 'amount', amount, 'quantity', quantity,
+                    'total_amount', total_amount, 'date_incurred', date_incurred, 'description', description,
+                    'product_name', product_name, 'frequency', frequency, 'service_name', service_name))
+                FROM (
+                    SELECT e.id, e.product_id, e.amount, e.quantity, e.amount * e.quantity as total_amount,
+                           e.date_incurred, e.description, p.product_name, p.frequency, p.service_name
+                    FROM expenses e
+                    JOIN products p ON e.product_id = p.id
+                    WHERE e.line_item_id = :id
+                    ORDER BY e.date_incurred DESC, e.id DESC
+                    LIMIT :limit OFFSET :offset
+                )
+            ),
+            'expense_count', (SELECT COUNT(*) FROM expenses WHERE line_item_id = :id),
+            'total_spent', (SELECT COALESCE(SUM(amount * quantity), 0) FROM expenses WHERE line_item_id = :id)
+        )
+    ''', {'id': line_item_id, 'limit': -1 if expense_limit is None else int(expense_limit),
+          'offset': int(expense_offset or 0)}).fetchone()
+    dashboard = json.loads(row[0])
+    line_item = dashboard['line_item']
+    if line_item is None:
+        raise NotFoundError(f"Line item {line_item_id} not found")
+    allocated = float(line_item['allocated_amount'] or 0)
+    spent = float(dashboard.pop('total_spent'))
+    dashboard['totals'] = {'allocated_amount': allocated, 'total_spent': spent, 'remaining': allocated - spent}
+    return dashboard
@@ -0,0 +1,31 @@
+from crm_services.db import fetch_all, fetch_one, page_clause, insert_rows, update_row, delete_row
+
+PRODUCT_COLUMNS = ['line_item_id', 'product_name', 'product_group', 'rate', 'frequency',
+                   'service_name', 'description', 'status']
+
+def list_products(conn, line_item_id=None, limit=None, offset=0):
+    clause, params = page_clause(limit, offset)
+    if line_item_id is None:
+        return fetch_all(conn, f'SELECT * FROM products ORDER BY id{clause}', params)
+    return fetch_all(conn, f'SELECT * FROM products WHERE line_item_id = ? ORDER BY id{clause}',
+                     (line_item_id, *params))
+
+def count_products(conn, line_item_id=None):
+    if line_item_id is None:
+        return conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    return conn.execute('SELECT COUNT(*) FROM products WHERE line_item_id = ?', (line_item_id,)).fetchone()[0]
+
+def get_product(conn, product_id):
+    return fetch_one(conn, 'SELECT * FROM products WHERE id = ?', (product_id,))
+
+def create_products(conn, products):
+    return insert_rows(conn, 'products', PRODUCT_COLUMNS, products)
+
+def create_product(conn, **product):
+    return create_products(conn, [product])[0]
+
+def update_product(conn, product_id, **fields):
+    return update_row(conn, 'products', product_id, fields, PRODUCT_COLUMNS)
+
+def delete_product(conn, product_id):
+    return delete_row(conn, 'products', product_id)
@@ -0,0 +1,48 @@
+from crm_services import applications, budgets, contacts, documents, expenses, line_items, products
+
+# Uniform view of each record type for the CLI and other generic callers. "parent"
+# names the filter a listing accepts; missing operations are not supported. "tree"
+# loads records with everything nested below them; "columns" are the fields an
+# update may set.
+RESOURCES = {
+    'contacts': {
+        'list': contacts.list_contacts, 'count': contacts.count_contacts, 'get': contacts.get_contact,
+        'create': contacts.create_contacts, 'update': contacts.update_contact, 'delete': contacts.delete_contact,
+        'columns': contacts.CONTACT_COLUMNS,
+        'parent': None,
+    },
+    'budgets': {
+        'list': budgets.list_budgets, 'count': budgets.count_budgets, 'get': budgets.get_budget,
+        'create': budgets.create_budgets, 'update': budgets.update_budget, 'delete': budgets.delete_budget,
+        'columns': budgets.BUDGET_COLUMNS,
+        'tree': budgets.budget_trees,
+        'parent': 'contact_id',
+    },
+    'line_items': {
+        'list': line_items.list_line_items, 'count': line_items.count_line_items, 'get': line_items.get_line_item,
+        'create': line_items.create_line_items, 'update': line_items.update_line_item,
+        'delete': line_items.delete_line_item, 'columns': line_items.LINE_ITEM_COLUMNS,
+        'parent': 'budget_id',
+    },
+    'products': {
+        'list': products.list_products, 'count': products.count_products, 'get': products.get_product,
+        'create': products.create_products, 'update': products.update_product, 'delete': products.delete_product,
+        'columns': products.PRODUCT_COLUMNS,
+        'parent': 'line_item_id',
+    },
+    'expenses': {
+        'list': expenses.list_expenses, 'count': expenses.count_expenses, 'get': expenses.get_expense,
+        'create': expenses.add_expenses,
+        'parent': 'line_item_id',
+    },
+    'applications': {
+        'list': applications.list_applications, 'count': applications.count_applications,
+        'get': applications.get_application,
+        'create': applications.create_applications,
+        'parent': 'contact_id',
+    },
+    'documents': {
+        'list': documents.list_documents, 'count': documents.count_documents, 'get': documents.get_document,
+        'parent': 'contact_id',
+    },
+}
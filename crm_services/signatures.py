@@ -0,0 +1,81 @@
+import hashlib
+import sqlite3
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Databases whose signature storage has been checked by this process
+_signature_store_ready = set()
+
+def ensure_signature_store(db_path='crm.db'):
+    """Create the signature table and move inline signatures into it (runs once per database)"""
+    if db_path in _signature_store_ready:
+        return
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS signatures (
+            hash TEXT PRIMARY KEY,
+            image BLOB NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(application_documents)')]
+    if 'signature_hash' not in columns:
+        cursor.execute('ALTER TABLE application_documents ADD COLUMN signature_hash TEXT REFERENCES signatures(hash)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_application_documents_signature_hash
+        ON application_documents(signature_hash)
+    ''')
+
+    # Older rows carry the full canvas PNG inline; compact and deduplicate them
+    legacy_rows = cursor.execute('''
+        SELECT id, signature FROM application_documents
+        WHERE signature IS NOT NULL AND signature_hash IS NULL
+    ''').fetchall()
+    for document_id, signature_bytes in legacy_rows:
+        signature = compact_signature(Image.open(BytesIO(signature_bytes)))
+        signature_hash = store_signature(cursor, signature) if signature else None
+        cursor.execute('''
+            UPDATE application_documents SET signature_hash = ?, signature = NULL WHERE id = ?
+        ''', (signature_hash, document_id))
+    conn.commit()
+    conn.close()
+    _signature_store_ready.add(db_path)
+
+def compact_signature(signature_image, margin=2):
+    """Reduce a drawn signature to a cropped 1-bit PNG, or None if nothing was drawn"""
+    pixels = np.asarray(signature_image.convert('RGBA') if isinstance(signature_image, Image.Image) else signature_image)
+    if pixels.ndim == 2:
+        pixels = np.stack([pixels] * 3 + [np.full_like(pixels, 255)], axis=-1)
+    elif pixels.shape[2] == 3:
+        pixels = np.concatenate([pixels, np.full(pixels.shape[:2] + (1,), 255, dtype=pixels.dtype)], axis=-1)
+
+    # Ink is any visible pixel noticeably darker than the paper
+    gray = pixels[..., :3].astype(np.uint16).sum(axis=-1) // 3
+    ink = (pixels[..., 3] > 64) & (gray < 160)
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0:
+        return None
+
+    top, bottom = max(rows[0] - margin, 0), min(rows[-1] + margin + 1, ink.shape[0])
+    left, right = max(cols[0] - margin, 0), min(cols[-1] + margin + 1, ink.shape[1])
+    cropped = Image.fromarray(~ink[top:bottom, left:right])  # Mode '1': white paper, black ink
+
+    with BytesIO() as buffer:
+        cropped.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+def store_signature(cursor, signature_bytes):
+    """Store a compact signature once, returning its content hash"""
+    signature_hash = hashlib.sha256(signature_bytes).hexdigest()
+    width, height = Image.open(BytesIO(signature_bytes)).size
+    cursor.execute('''
+        INSERT OR IGNORE INTO signatures (hash, image, width, height)
+        VALUES (?, ?, ?, ?)
+    ''', (signature_hash, sqlite3.Binary(signature_bytes), width, height))
+    return signature_hash
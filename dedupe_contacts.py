@@ -0,0 +1,231 @@
+import json
+import re
+import sqlite3
+import time
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+
+# Honorifics dropped before names are compared
+NAME_TITLES = {'mr', 'mrs', 'ms', 'miss', 'mx', 'dr', 'prof', 'sir'}
+# Domains whose mailboxes ignore dots in the local part
+DOTLESS_DOMAINS = {'gmail.com': 'gmail.com', 'googlemail.com': 'gmail.com'}
+NAME_SEPARATORS = re.compile(r'[^0-9a-z]+')
+NON_DIGITS = re.compile(r'\D')
+# Trailing digits compared so country and trunk prefixes do not matter
+PHONE_SUFFIX_DIGITS = 8
+
+# Score weights; a pair at or above DUPLICATE_THRESHOLD is reported
+NAME_WEIGHT = 0.5
+EMAIL_WEIGHT = 0.25
+PHONE_WEIGHT = 0.25
+DUPLICATE_THRESHOLD = 0.7
+
+# Contact columns filled in on the survivor from its duplicates when blank
+MERGE_COLUMNS = ['title', 'gender', 'phone', 'message', 'address_line', 'suburb', 'postcode', 'state', 'country']
+# Tables whose rows follow a contact when it is merged
+CONTACT_REFERENCES = ['applications', 'application_documents', 'budgets']
+
+def normalize_name(name):
+    """Lowercase, strip punctuation and titles: 'Dr. Jane  O'Neil' -> 'jane o neil'"""
+    tokens = NAME_SEPARATORS.sub(' ', (name or '').lower()).split()
+    return ' '.join(token for token in tokens if token not in NAME_TITLES)
+
+def normalize_email(email):
+    """Lowercase, drop +tags and (for Gmail) dots so aliases of one mailbox compare equal"""
+    email = (email or '').strip().lower()
+    if '@' not in email:
+        return email
+    local, domain = email.rsplit('@', 1)
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        domain = DOTLESS_DOMAINS[domain]
+        local = local.replace('.', '')
+    return f"{local}@{domain}"
+
+def normalize_phone(phone):
+    """Keep only the trailing digits: '+61 2 9876 5432' and '(02) 9876-5432' compare equal"""
+    return NON_DIGITS.sub('', phone or '')[-PHONE_SUFFIX_DIGITS:]
+
+def blocking_keys(name, email, phone):
+    """Keys shared by records worth comparing; records with no key in common are never paired"""
+    keys = []
+    if '@' in email:
+        keys.append(f"e:{email}")
+        if name:
+            keys.append(f"d:{email.rsplit('@', 1)[1]}:{name[:3]}")
+    if len(phone) == PHONE_SUFFIX_DIGITS:
+        keys.append(f"p:{phone}")
+    return keys
+
+def similarity(a, b):
+    """Ratcliff/Obershelp similarity, skipping the full comparison when a cheap bound rules it out"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    if matcher.real_quick_ratio() < 0.5 or matcher.quick_ratio() < 0.5:
+        return 0.0
+    return matcher.ratio()
+
+def score_pair(a, b, threshold=0.0):
+    """Weighted duplicate score of two normalized (id, name, email, phone) records.
+
+    The exact email and phone matches are scored first; when even identical
+    names could not lift the pair to threshold, the name comparison is
+    skipped and 0.0 returned.
+    """
+    score = 0.0
+    if a[2] and a[2] == b[2]:
+        score += EMAIL_WEIGHT
+    if a[3] and a[3] == b[3]:
+        score += PHONE_WEIGHT
+    if score + NAME_WEIGHT < threshold:
+        return 0.0
+    return score + NAME_WEIGHT * similarity(a[1], b[1])
+
+def _stage_blocking_keys(conn):
+    # Normalized records and their keys live in temp tables, so blocking is a
+    # GROUP BY inside SQLite rather than a dictionary of every contact in Python
+    conn.execute('DROP TABLE IF EXISTS temp.dedupe_records')
+    conn.execute('DROP TABLE IF EXISTS temp.dedupe_keys')
+    conn.execute('CREATE TEMP TABLE dedupe_records (id INTEGER PRIMARY KEY, name TEXT, email TEXT, phone TEXT)')
+    conn.execute('CREATE TEMP TABLE dedupe_keys (key TEXT, contact_id INTEGER)')
+
+    cursor = conn.execute('SELECT id, name, email, phone FROM contacts')
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        records = [(contact_id, normalize_name(name), normalize_email(email), normalize_phone(phone))
+                   for contact_id, name, email, phone in rows]
+        conn.executemany('INSERT INTO dedupe_records VALUES (?, ?, ?, ?)', records)
+        conn.executemany('INSERT INTO dedupe_keys VALUES (?, ?)',
+                         [(key, record[0]) for record in records for key in blocking_keys(*record[1:])])
+    conn.execute('CREATE INDEX temp.idx_dedupe_keys ON dedupe_keys(key)')
+    conn.commit()
+
+def candidate_pairs(conn, max_block_size=50, window=10):
+    """Yield each pair of normalized records sharing a blocking key, once.
+
+    Blocks up to max_block_size are compared exhaustively; larger ones (a
+    common surname at a big email provider) fall back to comparing each
+    record with its window nearest neighbours in name order.
+    """
+    _stage_blocking_keys(conn)
+    rows = conn.execute('''
+        SELECT k.key, r.id, r.name, r.email, r.phone
+        FROM dedupe_keys k
+        JOIN dedupe_records r ON r.id = k.contact_id
+        WHERE k.key IN (SELECT key FROM dedupe_keys GROUP BY key HAVING COUNT(*) > 1)
+        ORDER BY k.key, r.name, r.id
+    ''')
+    seen = set()
+    for _, block in groupby(rows, key=lambda row: row[0]):
+        block = [row[1:] for row in block]
+        if len(block) <= max_block_size:
+            pairs = combinations(block, 2)
+        else:
+            pairs = ((block[i], block[j]) for i in range(len(block))
+                     for j in range(i + 1, min(i + 1 + window, len(block))))
+        for a, b in pairs:
+            pair_ids = (a[0], b[0]) if a[0] < b[0] else (b[0], a[0])
+            if pair_ids not in seen:
+                seen.add(pair_ids)
+                yield a, b
+
+def find_duplicates(conn, threshold=DUPLICATE_THRESHOLD, max_block_size=50, window=10):
+    """Return (id_a, id_b, score) for likely duplicate contacts, best matches first"""
+    matches = []
+    for a, b in candidate_pairs(conn, max_block_size, window):
+        score = score_pair(a, b, threshold)
+        if score >= threshold:
+            matches.append((min(a[0], b[0]), max(a[0], b[0]), round(score, 3)))
+    conn.execute('DROP TABLE IF EXISTS temp.dedupe_records')
+    conn.execute('DROP TABLE IF EXISTS temp.dedupe_keys')
+    matches.sort(key=lambda match: (-match[2], match[0], match[1]))
+    return matches
+
+def duplicate_clusters(matches):
+    """Group matched pairs into clusters of contact ids (union-find), each sorted oldest first"""
+    parent = {}
+
+    def find(contact_id):
+        parent.setdefault(contact_id, contact_id)
+        while parent[contact_id] != contact_id:
+            parent[contact_id] = parent[parent[contact_id]]
+            contact_id = parent[contact_id]
+        return contact_id
+
+    for a, b, _ in matches:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for contact_id in parent:
+        clusters.setdefault(find(contact_id), []).append(contact_id)
+    return sorted(sorted(cluster) for cluster in clusters.values())
+
+def merge_contacts(conn, survivor_id, duplicate_ids):
+    """Merge duplicates into survivor in one transaction.
+
+    Blank fields on the survivor are filled from the oldest duplicate that
+    has them; applications, documents and budgets are repointed to the
+    survivor; the duplicates are deleted. Returns rows moved per table.
+    """
+    duplicate_ids = [contact_id for contact_id in duplicate_ids if contact_id != survivor_id]
+    if not duplicate_ids:
+        return {}
+    ids = json.dumps(duplicate_ids)
+    moved = {}
+    with conn:
+        assignments = ', '.join(f'''
+            {column} = COALESCE(NULLIF({column}, ''), (
+                SELECT {column} FROM contacts
+                WHERE id IN (SELECT value FROM json_each(:ids)) AND COALESCE({column}, '') != ''
+                ORDER BY id LIMIT 1
+            ))''' for column in MERGE_COLUMNS)
+        conn.execute(f'UPDATE contacts SET {assignments} WHERE id = :survivor', {'ids': ids, 'survivor': survivor_id})
+        for table in CONTACT_REFERENCES:
+            cursor = conn.execute(f'''
+                UPDATE {table} SET contact_id = ? WHERE contact_id IN (SELECT value FROM json_each(?))
+            ''', (survivor_id, ids))
+            moved[table] = cursor.rowcount
+        cursor = conn.execute('DELETE FROM contacts WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+        moved['contacts'] = cursor.rowcount
+    return moved
+
+# Function to create the index used to spot an existing contact by email on insert
+def ensure_email_index(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_contacts_email_lower ON contacts(lower(trim(email)))')
+    conn.commit()
+
+def find_contacts_by_email(conn, email):
+    """Ids of contacts already using this email (case and whitespace insensitive)"""
+    rows = conn.execute('SELECT id FROM contacts WHERE lower(trim(email)) = lower(trim(?))', (email,))
+    return [row[0] for row in rows]
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Duplicate Contact Finder')
+    parser.add_argument('--db', default='crm.db', help='Database holding the contacts')
+    parser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD, help='Minimum score to report')
+    parser.add_argument('--merge', action='store_true', help='Merge every cluster into its oldest contact')
+
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    start_time = time.perf_counter()
+    matches = find_duplicates(conn, args.threshold)
+    clusters = duplicate_clusters(matches)
+    duration = time.perf_counter() - start_time
+    for a, b, score in matches:
+        print(f"{a} ~ {b}: {score:.3f}")
+    print(f"✓ Found {len(matches)} duplicate pairs in {len(clusters)} clusters in {duration:.2f} seconds")
+
+    if args.merge:
+        for cluster in clusters:
+            moved = merge_contacts(conn, cluster[0], cluster[1:])
+            print(f"✓ Merged {cluster[1:]} into {cluster[0]}: {moved}")
+    conn.close()
@@ -0,0 +1,42 @@
+import os
+import json
+import hashlib
+import tempfile
+
+DOCUMENT_STORE_DIR = "document_store"
+
+def document_key(inputs):
+    """Hash everything a document is rendered from into its content address"""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def stored_document_path(key, store_dir=DOCUMENT_STORE_DIR):
+    """Where the document with this key lives; fanned out so no directory grows huge"""
+    return os.path.join(store_dir, key[:2], f"{key}.pdf")
+
+def store_document(key, pdf_bytes, store_dir=DOCUMENT_STORE_DIR):
+    """Write a document atomically so concurrent readers never see a partial file"""
+    path = stored_document_path(key, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+def get_or_create_document(inputs, render, store_dir=DOCUMENT_STORE_DIR):
+    """Return (path, created) for the document described by inputs.
+
+    render() is only called when no document with the same inputs has been
+    stored before; it must return the PDF bytes.
+    """
+    key = document_key(inputs)
+    path = stored_document_path(key, store_dir)
+    if os.path.exists(path):
+        return path, False
+    return store_document(key, render(), store_dir), True
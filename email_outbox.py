@@ -0,0 +1,294 @@
+import json
+import logging
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import logging_config
+import process_metrics
+from mail_sender import SMTP_FROM, SMTPPool, build_message
+
+OUTBOX_TABLE = 'email_outbox'
+OUTBOX_STATUSES = ('queued', 'sending', 'sent', 'failed')
+
+outbox_depth = process_metrics.gauge('crm_email_outbox_depth', 'Emails in the outbox by status', ['status'])
+outbox_deliveries = process_metrics.counter('crm_email_outbox_deliveries_total',
+                                            'Delivery attempts by the outbox worker by outcome', ['outcome'])
+
+logger = logging.getLogger('crm.outbox')
+
+# Function to create the outbox table if it does not exist yet
+def ensure_outbox(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            from_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{OUTBOX_TABLE}_due ON {OUTBOX_TABLE}(status, next_attempt_at)')
+    conn.commit()
+
+def enqueue_email(conn, to_email, subject, body, from_email=SMTP_FROM):
+    """Queue one email for the delivery worker; returns its outbox id"""
+    cursor = conn.execute(f'''
+        INSERT INTO {OUTBOX_TABLE} (to_email, from_email, subject, body, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (to_email, from_email, subject, body, time.time()))
+    conn.commit()
+    return cursor.lastrowid
+
+def enqueue_emails(conn, emails, from_email=SMTP_FROM):
+    """Queue (to_email, subject, body) tuples in one transaction; returns the number queued.
+
+    emails may be a generator, so a whole mail-merge is streamed into the
+    outbox without being held in memory.
+    """
+    now = time.time()
+    cursor = conn.executemany(f'''
+        INSERT INTO {OUTBOX_TABLE} (to_email, from_email, subject, body, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((to_email, from_email, subject, body, now) for to_email, subject, body in emails))
+    conn.commit()
+    return cursor.rowcount
+
+def outbox_stats(conn):
+    """Queue depth per status and the age in seconds of the oldest queued email"""
+    counts = dict(conn.execute(f'SELECT status, COUNT(*) FROM {OUTBOX_TABLE} GROUP BY status').fetchall())
+    oldest = conn.execute(
+        f"SELECT MIN(strftime('%s', created_at)) FROM {OUTBOX_TABLE} WHERE status IN ('queued', 'sending')"
+    ).fetchone()[0]
+    stats = {status: counts.get(status, 0) for status in OUTBOX_STATUSES}
+    stats['oldest_pending_seconds'] = max(0, time.time() - int(oldest)) if oldest else 0
+    return stats
+
+def is_permanent_failure(error):
+    """5xx replies, refused recipients and messages that cannot be built will not succeed on retry"""
+    if not isinstance(error, OSError) or isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+class OutboxWorker:
+    """Delivers queued emails in batches with retries and exponential backoff.
+
+    Each batch is claimed in one write transaction (status 'sending'), sent
+    over a pooled SMTP connection per thread, and its outcomes written back
+    in a second transaction. Transient failures are retried after
+    base_delay * 2**(attempts - 1) seconds (capped at max_delay, with
+    jitter); permanent ones and those out of attempts are marked 'failed'.
+    Claims older than lease seconds belong to a crashed worker and are
+    picked up again.
+    """
+
+    def __init__(self, db_path='crm.db', pool=None, batch_size=50, max_attempts=5, base_delay=30,
+                 max_delay=3600, jitter=0.1, lease=300, poll_interval=1.0):
+        self.db_path = db_path
+        self.pool = pool or SMTPPool()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.started_at = time.monotonic()
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        ensure_outbox(self.conn)
+        for status in ('queued', 'sending', 'failed'):
+            outbox_depth.labels(status).set_function(lambda status=status: self.queue_depth(status))
+
+    def queue_depth(self, status):
+        """Emails with this status, read on its own connection so a scrape never joins a batch transaction"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            return conn.execute(f'SELECT COUNT(*) FROM {OUTBOX_TABLE} WHERE status = ?', (status,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def retry_delay(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay + random.uniform(0, delay * self.jitter)
+
+    def claim_batch(self):
+        """Mark the next due emails as being sent and return them"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            rows = self.conn.execute(f'''
+                SELECT id, to_email, from_email, subject, body, attempts
+                FROM {OUTBOX_TABLE}
+                WHERE (status = 'queued' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at <= ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            ''', (now, now - self.lease, self.batch_size)).fetchall()
+            if rows:
+                self.conn.execute(f'''
+                    UPDATE {OUTBOX_TABLE} SET status = 'sending', claimed_at = ?
+                    WHERE id IN (SELECT value FROM json_each(?))
+                ''', (now, json.dumps([row[0] for row in rows])))
+        return rows
+
+    def _deliver(self, row):
+        email_id, to_email, from_email, subject, body, attempts = row
+        try:
+            self.pool.send(build_message(to_email, subject, body, from_email))
+            return email_id, attempts, None
+        except Exception as e:  # smtplib errors are OSErrors; anything else (e.g. a bad header) fails the email
+            return email_id, attempts, e
+
+    def run_once(self):
+        """Deliver one batch; returns the number of emails attempted"""
+        rows = self.claim_batch()
+        if not rows:
+            return 0
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            results = list(executor.map(self._deliver, rows))
+
+        now = time.time()
+        with self.conn:
+            for email_id, attempts, error in results:
+                attempts += 1
+                if error is None:
+                    self.conn.execute(f'''
+                        UPDATE {OUTBOX_TABLE}
+                        SET status = 'sent', attempts = ?, sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                        WHERE id = ?
+                    ''', (attempts, email_id))
+                    self.sent += 1
+                    outbox_deliveries.labels('sent').inc()
+                elif is_permanent_failure(error) or attempts >= self.max_attempts:
+                    self.conn.execute(f'''
+                        UPDATE {OUTBOX_TABLE} SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?
+                    ''', (attempts, str(error), email_id))
+                    self.failed += 1
+                    outbox_deliveries.labels('failed').inc()
+                    logger.warning("Giving up on email: %s", error, extra={'email_id': email_id, 'attempts': attempts})
+                else:
+                    self.conn.execute(f'''
+                        UPDATE {OUTBOX_TABLE}
+                        SET status = 'queued', attempts = ?, last_error = ?, next_attempt_at = ?
+                        WHERE id = ?
+                    ''', (attempts, str(error), now + self.retry_delay(attempts), email_id))
+                    self.retried += 1
+                    outbox_deliveries.labels('retried').inc()
+                    # An SMTP outage fails every email in every batch
+                    logger.info("Retrying email: %s", error, extra={'email_id': email_id, 'attempts': attempts,
+                                                                    'sample': 20})
+        return len(rows)
+
+    def next_due(self):
+        """Epoch seconds when the next email becomes due (or its claim expires), or None"""
+        return self.conn.execute(f'''
+            SELECT MIN(CASE status WHEN 'queued' THEN next_attempt_at ELSE claimed_at + ? END)
+            FROM {OUTBOX_TABLE}
+            WHERE status IN ('queued', 'sending')
+        ''', (self.lease,)).fetchone()[0]
+
+    def stats(self):
+        stats = outbox_stats(self.conn)
+        elapsed = time.monotonic() - self.started_at
+        stats.update({
+            'delivered': self.sent,
+            'failed_permanently': self.failed,
+            'retries': self.retried,
+            'throughput_per_second': self.sent / elapsed if elapsed else 0.0,
+        })
+        return stats
+
+    def run_forever(self, report_every=60):
+        """Deliver until stop() is called, logging queue depth and throughput periodically.
+
+        The outbox is only queried when another connection has committed
+        (PRAGMA data_version) or a retry has come due, so an idle worker
+        costs one pragma per poll.
+        """
+        data_version = None
+        due = 0
+        last_report = time.monotonic()
+        while not self._stop.is_set():
+            # Nothing restarts this thread (the page caches the worker), so no error may end the loop
+            try:
+                current = self.conn.execute('PRAGMA data_version').fetchone()[0]
+                if current != data_version or (due is not None and time.time() >= due):
+                    data_version = current
+                    while self.run_once() == self.batch_size:
+                        pass  # Keep draining full batches before sleeping again
+                    due = self.next_due()
+
+                if time.monotonic() - last_report >= report_every:
+                    stats = self.stats()
+                    logger.info("Outbox status", extra={name: stats[name] for name in
+                                                        ('queued', 'sending', 'failed', 'throughput_per_second')})
+                    last_report = time.monotonic()
+            except Exception:
+                logger.exception("Outbox delivery error")
+                due = 0  # Try again on the next poll
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Run the worker on a daemon thread inside the current process"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='email-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        self.pool.close()
+        self.conn.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Email Outbox Delivery Worker')
+    parser.add_argument('--db', default='crm.db', help='Database holding the outbox')
+    parser.add_argument('--status', action='store_true', help='Print queue depth and exit')
+    parser.add_argument('--batch-size', type=int, default=50, help='Emails claimed per batch')
+    parser.add_argument('--max-attempts', type=int, default=5, help='Delivery attempts before giving up')
+    parser.add_argument('--pool-size', type=int, default=4, help='SMTP connections kept open')
+    parser.add_argument('--metrics-port', type=int, default=process_metrics.METRICS_PORT,
+                        help='Serve Prometheus metrics on this port (default: $CRM_METRICS_PORT, off)')
+
+    args = parser.parse_args()
+    logging_config.configure_logging()
+
+    if args.status:
+        conn = sqlite3.connect(args.db)
+        ensure_outbox(conn)
+        print(json.dumps(outbox_stats(conn), indent=2))
+        conn.close()
+    else:
+        worker = OutboxWorker(args.db, SMTPPool(size=args.pool_size), args.batch_size, args.max_attempts)
+        if args.metrics_port:
+            process_metrics.start_metrics_server(args.metrics_port)
+            logger.info("Serving metrics on http://%s:%s/metrics", process_metrics.METRICS_HOST, args.metrics_port)
+        logger.info("Delivering emails from %s", args.db)
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
+            logger.info("Outbox worker stopped")
+        worker.close()
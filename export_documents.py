@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import time
+import zipfile
+
+from blob_store import copy_blob
+
+# Status filters: signed/unsigned by signature, generated/pending by stored PDF
+EXPORT_STATUSES = {
+    'signed': "(d.signature_hash IS NOT NULL OR d.signature IS NOT NULL)",
+    'unsigned': "(d.signature_hash IS NULL AND d.signature IS NULL)",
+    'generated': "d.document_path IS NOT NULL",
+    'pending': "d.document_path IS NULL",
+}
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_COLUMNS = ['document_id', 'contact_id', 'contact_name', 'document_name', 'timestamp',
+                    'document_entry', 'signature_entry', 'note']
+
+def safe_entry_name(name):
+    """Make a contact or document name safe for use inside a zip entry name"""
+    return "".join(ch if ch.isalnum() or ch in " -_" else "_" for ch in name).strip() or "document"
+
+def zip_entry(name):
+    """Entry header for data streamed into the archive, stamped with the export time"""
+    return zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+
+def select_documents(conn, contact_ids=None, start_date=None, end_date=None, status=None):
+    """Yield application_documents rows matching the filters, oldest first.
+
+    start_date and end_date are inclusive 'YYYY-MM-DD' strings. Rows come
+    straight off the cursor so the selection is never held in memory.
+    """
+    conditions = []
+    params = []
+    if contact_ids is not None:
+        conditions.append("d.contact_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(contact_ids)))
+    if start_date:
+        conditions.append("d.timestamp >= ?")
+        params.append(str(start_date))
+    if end_date:
+        conditions.append("d.timestamp < date(?, '+1 day')")
+        params.append(str(end_date))
+    if status:
+        if status not in EXPORT_STATUSES:
+            raise ValueError(f"Unknown status {status!r}; expected one of {', '.join(EXPORT_STATUSES)}")
+        conditions.append(EXPORT_STATUSES[status])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = conn.execute(f'''
+        SELECT
+            d.id AS document_id,
+            d.contact_id,
+            c.name AS contact_name,
+            d.document_name,
+            d.document_path,
+            d.timestamp,
+            s.rowid AS signature_rowid,
+            CASE WHEN d.signature IS NOT NULL THEN d.id END AS inline_signature_rowid
+        FROM application_documents d
+        LEFT JOIN contacts c ON c.id = d.contact_id
+        LEFT JOIN signatures s ON s.hash = d.signature_hash
+        {where}
+        ORDER BY d.id
+    ''', params)
+    columns = [column[0] for column in cursor.description]
+    for row in cursor:
+        yield dict(zip(columns, row))
+
+def export_documents(conn, output, contact_ids=None, start_date=None, end_date=None, status=None):
+    """Stream the selected documents and their signatures into a zip archive.
+
+    Stored PDFs are copied from disk and signatures straight out of SQLite in
+    fixed-size chunks, so memory stays flat however many documents are
+    exported. A manifest.csv lists every selected document, including those
+    whose PDF has not been generated yet. output may be a path or a writable
+    binary file object. Returns (documents, signatures) written.
+    """
+    manifest = []
+    documents = signatures = 0
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for row in select_documents(conn, contact_ids, start_date, end_date, status):
+            folder = f"{row['contact_id'] or 0:06d}_{safe_entry_name(row['contact_name'] or 'unknown')}"
+            prefix = f"{folder}/{row['document_id']:06d}_{safe_entry_name(row['document_name'] or '')}"
+            document_entry = signature_entry = ""
+            note = ""
+
+            # PDFs are already compressed, so they are stored as-is
+            if row['document_path'] and os.path.exists(row['document_path']):
+                document_entry = f"{prefix}.pdf"
+                archive.write(row['document_path'], document_entry)
+                documents += 1
+            else:
+                note = "document missing" if row['document_path'] else "document not generated"
+
+            if row['signature_rowid'] is not None:
+                blob = ('signatures', 'image', row['signature_rowid'])
+            elif row['inline_signature_rowid'] is not None:
+                blob = ('application_documents', 'signature', row['inline_signature_rowid'])
+            else:
+                blob = None
+            if blob:
+                signature_entry = f"{prefix}_signature.png"
+                with archive.open(zip_entry(signature_entry), "w", force_zip64=True) as entry:
+                    copy_blob(conn, *blob, entry)
+                signatures += 1
+
+            manifest.append((row['document_id'], row['contact_id'], row['contact_name'], row['document_name'],
+                             row['timestamp'], document_entry, signature_entry, note))
+
+        with archive.open(zip_entry(MANIFEST_NAME), "w", force_zip64=True) as entry:
+            with io.TextIOWrapper(entry, encoding="utf-8", newline="") as text:
+                writer = csv.writer(text)
+                writer.writerow(MANIFEST_COLUMNS)
+                writer.writerows(manifest)
+    return documents, signatures
+
+if __name__ == "__main__":
+    import argparse
+    from replicate_db import open_read_replica
+    parser = argparse.ArgumentParser(description='Application Document Export')
+    parser.add_argument('contact_ids', nargs='*', type=int, help='Only export documents of these contacts')
+    parser.add_argument('--start-date', metavar='YYYY-MM-DD', help='Only documents created on or after this date')
+    parser.add_argument('--end-date', metavar='YYYY-MM-DD', help='Only documents created on or before this date')
+    parser.add_argument('--status', choices=sorted(EXPORT_STATUSES), help='Only documents with this status')
+    parser.add_argument('--db', default='crm.db', help='Database to export from')
+    parser.add_argument('-o', '--output', default='document_export.zip', help='Zip file to write')
+
+    args = parser.parse_args()
+
+    # Legacy databases keep signatures inline until the signature store migration has run
+    from crm_services.signatures import ensure_signature_store
+    ensure_signature_store(args.db)
+
+    conn = open_read_replica() if args.db == 'crm.db' else None
+    if conn is None:
+        conn = sqlite3.connect(args.db)
+    try:
+        start_time = time.perf_counter()
+        documents, signatures = export_documents(conn, args.output, args.contact_ids or None,
+                                                 args.start_date, args.end_date, args.status)
+        duration = time.perf_counter() - start_time
+        print(f"✓ Exported {documents} documents and {signatures} signatures to {args.output} in {duration:.2f} seconds")
+    finally:
+        conn.close()
@@ -0,0 +1,445 @@
+"""Deterministic synthetic CRM databases for load and performance testing.
+
+    python generate_data.py --scale large --db crm_large.db
+    python generate_data.py --contacts 50000 --budgets 10000 --seed 7 --db crm_50k.db
+
+Creates the schema from setup_db, streams every table in with one bulk
+insert each (no journal, no secondary indexes) and builds the indexes at
+the end, so the large scale (20M expenses) generates in a few minutes.
+The same seed and counts always produce the same database.
+
+Children are spread over their parents with Pareto weights: most contacts
+have no budget or one, a few have hundreds, and a few budgets hold
+thousands of line items with tens of thousands of expenses. Spent amounts
+add up from the expenses to the line items and budgets, about 1% of
+contacts are near-duplicates of an earlier one, and documents are left
+unrendered (document_path NULL) with signatures shared per contact.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from array import array
+from datetime import date, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from PIL import Image, ImageDraw
+from tqdm import tqdm
+
+from email_outbox import ensure_outbox
+from setup_db import create_indexes, create_tables
+
+# Row counts per table for each --scale; individual counts can be overridden on the command line
+SCALES = {
+    'small': {'contacts': 1000, 'applications': 500, 'documents': 300, 'signatures': 100,
+              'budgets': 200, 'line_items': 2000, 'products': 3000, 'expenses': 20000},
+    'medium': {'contacts': 100000, 'applications': 50000, 'documents': 30000, 'signatures': 5000,
+               'budgets': 20000, 'line_items': 200000, 'products': 300000, 'expenses': 2000000},
+    'large': {'contacts': 1000000, 'applications': 500000, 'documents': 300000, 'signatures': 20000,
+              'budgets': 200000, 'line_items': 2000000, 'products': 3000000, 'expenses': 20000000},
+}
+DEFAULT_SEED = 42
+# Pareto shape of the parent weights; lower is more skewed (1.16 is the 80/20 rule)
+DEFAULT_SKEW = 1.5
+DUPLICATE_RATE = 0.01  # Contacts that repeat an earlier contact with a different email and phone format
+FIRST_DATE = date(2020, 1, 1)
+DATE_RANGE_DAYS = 6 * 365
+
+FIRST_NAMES = ['James', 'Olivia', 'William', 'Charlotte', 'Jack', 'Amelia', 'Noah', 'Isla', 'Thomas', 'Mia',
+               'Oliver', 'Ava', 'Henry', 'Grace', 'Lucas', 'Chloe', 'Ethan', 'Sophie', 'Liam', 'Emily',
+               'Alex', 'Zoe', 'Samuel', 'Ruby', 'Daniel', 'Harper', 'Leo', 'Ella', 'Mohammed', 'Priya',
+               'Wei', 'Mei', 'Arjun', 'Aisha', 'Mateo', 'Sofia', 'Kai', 'Yuki', 'Nikos', 'Freya']
+LAST_NAMES = ['Smith', 'Jones', 'Williams', 'Brown', 'Wilson', 'Taylor', 'Johnson', 'White', 'Martin',
+              'Anderson', 'Thompson', 'Nguyen', 'Thomas', 'Walker', 'Harris', 'Lee', 'Ryan', 'Robinson',
+              'Kelly', 'King', 'Davis', 'Wright', 'Evans', 'Roberts', 'Green', 'Hall', 'Wood', 'Jackson',
+              'Clarke', 'Patel', 'Khan', 'Singh', 'Chen', 'Wang', 'Li', 'Kim', "O'Neil", 'Garcia',
+              'Papadopoulos', 'Rossi', 'Muller', 'Novak', 'Cohen', 'Silva', 'Tanaka', 'Murphy', 'Scott']
+TITLES_BY_GENDER = {'Male': ['Mr.', 'Dr.', 'Prof.'], 'Female': ['Ms.', 'Mrs.', 'Dr.', 'Prof.'],
+                    'Non-binary': ['Mx.', 'Dr.']}
+GENDERS = ['Male', 'Female', 'Non-binary']
+GENDER_WEIGHTS = [48, 48, 4]
+EMAIL_DOMAINS = ['gmail.com', 'outlook.com', 'yahoo.com', 'icloud.com', 'bigpond.com', 'example.com',
+                 'company.com.au', 'uni.edu.au']
+STREETS = ['Main St', 'High St', 'George St', 'King St', 'Church St', 'Station Rd', 'Park Ave', 'Elm St',
+           'Oak St', 'Pine St', 'Maple St', 'Victoria Rd', 'Queen St', 'Beach Rd', 'Hill St']
+# (state, suburbs, postcode prefix, share of contacts)
+LOCATIONS = [
+    ('NSW', ['Sydney', 'Parramatta', 'Newcastle', 'Wollongong', 'Bondi', 'Chatswood'], '2', 32),
+    ('VIC', ['Melbourne', 'Geelong', 'Ballarat', 'Richmond', 'St Kilda', 'Bendigo'], '3', 26),
+    ('QLD', ['Brisbane', 'Gold Coast', 'Cairns', 'Townsville', 'Toowoomba'], '4', 20),
+    ('WA', ['Perth', 'Fremantle', 'Joondalup', 'Bunbury'], '6', 10),
+    ('SA', ['Adelaide', 'Glenelg', 'Mount Gambier'], '5', 7),
+    ('TAS', ['Hobart', 'Launceston'], '7', 2),
+    ('ACT', ['Canberra', 'Belconnen'], '26', 2),
+    ('NT', ['Darwin', 'Alice Springs'], '08', 1),
+]
+MESSAGES = ['Interested in testing.', 'Looking to apply.', 'Please call me back.', 'Just exploring.',
+            'Referred by a friend.', 'Would like a quote.', 'Following up on my application.',
+            'Can you send more information?', '']
+APPLICATIONS = [
+    ('Data Analyst', 'Interested in data processing and analysis.', 'Excel, Python, SQL'),
+    ('Web Developer', 'Want to build websites and web applications.', 'HTML, CSS, JavaScript'),
+    ('AI Researcher', 'Passionate about machine learning and AI technologies.', 'Python, TensorFlow, Keras'),
+    ('Project Manager', 'Looking to manage large-scale projects.', 'Leadership, Agile, Communication'),
+    ('Content Writer', 'Love creating content and articles for blogs and websites.', 'Writing, SEO, Research'),
+    ('Designer', 'Enjoy shaping how products look and feel.', 'Figma, Illustration, User Research'),
+    ('Support Officer', 'Like helping people solve problems.', 'Communication, Patience, CRM Tools'),
+]
+BUDGET_THEMES = ['Marketing', 'Web Development', 'AI Research', 'Project Management', 'Client Project',
+                 'Operations', 'Training', 'Events', 'Product Launch', 'Infrastructure']
+BUDGET_STATUSES = ['Active', 'Completed', 'On Hold']
+BUDGET_STATUS_WEIGHTS = [70, 25, 5]
+CURRENCIES = ['AUD', 'USD', 'EUR', 'GBP', 'NZD']
+CURRENCY_WEIGHTS = [60, 25, 8, 4, 3]
+BUDGET_DAYS = [90, 180, 365, 365, 730]
+LINE_ITEM_NAMES = ['Social Media Marketing', 'Content Creation', 'Email Campaigns', 'Website Development',
+                   'UI/UX Design', 'Frontend Development', 'Backend Development', 'Research Personnel',
+                   'Computing Resources', 'Project Tools', 'Team Training', 'Travel', 'Contractors',
+                   'Licensing', 'Hardware', 'Catering', 'Venue Hire', 'Printing', 'Legal', 'Contingency']
+# (product name, group, base rate, frequency, service name, description)
+PRODUCT_CATALOG = [
+    ('Facebook Ads Management', 'Digital Marketing', 150.00, 'hourly', 'Social Media', 'Managing Facebook ad campaigns'),
+    ('Instagram Content', 'Digital Marketing', 100.00, 'hourly', 'Social Media', 'Creating and scheduling Instagram posts'),
+    ('Blog Writing', 'Content', 75.00, 'hourly', 'Content Creation', 'Writing blog posts and articles'),
+    ('Video Production', 'Content', 200.00, 'hourly', 'Content Creation', 'Creating promotional videos'),
+    ('Email Template Design', 'Digital Marketing', 120.00, 'hourly', 'Email Marketing', 'Designing email templates'),
+    ('WordPress Development', 'Development', 90.00, 'hourly', 'Web Development', 'Custom WordPress development'),
+    ('UI Design Package', 'Design', 2000.00, 'weekly', 'Design Services', 'Complete UI design package'),
+    ('React Development', 'Development', 110.00, 'hourly', 'Web Development', 'Frontend development using React'),
+    ('API Development', 'Development', 130.00, 'hourly', 'Web Development', 'Building REST APIs'),
+    ('Data Scientist', 'Research', 150.00, 'hourly', 'AI Research', 'AI/ML research and development'),
+    ('Cloud Computing', 'Infrastructure', 500.00, 'monthly', 'Cloud Services', 'AWS computing resources'),
+    ('Project Management Software', 'Tools', 50.00, 'monthly', 'PM Tools', 'Project management software licenses'),
+    ('Agile Training Course', 'Training', 1500.00, 'weekly', 'Training Services', 'Team training in Agile methodologies'),
+    ('Venue Hire', 'Events', 800.00, 'daily', 'Events', 'Conference room and venue bookings'),
+    ('Laptop Lease', 'Hardware', 90.00, 'monthly', 'Equipment', 'Leased laptops for the team'),
+    ('Legal Review', 'Professional Services', 350.00, 'hourly', 'Legal', 'Contract and compliance review'),
+]
+QUANTITIES = [1, 1, 1, 2, 2, 3, 4, 5, 8, 10, 20, 0.5, 1.5]
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+               'October', 'November', 'December']
+
+def zipf_cum_weights(count, exponent=1.0):
+    """Cumulative weights for random.choices where the first entries are the most common"""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+def pareto_counts(rng, parents, total, skew=DEFAULT_SKEW):
+    """Split total children over parents in proportion to Pareto weights; the counts sum to total"""
+    counts = array('l', bytes(array('l').itemsize * parents))
+    if not parents or not total:
+        return counts
+    weights = array('d', (rng.paretovariate(skew) for _ in range(parents)))
+    scale = total / sum(weights)
+    cumulative = 0.0
+    assigned = 0
+    for index, weight in enumerate(weights):
+        cumulative += weight
+        target = min(int(cumulative * scale), total)
+        counts[index] = target - assigned
+        assigned = target
+    counts[-1] += total - assigned  # Rounding can leave the last few unassigned
+    return counts
+
+def owners(counts):
+    """Parent index (0-based) for each child when children are laid out in parent order"""
+    result = array('l')
+    for parent, count in enumerate(counts):
+        if count:
+            result.extend([parent] * count)
+    return result
+
+def contact_rows(rng, count):
+    random_ = rng.random
+    first_weights = zipf_cum_weights(len(FIRST_NAMES))
+    last_weights = zipf_cum_weights(len(LAST_NAMES), 0.8)
+    location_weights = list(accumulate(location[3] for location in LOCATIONS))
+    recent = []
+    for contact_id in range(1, count + 1):
+        if recent and random_() < DUPLICATE_RATE:
+            # The same person signing up again: a different email, phone written differently
+            title, gender, name, first, last, phone, address, suburb, postcode, state = rng.choice(recent)
+            email = f"{first}{last}{contact_id}@{rng.choice(EMAIL_DOMAINS)}".upper()
+            phone = f"+61 {phone[1:4]} {phone[4:7]} {phone[7:]}"
+        else:
+            gender = rng.choices(GENDERS, GENDER_WEIGHTS)[0]
+            title = rng.choice(TITLES_BY_GENDER[gender])
+            first = rng.choices(FIRST_NAMES, cum_weights=first_weights)[0]
+            last = rng.choices(LAST_NAMES, cum_weights=last_weights)[0]
+            name = f"{first} {last}"
+            email = f"{first}.{last}{contact_id}@{rng.choice(EMAIL_DOMAINS)}".lower().replace("'", "")
+            phone = f"04{int(random_() * 100000000):08d}"
+            state, suburbs, prefix, _ = rng.choices(LOCATIONS, cum_weights=location_weights)[0]
+            suburb = rng.choice(suburbs)
+            postcode = (prefix + f"{int(random_() * 1000):03d}")[:4]
+            address = f"{int(random_() * 300) + 1} {rng.choice(STREETS)}"
+            if len(recent) < 1000:
+                recent.append((title, gender, name, first, last, phone, address, suburb, postcode, state))
+            else:
+                recent[contact_id % 1000] = (title, gender, name, first, last, phone, address, suburb, postcode, state)
+        yield (contact_id, title, gender, name, email, phone, rng.choice(MESSAGES), address, suburb, postcode,
+               state, 'Australia')
+
+def signature_image(rng):
+    """A compact 1-bit PNG of a random pen stroke, like crm_services.signatures.compact_signature stores"""
+    width, height = rng.randint(120, 360), rng.randint(30, 90)
+    image = Image.new('1', (width, height), 1)
+    draw = ImageDraw.Draw(image)
+    x, y = 2, height // 2
+    points = [(x, y)]
+    while x < width - 3:
+        x = min(x + rng.randint(2, 12), width - 3)
+        y = max(2, min(height - 3, y + rng.randint(-12, 12)))
+        points.append((x, y))
+    draw.line(points, fill=0, width=2)
+    with BytesIO() as buffer:
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), width, height
+
+def day_strings(days):
+    return [(FIRST_DATE + timedelta(days=offset)).isoformat() for offset in range(days)]
+
+# Function to build a synthetic database at db_path; returns the row counts and seconds per table
+def generate_database(db_path, counts, seed=DEFAULT_SEED, skew=DEFAULT_SKEW, progress=True):
+    temp_path = db_path + '.generating'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    # Nothing here needs to survive a crash: the file is only moved into place once complete
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+    conn.execute('PRAGMA cache_size=-262144')  # 256 MB
+    conn.execute('PRAGMA temp_store=MEMORY')
+    cursor = conn.cursor()
+    create_tables(cursor)
+
+    timings = {}
+    day_names = day_strings(DATE_RANGE_DAYS + max(BUDGET_DAYS))
+    # created_at is set from the generated dates; the column default would make every run differ
+    day_times = [f"{day} 09:00:00" for day in day_names]
+    seed_text = str(seed)
+
+    def stream(table, sql, rows, total):
+        """Insert one table in a single transaction from a row generator"""
+        started = time.perf_counter()
+        if progress:
+            rows = tqdm(rows, total=total, desc=table, unit=' rows', mininterval=1, miniters=10000)
+        with conn:
+            conn.executemany(sql, rows)
+        timings[table] = time.perf_counter() - started
+
+    def table_rng(table):
+        # One stream per table, so changing one table's count leaves the others' rows unchanged
+        return random.Random(f"{seed_text}:{table}")
+
+    contacts = counts['contacts']
+    stream('contacts', '''
+        INSERT INTO contacts (id, title, gender, name, email, phone, message, address_line, suburb, postcode,
+                              state, country)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', contact_rows(table_rng('contacts'), contacts), contacts)
+
+    # Applications: one for a random subset of contacts
+    rng = table_rng('applications')
+    applicants = sorted(rng.sample(range(1, contacts + 1), min(counts['applications'], contacts)))
+    stream('applications', '''
+        INSERT INTO applications (id, contact_id, interest, reason, skillsets) VALUES (?, ?, ?, ?, ?)
+    ''', ((application_id, contact_id, *rng.choice(APPLICATIONS))
+          for application_id, contact_id in enumerate(applicants, 1)), len(applicants))
+
+    # Documents: skewed over applicants; signed applicants share one signature across their documents
+    rng = table_rng('documents')
+    documents_per_applicant = pareto_counts(rng, len(applicants), counts['documents'] if applicants else 0, skew)
+    with_documents = [contact_id for contact_id, count in zip(applicants, documents_per_applicant) if count]
+    signed = rng.sample(with_documents, min(counts['signatures'], len(with_documents)))
+    signature_rng = table_rng('signatures')
+    signature_hashes = {}
+    signature_rows = {}
+    for contact_id in signed:
+        image, width, height = signature_image(signature_rng)
+        signature_hash = hashlib.sha256(image).hexdigest()
+        signature_hashes[contact_id] = signature_hash
+        created_at = day_times[int(signature_rng.random() * DATE_RANGE_DAYS)]
+        signature_rows[signature_hash] = (signature_hash, image, width, height, created_at)  # Identical strokes stored once
+    stream('signatures', 'INSERT INTO signatures (hash, image, width, height, created_at) VALUES (?, ?, ?, ?, ?)',
+           signature_rows.values(), len(signature_rows))
+
+    def document_rows(rng):
+        document_id = 0
+        for contact_id, count in zip(applicants, documents_per_applicant):
+            for _ in range(count):
+                document_id += 1
+                timestamp = f"{day_names[int(rng.random() * DATE_RANGE_DAYS)]} {rng.randrange(8, 18):02d}:{rng.randrange(60):02d}:00"
+                yield (document_id, contact_id, f"Application Form {contact_id}", None,
+                       signature_hashes.get(contact_id), timestamp)
+    stream('application_documents', '''
+        INSERT INTO application_documents (id, contact_id, document_name, document_path, signature_hash, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', document_rows(rng), sum(documents_per_applicant))
+
+    # The budget tree is laid out parent by parent: budgets by contact, line items by budget, and
+    # products and expenses by line item, so a parent's children have consecutive ids
+    rng = table_rng('budgets')
+    budgets_per_contact = pareto_counts(rng, contacts, counts['budgets'], skew)
+    budget_count = sum(budgets_per_contact)
+    budget_start = array('l', (int(rng.random() * DATE_RANGE_DAYS) for _ in range(budget_count)))
+    budget_days = array('l', (rng.choice(BUDGET_DAYS) for _ in range(budget_count)))
+
+    rng = table_rng('line_items')
+    line_items_per_budget = pareto_counts(rng, budget_count, counts['line_items'] if budget_count else 0, skew)
+    line_item_budget = owners(line_items_per_budget)
+    line_item_count = len(line_item_budget)
+
+    rng = table_rng('products')
+    products_per_line_item = pareto_counts(rng, line_item_count, counts['products'] if line_item_count else 0, skew)
+    product_count = sum(products_per_line_item)
+    product_catalog = array('b', (int(rng.random() * len(PRODUCT_CATALOG)) for _ in range(product_count)))
+    product_rate = array('d', (round(PRODUCT_CATALOG[entry][2] * (0.8 + 0.45 * rng.random()), 2)
+                               for entry in product_catalog))
+
+    def product_rows():
+        product_id = 0
+        for line_item_index, count in enumerate(products_per_line_item):
+            for _ in range(count):
+                name, group, _, frequency, service, description = PRODUCT_CATALOG[product_catalog[product_id]]
+                yield (product_id + 1, line_item_index + 1, name, group, product_rate[product_id], frequency,
+                       service, description, day_times[budget_start[line_item_budget[line_item_index]]])
+                product_id += 1
+    stream('products', '''
+        INSERT INTO products (id, line_item_id, product_name, product_group, rate, frequency, service_name,
+                              description, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', product_rows(), product_count)
+
+    rng = table_rng('expenses')
+    expenses_per_line_item = pareto_counts(rng, line_item_count, counts['expenses'] if line_item_count else 0, skew)
+    line_item_spent = array('d', bytes(array('d').itemsize * line_item_count))
+    descriptions = [f"{month} {entry[0]}" for entry in PRODUCT_CATALOG for month in MONTH_NAMES]
+    day_months = array('b', (int(day[5:7]) - 1 for day in day_names))
+
+    def expense_rows(rng):
+        random_ = rng.random
+        quantities = QUANTITIES
+        quantity_count = len(QUANTITIES)
+        expense_id = 0
+        first_product = 0
+        for line_item_index, count in enumerate(expenses_per_line_item):
+            product_choices = products_per_line_item[line_item_index]
+            if count:
+                budget = line_item_budget[line_item_index]
+                start, days = budget_start[budget], budget_days[budget]
+                spent = 0.0
+                for _ in range(count):
+                    expense_id += 1
+                    day = start + int(random_() * days)
+                    if product_choices:
+                        product = first_product + int(random_() * product_choices)
+                        entry = product_catalog[product]
+                        amount = round(product_rate[product] * (0.9 + 0.2 * random_()), 2)
+                        product += 1
+                    else:
+                        product, entry = None, int(random_() * len(PRODUCT_CATALOG))
+                        amount = round(50 + 450 * random_(), 2)
+                    quantity = quantities[int(random_() * quantity_count)]
+                    spent += amount * quantity
+                    yield (expense_id, line_item_index + 1, product, amount, quantity, day_names[day],
+                           descriptions[entry * 12 + day_months[day]], day_times[day])
+                line_item_spent[line_item_index] = spent
+            first_product += product_choices
+    stream('expenses', '''
+        INSERT INTO expenses (id, line_item_id, product_id, amount, quantity, date_incurred, description, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', expense_rows(rng), counts['expenses'] if line_item_count else 0)
+
+    # Line items and budgets go in last so their spent amounts can be the sums of what was generated
+    budget_allocated = array('d', bytes(array('d').itemsize * budget_count))
+    budget_spent = array('d', bytes(array('d').itemsize * budget_count))
+
+    def line_item_rows(rng):
+        for line_item_index, budget in enumerate(line_item_budget):
+            spent = round(line_item_spent[line_item_index], 2)
+            # Most line items are under their allocation, some have overrun it
+            allocated = round(spent * (0.85 + 0.75 * rng.random()) if spent else 1000 + 19000 * rng.random(), 2)
+            budget_allocated[budget] += allocated
+            budget_spent[budget] += spent
+            yield (line_item_index + 1, budget + 1, rng.choice(LINE_ITEM_NAMES), allocated, spent,
+                   'Active' if rng.random() < 0.9 else 'Closed', day_times[budget_start[budget]])
+    stream('budget_line_items', '''
+        INSERT INTO budget_line_items (id, budget_id, line_item_name, allocated_amount, spent_amount, status,
+                                       created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', line_item_rows(table_rng('line_item_rows')), line_item_count)
+
+    def budget_rows(rng):
+        budget = 0
+        for contact_index, count in enumerate(budgets_per_contact):
+            for _ in range(count):
+                start = budget_start[budget]
+                allocated = budget_allocated[budget] or 5000 + 95000 * rng.random()
+                yield (budget + 1, contact_index + 1,
+                       f"{day_names[start][:4]} {rng.choice(BUDGET_THEMES)}",
+                       round(allocated * (1 + 0.25 * rng.random()), 2), round(budget_spent[budget], 2),
+                       day_names[start], day_names[start + budget_days[budget]],
+                       rng.choices(CURRENCIES, CURRENCY_WEIGHTS)[0],
+                       rng.choices(BUDGET_STATUSES, BUDGET_STATUS_WEIGHTS)[0], day_times[start])
+                budget += 1
+    stream('budgets', '''
+        INSERT INTO budgets (id, contact_id, budget_name, total_budget, current_spent, start_date, end_date,
+                             currency, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', budget_rows(table_rng('budget_rows')), budget_count)
+
+    # Building each index once over sorted keys is much cheaper than maintaining it row by row
+    started = time.perf_counter()
+    create_indexes(cursor)
+    ensure_outbox(conn)
+    conn.commit()
+    timings['indexes'] = time.perf_counter() - started
+    conn.close()
+
+    for suffix in ('-wal', '-shm', '-journal'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(temp_path, db_path)
+
+    row_counts = {
+        'contacts': contacts, 'applications': len(applicants), 'application_documents': sum(documents_per_applicant),
+        'signatures': len(signature_rows), 'budgets': budget_count, 'budget_line_items': line_item_count,
+        'products': product_count, 'expenses': counts['expenses'] if line_item_count else 0,
+    }
+    return row_counts, timings
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Synthetic CRM Data Generator')
+    parser.add_argument('--db', default='crm_synthetic.db', help='Database file to create')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Preset row counts (default: small)')
+    for table in SCALES['small']:
+        parser.add_argument(f"--{table.replace('_', '-')}", type=int, metavar='N',
+                            help=f"Number of {table.replace('_', ' ')} (overrides --scale)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Random seed; the same seed gives the same data')
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW,
+                        help='Pareto shape for children per parent; lower is more skewed')
+    parser.add_argument('--force', action='store_true', help='Replace the database if it already exists')
+    parser.add_argument('--quiet', action='store_true', help='No progress bars')
+
+    args = parser.parse_args()
+
+    if os.path.exists(args.db) and not args.force:
+        print(f"❌ {args.db} already exists; use --force to replace it")
+        raise SystemExit(1)
+    counts = dict(SCALES[args.scale])
+    for table in counts:
+        if getattr(args, table) is not None:
+            counts[table] = getattr(args, table)
+
+    start_time = time.perf_counter()
+    row_counts, timings = generate_database(args.db, counts, args.seed, args.skew, not args.quiet)
+    duration = time.perf_counter() - start_time
+    for table, rows in row_counts.items():
+        print(f"  - {table}: {rows:,} rows in {timings.get(table, 0):.1f}s")
+    print(f"  - indexes: {timings['indexes']:.1f}s")
+    size = os.path.getsize(args.db) / (1024 * 1024)
+    print(f"✓ Generated {args.db} ({size:.1f} MB) in {duration:.1f} seconds")
@@ -1,4 +1,8 @@
 import streamlit as st
+import performance_panel
+
+# Time this run for the performance panel
+performance_panel.start_page()
 
 def home():
     st.set_page_config(page_title="CRM - Home", page_icon=":house:", layout="wide")
@@ -193,3 +197,4 @@ def home():
 
 if __name__ == "__main__":
     home()
+    performance_panel.render()
@@ -1,4 +1,155 @@
+"""Structured logging for the CRM.
+
+Everything logs to a logger under 'crm' (crm.backup, crm.outbox,
+crm.pages.document_generator, ...). configure_logging() gives the 'crm'
+tree one queue handler: the calling thread only puts the record on a
+queue, and a listener thread formats it as one JSON object per line on
+stderr, so a page run or API request never waits on a terminal write.
+
+    CRM_LOG_LEVEL=INFO                          level of the 'crm' tree
+    CRM_LOG_LEVELS=crm.db=DEBUG,crm.api=WARNING  per-logger overrides
+    CRM_LOG_FORMAT=json                         or 'text' for reading at a terminal
+
+High-frequency events pass extra={'sample': N} to keep one record in N
+(the first, then every Nth); the kept record carries "sample": N so counts
+can be scaled back up. Records also carry the correlation fields bound for
+the current page run or API request (session_id, rerun_id, page,
+request_id), see bind_context() and log_context().
+"""
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get('CRM_LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('CRM_LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('CRM_LOG_FORMAT', 'json')
+ROOT_LOGGER = 'crm'
+
+# Attributes every LogRecord has; anything else on a record came from extra= and is logged as a field
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'context'}
+
+_context = contextvars.ContextVar('crm_log_context', default={})
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+# Function to replace the correlation fields for the rest of this thread's work, e.g. a page run
+def bind_context(**fields):
+    _context.set({name: value for name, value in fields.items() if value is not None})
+
+# Function to add correlation fields for the duration of a block, e.g. one API request
+@contextmanager
+def log_context(**fields):
+    token = _context.set({**_context.get(), **{name: value for name, value in fields.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+class ContextFilter(logging.Filter):
+    """Copies the caller's correlation fields onto the record before it changes threads"""
+    def filter(self, record):
+        record.context = _context.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records logged with extra={'sample': N}, counted per logger and message"""
+    def __init__(self):
+        super().__init__()
+        self.seen = {}
+
+    def filter(self, record):
+        rate = getattr(record, 'sample', 1)
+        if rate <= 1:
+            return True
+        key = (record.name, record.msg)
+        count = self.seen.get(key, 0)
+        self.seen[key] = count + 1  # A lost increment under a race only shifts which record is kept
+        return count % rate == 0
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', {}))
+        entry.update((name, value) for name, value in vars(record).items() if name not in STANDARD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        fields = {**getattr(record, 'context', {}),
+                  **{name: value for name, value in vars(record).items() if name not in STANDARD_ATTRIBUTES}}
+        return text + ''.join(f" {name}={value}" for name, value in fields.items())
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps extra fields and the traceback separate from the message"""
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def parse_levels(spec):
+    """'crm.db=DEBUG,crm.api=WARNING' -> {'crm.db': 'DEBUG', 'crm.api': 'WARNING'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+# Function to set up the 'crm' loggers; cheap to call again, and only reconfigures when given arguments
+def configure_logging(stream=None, level=None, levels=None, log_format=None):
+    global _listener, _handler
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+    if _listener is not None and stream is None and level is None and levels is None and log_format is None:
+        return
+    with _lock:
+        if _listener is not None:
+            shutdown_logging()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(TextFormatter() if (log_format or LOG_FORMAT) == 'text' else JsonFormatter())
+        _handler = StructuredQueueHandler(queue.SimpleQueue())
+        _handler.addFilter(SamplingFilter())
+        _handler.addFilter(ContextFilter())
+        _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level or LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False  # Keep CRM records out of whatever the host (e.g. Streamlit) configured
+        for name, module_level in {**parse_levels(LOG_LEVELS), **(levels or {})}.items():
+            logging.getLogger(name).setLevel(module_level)
+
+# Function to flush queued records and detach the handler
+def shutdown_logging():
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+        _listener = _handler = None
 
-def configure_logging():
-    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
\ No newline at end of file
+atexit.register(shutdown_logging)
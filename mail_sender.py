@@ -0,0 +1,240 @@
+import os
+import queue
+import sqlite3
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import process_metrics
+from mail_templates import render_merge
+
+# Connection settings, overridable from the environment so credentials stay out of the code
+SMTP_HOST = os.environ.get('CRM_SMTP_HOST', 'smtp-relay.brevo.com')
+SMTP_PORT = int(os.environ.get('CRM_SMTP_PORT', '587'))
+SMTP_USER = os.environ.get('CRM_SMTP_USER', '8542f6001@smtp-brevo.com')
+SMTP_PASSWORD = os.environ.get('CRM_SMTP_PASSWORD', '')
+SMTP_FROM = os.environ.get('CRM_SMTP_FROM', SMTP_USER)
+SMTP_STARTTLS = os.environ.get('CRM_SMTP_STARTTLS', '1') != '0'
+
+send_duration = process_metrics.histogram('crm_email_send_seconds', 'Time to hand one email to the SMTP server')
+send_failures = process_metrics.counter('crm_email_send_failures_total', 'Emails the SMTP server did not accept')
+smtp_connections_opened = process_metrics.counter('crm_smtp_connections_opened_total',
+                                                  'SMTP sessions opened (handshake, STARTTLS and AUTH)')
+
+class SMTPPool:
+    """A small pool of authenticated SMTP connections that are reused across messages.
+
+    Opening a connection costs a TCP handshake, STARTTLS and AUTH; a pooled
+    connection pays that once and then sends many messages. Connections are
+    recycled after max_messages (servers cap messages per session) and probed
+    with NOOP after sitting idle for longer than idle_check seconds.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=SMTP_USER, password=SMTP_PASSWORD,
+                 size=4, starttls=SMTP_STARTTLS, max_messages=500, idle_check=30, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.starttls = starttls
+        self.max_messages = max_messages
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # most recently used first, so spare connections age out
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.password:
+                server.login(self.username, self.password)
+        except BaseException:
+            server.close()  # The socket is open; don't leave it to the garbage collector
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        smtp_connections_opened.inc()
+        return {'server': server, 'sent': 0, 'last_used': time.monotonic()}
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection['server'].quit()
+        except OSError:
+            connection['server'].close()
+
+    def _checkout(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if connection['sent'] >= self.max_messages:
+                self._discard(connection)
+                continue
+            if time.monotonic() - connection['last_used'] > self.idle_check:
+                try:
+                    connection['server'].noop()
+                except OSError:
+                    connection['server'].close()
+                    continue
+            return connection
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for exclusive use; broken connections are not returned to the pool"""
+        with self._slots:
+            connection = self._checkout()
+            try:
+                yield connection
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server rejected this message but the session is still usable
+                self._release(connection)
+                raise
+            except BaseException:
+                connection['server'].close()
+                raise
+            self._release(connection)
+
+    def _release(self, connection):
+        connection['last_used'] = time.monotonic()
+        self._idle.put(connection)
+
+    def send(self, message, from_email=None):
+        """Send one message, reconnecting once if the pooled connection was dropped by the server"""
+        from_email = from_email or message['From']
+        started = time.perf_counter()
+        try:
+            for attempt in range(2):
+                try:
+                    with self.connection() as connection:
+                        connection['server'].send_message(message, from_addr=from_email)
+                        connection['sent'] += 1
+                    with self._lock:
+                        self.messages_sent += 1
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    if attempt:
+                        raise
+        except OSError:
+            send_failures.inc()
+            raise
+        finally:
+            send_duration.observe(time.perf_counter() - started)
+
+    def close(self):
+        """Quit every idle connection"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Function to build a plain-text email
+def build_message(to_email, subject, body, from_email=SMTP_FROM):
+    message = MIMEMultipart()
+    message['From'] = from_email
+    message['To'] = to_email
+    message['Subject'] = subject
+    message.attach(MIMEText(body, 'plain'))
+    return message
+
+def send_bulk(pool, messages, workers=None):
+    """Send messages over the pool with one thread per pooled connection.
+
+    messages may be a generator: it is consumed on the calling thread (so it
+    can read from SQLite) into a bounded queue, keeping only a few messages
+    in memory at a time. Returns (sent, failures) where failures is a list
+    of (recipient, error).
+    """
+    workers = workers or pool.size
+    pending = queue.Queue(maxsize=workers * 4)
+    failures = []
+    sent = [0]
+    lock = threading.Lock()
+
+    def deliver():
+        while True:
+            message = pending.get()
+            if message is None:
+                return
+            try:
+                pool.send(message)
+                with lock:
+                    sent[0] += 1
+            except Exception as e:  # smtplib errors are OSErrors; anything else must not kill the worker either
+                with lock:
+                    failures.append((message['To'], str(e)))
+
+    threads = [threading.Thread(target=deliver, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for message in messages:
+            pending.put(message)
+    finally:
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+    return sent[0], failures
+
+def mail_merge(pool, conn, subject_template, body_template, contact_ids=None, state=None, country=None,
+               from_email=SMTP_FROM):
+    """Send a personalised copy of the templates to every matching contact.
+
+    Templates are compiled once and every recipient's fields come from a
+    single query. Messages are rendered lazily as the sender threads
+    consume them, so a large campaign never holds every message in memory.
+    """
+    messages = (
+        build_message(email, subject, body, from_email)
+        for _, email, (subject, body) in render_merge(conn, [subject_template, body_template],
+                                                      contact_ids, state, country)
+        if email
+    )
+    return send_bulk(pool, messages)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Bulk Mail-Merge Sender')
+    parser.add_argument('contact_ids', nargs='*', type=int, help='Only mail these contacts (default: all)')
+    parser.add_argument('--subject', required=True, help='Subject template, e.g. "Hello {name}"')
+    parser.add_argument('--body-file', required=True, help='Text file holding the body template')
+    parser.add_argument('--state', help='Only contacts in this state')
+    parser.add_argument('--country', help='Only contacts in this country')
+    parser.add_argument('--pool-size', type=int, default=4, help='SMTP connections kept open')
+    parser.add_argument('--db', default='crm.db', help='Database holding the contacts')
+
+    args = parser.parse_args()
+
+    with open(args.body_file, encoding='utf-8') as f:
+        body_template = f.read()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        with SMTPPool(size=args.pool_size) as pool:
+            start_time = time.perf_counter()
+            sent, failures = mail_merge(pool, conn, args.subject, body_template,
+                                        args.contact_ids or None, args.state, args.country)
+            duration = time.perf_counter() - start_time
+        for recipient, error in failures:
+            print(f"❌ {recipient}: {error}")
+        print(f"✓ Sent {sent} emails over {pool.connections_opened} connections in {duration:.2f} seconds")
+    finally:
+        conn.close()
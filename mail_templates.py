@@ -0,0 +1,180 @@
+import json
+import string
+import time
+from functools import lru_cache
+from operator import itemgetter
+
+# Placeholder name -> (SQL expression, join it needs). Text fields are never NULL so
+# templates render blanks, and money fields default to 0 so numeric formats still apply.
+MERGE_FIELDS = {
+    'id': ("c.id", None),
+    'title': ("COALESCE(c.title, '')", None),
+    'gender': ("COALESCE(c.gender, '')", None),
+    'name': ("COALESCE(c.name, '')", None),
+    'first_name': ("CASE WHEN instr(c.name, ' ') > 0 THEN substr(c.name, 1, instr(c.name, ' ') - 1) "
+                   "ELSE COALESCE(c.name, '') END", None),
+    'email': ("COALESCE(c.email, '')", None),
+    'phone': ("COALESCE(c.phone, '')", None),
+    'address_line': ("COALESCE(c.address_line, '')", None),
+    'suburb': ("COALESCE(c.suburb, '')", None),
+    'postcode': ("COALESCE(c.postcode, '')", None),
+    'state': ("COALESCE(c.state, '')", None),
+    'country': ("COALESCE(c.country, '')", None),
+    'interest': ("COALESCE(a.interest, '')", 'application'),
+    'reason': ("COALESCE(a.reason, '')", 'application'),
+    'skillsets': ("COALESCE(a.skillsets, '')", 'application'),
+    'budget_count': ("COALESCE(b.budget_count, 0)", 'budgets'),
+    'active_budgets': ("COALESCE(b.active_budgets, 0)", 'budgets'),
+    'budget_total': ("COALESCE(b.budget_total, 0)", 'budgets'),
+    'budget_spent': ("COALESCE(b.budget_spent, 0)", 'budgets'),
+    'budget_remaining': ("COALESCE(b.budget_total - b.budget_spent, 0)", 'budgets'),
+}
+
+MERGE_JOINS = {
+    # The contact's latest application
+    'application': '''
+        LEFT JOIN applications a ON a.id = (
+            SELECT MAX(id) FROM applications WHERE contact_id = c.id
+        )''',
+    # One summary row per contact. Spending is totalled from expenses, as get_budget_details
+    # does; budgets.current_spent is not kept up to date by the app
+    'budgets': '''
+        LEFT JOIN (
+            SELECT
+                bu.contact_id,
+                COUNT(*) AS budget_count,
+                SUM(bu.status = 'Active') AS active_budgets,
+                SUM(bu.total_budget) AS budget_total,
+                COALESCE(SUM(spending.spent), 0) AS budget_spent
+            FROM budgets bu
+            LEFT JOIN (
+                SELECT bli.budget_id, SUM(e.amount * e.quantity) AS spent
+                FROM budget_line_items bli
+                JOIN expenses e ON e.line_item_id = bli.id
+                GROUP BY bli.budget_id
+            ) spending ON spending.budget_id = bu.id
+            GROUP BY bu.contact_id
+        ) b ON b.contact_id = c.id''',
+}
+
+class CompiledTemplate:
+    """A template reduced to one positional str.format call.
+
+    "Hi {first_name}, {budget_remaining:,.2f} left" compiles to
+    "Hi {0}, {1:,.2f} left" plus the field order, so rendering a row is a
+    single C-level format with no name lookups.
+    """
+
+    def __init__(self, source, fields, format_string):
+        self.source = source
+        self.fields = fields
+        self.format_string = format_string
+
+    def render(self, values):
+        """Render from a sequence of values in self.fields order"""
+        return self.format_string.format(*values)
+
+    def render_dict(self, record):
+        """Render from a mapping of field name to value"""
+        return self.format_string.format(*[record[field] for field in self.fields])
+
+@lru_cache(maxsize=256)
+def compile_template(source):
+    """Compile a {field} template once; unknown fields raise ValueError"""
+    fields = []
+    parts = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(source):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        if field not in MERGE_FIELDS:
+            raise ValueError(f"Unknown merge field {{{field}}}; available: {', '.join(sorted(MERGE_FIELDS))}")
+        if field not in fields:
+            fields.append(field)
+        conversion = f"!{conversion}" if conversion else ""
+        format_spec = f":{format_spec}" if format_spec else ""
+        parts.append(f"{{{fields.index(field)}{conversion}{format_spec}}}")
+    return CompiledTemplate(source, tuple(fields), ''.join(parts))
+
+def merge_query(fields, contact_ids=None, state=None, country=None):
+    """Build the single query returning fields for every matching contact"""
+    joins = []
+    for field in fields:
+        join = MERGE_FIELDS[field][1]
+        if join and join not in joins:
+            joins.append(join)
+    columns = ', '.join(MERGE_FIELDS[field][0] for field in fields)
+
+    conditions = []
+    params = []
+    if contact_ids is not None:
+        conditions.append("c.id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(contact_ids)))
+    if state:
+        conditions.append("c.state = ?")
+        params.append(state)
+    if country:
+        conditions.append("c.country = ?")
+        params.append(country)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"SELECT {columns} FROM contacts c {''.join(MERGE_JOINS[join] for join in joins)} {where} ORDER BY c.id"
+    return sql, params
+
+def render_merge(conn, templates, contact_ids=None, state=None, country=None):
+    """Yield (contact_id, email, [rendered templates]) for every matching contact.
+
+    The fields of all templates are fetched together in one query and each
+    template is rendered from its slice of the row, so no contact is read
+    more than once and nothing is accumulated in memory.
+    """
+    compiled = [compile_template(template) for template in templates]
+    fields = ['id', 'email']
+    for template in compiled:
+        fields.extend(field for field in template.fields if field not in fields)
+
+    # Precompute how to pick each template's values out of the shared row
+    pickers = []
+    for template in compiled:
+        positions = [fields.index(field) for field in template.fields]
+        if not positions:
+            pickers.append((template.format_string.format, lambda row: ()))
+        elif len(positions) == 1:
+            position = positions[0]
+            pickers.append((template.format_string.format, lambda row, position=position: (row[position],)))
+        else:
+            pickers.append((template.format_string.format, itemgetter(*positions)))
+
+    sql, params = merge_query(fields, contact_ids, state, country)
+    for row in conn.execute(sql, params):
+        yield row[0], row[1], [render(*pick(row)) for render, pick in pickers]
+
+def benchmark_render(template, renders=100000):
+    """Renders per second for a compiled template on synthetic values"""
+    compiled = compile_template(template)
+    values = tuple(1234.5 if MERGE_FIELDS[field][0].startswith('COALESCE(b.') else f"{field} value"
+                   for field in compiled.fields)
+    render = compiled.format_string.format
+    start_time = time.perf_counter()
+    for _ in range(renders):
+        render(*values)
+    return renders / (time.perf_counter() - start_time)
+
+if __name__ == "__main__":
+    import argparse
+    import sqlite3
+    parser = argparse.ArgumentParser(description='Mail-Merge Template Preview and Benchmark')
+    parser.add_argument('template', help='Template text, e.g. "Hi {first_name}, {budget_remaining:,.2f} remains"')
+    parser.add_argument('contact_ids', nargs='*', type=int, help='Contacts to preview (default: all)')
+    parser.add_argument('--benchmark', action='store_true', help='Measure renders per second instead of previewing')
+    parser.add_argument('--db', default='crm.db', help='Database holding the contacts')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(f"✓ {benchmark_render(args.template):,.0f} renders per second")
+    else:
+        conn = sqlite3.connect(args.db)
+        for contact_id, email, (text,) in render_merge(conn, [args.template], args.contact_ids or None):
+            print(f"{contact_id} <{email}>: {text}")
+        conn.close()
@@ -1,42 +1,45 @@
 import streamlit as st
 import sqlite3
+import logging
 from sqlite3 import Error
 import sys
+from crm_services import applications as application_service, contacts as contact_service, read_connection
+import query_metrics
+import performance_panel
+
+# Attribute this run's queries to the page and time it for the performance panel
+performance_panel.start_page()
+
+logger = logging.getLogger('crm.pages.application_form')
 
 # Function to connect to the database
 def get_db_connection():
     try:
         # Use test database if running tests
         if 'unittest' in sys.modules:
-            conn = sqlite3.connect('test_crm.db')
+            conn = query_metrics.connect('test_crm.db')
         else:
-            conn = sqlite3.connect('crm.db')
+            conn = query_metrics.connect('crm.db')
         conn.row_factory = sqlite3.Row
         return conn
     except Error as e:
-        print(e)
+        logger.error("Could not connect to the database: %s", e)
         return None
 
 # Function to fetch all contacts from the database
 def fetch_contacts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM contacts')
-    contacts = cursor.fetchall()
-    conn.close()
-    return contacts
+    conn = read_connection(primary=get_db_connection)
+    try:
+        return contact_service.list_contacts(conn)
+    finally:
+        conn.close()
 
 # Function to insert the new application data into the database
 def insert_application(contact_id, interest, reason, skillsets):
     conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute(''' 
-            INSERT INTO applications (contact_id, interest, reason, skillsets)
-            VALUES (?, ?, ?, ?)
-        ''', (contact_id, interest, reason, skillsets))
-        conn.commit()
-        return cursor.lastrowid
+        return application_service.create_application(conn, contact_id=contact_id, interest=interest,
+                                                      reason=reason, skillsets=skillsets)
     finally:
         conn.close()
 
@@ -45,7 +48,8 @@ def application_form():
     st.title("New Application Form")
 
     # Fetch existing contacts from the database
-    contacts = fetch_contacts()
+    with performance_panel.section("Load contacts"):
+        contacts = fetch_contacts()
 
     if contacts:
         # Select an existing contact
@@ -82,3 +86,4 @@ def application_form():
 # Run the application form function
 if __name__ == "__main__":
     application_form()
+    performance_panel.render()
@@ -2,94 +2,101 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 from datetime import datetime
+from crm_services import budgets as budget_service, contacts as contact_service, read_connection
+import query_metrics
+import performance_panel
+
+# Attribute this run's queries to the page and time it for the performance panel
+performance_panel.start_page()
 
 # Function to connect to the database
 def get_db_connection():
-    conn = sqlite3.connect('crm.db')
+    conn = query_metrics.connect('crm.db')
     conn.row_factory = sqlite3.Row
     return conn
 
 # Function to get all contacts
 def get_contacts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(''' 
-        SELECT * FROM contacts
-    ''')
-    contacts = cursor.fetchall()
-    conn.close()
-    return contacts
+    conn = read_connection(primary=get_db_connection)
+    try:
+        return contact_service.list_contacts(conn)
+    finally:
+        conn.close()
 
 # Function to create a new budget for a contact
 def create_budget(contact_id, budget_name, total_budget, start_date, end_date, currency):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(''' 
-        INSERT INTO budgets (contact_id, budget_name, total_budget, start_date, end_date, currency)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (contact_id, budget_name, total_budget, start_date, end_date, currency))
-    conn.commit()
-    conn.close()
+    try:
+        budget_service.create_budget(conn, contact_id=contact_id, budget_name=budget_name, total_budget=total_budget,
+                                     start_date=start_date, end_date=end_date, currency=currency)
+    finally:
+        conn.close()
     st.success("Budget created successfully!")
 
 # Function to update an existing budget
 def update_budget(budget_id, budget_name=None, total_budget=None, start_date=None, end_date=None, currency=None):
+    fields = {'budget_name': budget_name, 'total_budget': total_budget, 'start_date': start_date,
+              'end_date': end_date, 'currency': currency}
     conn = get_db_connection()
-    cursor = conn.cursor()
-    updates = []
-    values = []
-
-    if budget_name:
-        updates.append("budget_name = ?")
-        values.append(budget_name)
-    if total_budget:
-        updates.append("total_budget = ?")
-        values.append(total_budget)
-    if start_date:
-        updates.append("start_date = ?")
-        values.append(start_date)
-    if end_date:
-        updates.append("end_date = ?")
-        values.append(end_date)
-    if currency:
-        updates.append("currency = ?")
-        values.append(currency)
-
-    updates_str = ", ".join(updates)
-    values.append(budget_id)
-
-    cursor.execute(f'''
-        UPDATE budgets SET {updates_str} WHERE id = ?
-    ''', tuple(values))
-    conn.commit()
-    conn.close()
+    try:
+        budget_service.update_budget(conn, budget_id, **{name: value for name, value in fields.items() if value})
+    finally:
+        conn.close()
     st.success("Budget updated successfully!")
 
 # Function to get all budgets for a contact
 def get_budgets_for_contact(contact_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(''' 
-        SELECT * FROM budgets WHERE contact_id = ?
-    ''', (contact_id,))
-    budgets = cursor.fetchall()
-    conn.close()
-    return budgets
+    conn = read_connection(primary=get_db_connection)
+    try:
+        return budget_service.list_budgets(conn, contact_id)
+    finally:
+        conn.close()
+
+# Function to get a contact's budgets with their line items, products and expenses in one query
+def get_budget_trees_for_contact(contact_id):
+    conn = read_connection(primary=get_db_connection)
+    try:
+        return budget_service.budget_trees(conn, contact_id=contact_id)
+    finally:
+        conn.close()
+
+# Function to show each budget's line items and products from its budget tree
+def display_budget_breakdown(budget_trees):
+    for budget in budget_trees:
+        currency = budget['currency']
+        with st.expander(f"{budget['budget_name']}: {currency} {budget['spent']:,.2f} spent "
+                         f"of {currency} {budget['total_budget'] or 0:,.2f}"):
+            rows = []
+            for item in budget['line_items']:
+                for product in item['products'] or [None]:
+                    rows.append({
+                        'Line Item': item['line_item_name'],
+                        'Allocated': item['allocated_amount'],
+                        'Line Item Spent': item['spent'],
+                        'Product': product['product_name'] if product else None,
+                        'Expenses': len(product['expenses']) if product else 0,
+                        'Product Spent': product['spent'] if product else 0,
+                    })
+            if rows:
+                st.dataframe(pd.DataFrame(rows), hide_index=True)
+            else:
+                st.write("No line items in this budget.")
 
 # Function to delete a budget
 def delete_budget(budget_id):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM budgets WHERE id = ?', (budget_id,))
-    conn.commit()
-    conn.close()
+    try:
+        budget_service.delete_budget(conn, budget_id)
+    finally:
+        conn.close()
     st.success("Budget deleted successfully!")
 
 # Streamlit UI for budget management
 st.title("Budget Management for Contacts")
 
 # Select contact by name
-contacts = get_contacts()
+with performance_panel.section("Load contacts"):
+    contacts = get_contacts()
 contact_names = [f"{contact['name']} ({contact['email']})" for contact in contacts]
 contact_selection = st.selectbox("Select a Contact by Name", contact_names)
 
@@ -102,7 +109,8 @@ for contact in contacts:
 
 # Display existing budgets for the selected contact
 if contact_id:
-    budgets = get_budgets_for_contact(contact_id)
+    with performance_panel.section("Load budgets"):
+        budgets = get_budgets_for_contact(contact_id)
     if budgets:
         st.subheader(f"Existing Budgets for Contact: {contact_selection}")
         
@@ -134,6 +142,10 @@ if contact_id:
         
         # Display the dataframe
         st.dataframe(budgets_df)
+
+        st.subheader("Budget Breakdown")
+        with performance_panel.section("Budget breakdown"):
+            display_budget_breakdown(get_budget_trees_for_contact(contact_id))
     else:
         st.write("No budgets found for this contact.")
 
@@ -191,4 +203,6 @@ if contact_id:
 
                 delete_submit = st.form_submit_button("Confirm Delete")
                 if delete_submit and budget_id_to_delete:
-                    delete_budget(budget_id_to_delete)
\ No newline at end of file
+                    delete_budget(budget_id_to_delete)
+
+performance_panel.render()
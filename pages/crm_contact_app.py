@@ -1,10 +1,19 @@
 import streamlit as st
 import sqlite3
+import logging
 import pandas as pd
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import re
+from crm_services import read_connection
+from email_outbox import OutboxWorker, enqueue_email, enqueue_emails, outbox_stats
+from mail_templates import MERGE_FIELDS, render_merge
+from dedupe_contacts import duplicate_clusters, ensure_email_index, find_contacts_by_email, find_duplicates, merge_contacts
+import query_metrics
+import performance_panel
+
+# Attribute this run's queries to the page and time it for the performance panel
+performance_panel.start_page()
+
+logger = logging.getLogger('crm.pages.crm_contact_app')
 
 # Function to validate email using regex
 def is_valid_email(email):
@@ -13,11 +22,14 @@ def is_valid_email(email):
     if hasattr(email, '_mock_return_value'):  # Check if it's a MagicMock
         return True
     email_regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-    return re.match(email_regex, str(email)) is not None
+    return re.fullmatch(email_regex, str(email)) is not None  # match() would let a trailing newline through
+
+# Database behind the contact list, the mail merge and the outbox
+DB_PATH = 'C:/Users/james/OneDrive/Desktop/James CRM/crm.db'
 
 # Function to connect to the database
 def get_db_connection():
-    conn = sqlite3.connect('C:/Users/james/OneDrive/Desktop/James CRM/crm.db')
+    conn = query_metrics.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -27,6 +39,10 @@ def insert_contact(title, gender, name, email, phone, message, address_line, sub
         st.error("Invalid email address!")
         return False
     conn = get_db_connection()
+    ensure_email_index(conn)
+    existing = find_contacts_by_email(conn, email)
+    if existing:
+        st.warning(f"Possible duplicate: contact ID {', '.join(map(str, existing))} already uses {email}.")
     cursor = conn.cursor()
     cursor.execute(''' 
     INSERT INTO contacts (title, gender, name, email, phone, message, address_line, suburb, postcode, state, country)
@@ -52,29 +68,50 @@ def update_contact(contact_id, title, gender, name, email, phone, message, addre
     conn.close()
     return True
 
-# Function to send email using SMTP
+# Function to start one background delivery worker shared across reruns and sessions
+@st.cache_resource
+def get_outbox_worker():
+    return OutboxWorker(DB_PATH).start()
+
+# Function to queue an email for the background worker instead of sending it inline
 def send_email(to_email, subject, body):
-    from_email = "8542f6001@smtp-brevo.com"  # Replace with your email
-    password = ""
-    # Set up the MIME
-    message = MIMEMultipart()
-    message['From'] = from_email
-    message['To'] = to_email
-    message['Subject'] = subject
-    # Attach the body with the msg instance
-    message.attach(MIMEText(body, 'plain'))
-    # Establish a secure session with Gmail's SMTP server
+    if not is_valid_email(to_email):
+        st.error("Invalid email address!")
+        return False
+    get_outbox_worker()  # creates the outbox on first use
+    conn = get_db_connection()
     try:
-        server = smtplib.SMTP('smtp-relay.brevo.com', 587)  # For Gmail
-        server.starttls()  # Secure connection
-        server.login(from_email, password)  # Log in to your email
-        text = message.as_string()  # Convert the message to string
-        server.sendmail(from_email, to_email, text)  # Send the email
-        server.quit()  # Close the connection
+        enqueue_email(conn, to_email, subject, body)
         return True
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Could not queue email")
         return False
+    finally:
+        conn.close()
+
+# Function to queue a personalised copy of the templates for every matching contact
+def queue_mail_merge(subject_template, body_template, state=None):
+    get_outbox_worker()
+    conn = get_db_connection()
+    try:
+        emails = (
+            (email, subject, body)
+            for _, email, (subject, body) in render_merge(conn, [subject_template, body_template], state=state)
+            if is_valid_email(email)
+        )
+        return enqueue_emails(conn, emails)
+    finally:
+        conn.close()
+
+# Function to summarise the outbox for the sidebar
+def get_outbox_stats():
+    get_outbox_worker()
+    conn = get_db_connection()
+    try:
+        return outbox_stats(conn)
+    finally:
+        conn.close()
+
 # Streamlit interface
 st.title('Contact Management Tool')
 
@@ -90,9 +127,26 @@ with st.sidebar:
     # Handle the Send button click
     if send_button and to_email and subject and body:
         if send_email(to_email, subject, body):
-            st.success("Email sent successfully!")
+            st.success("Email queued for delivery!")
         else:
-            st.error("Failed to send email. Please check your credentials.")
+            st.error("Failed to queue email.")
+
+    # Mail merge: one templated email per contact, queued through the outbox
+    with st.expander("Mail Merge"):
+        st.caption("Placeholders: " + ", ".join(f"{{{field}}}" for field in MERGE_FIELDS))
+        merge_subject = st.text_input("Subject template", key="merge_subject")
+        merge_body = st.text_area("Body template", key="merge_body")
+        merge_state = st.text_input("Only contacts in state (optional)", key="merge_state")
+        if st.button("Queue Mail Merge") and merge_subject and merge_body:
+            try:
+                queued = queue_mail_merge(merge_subject, merge_body, merge_state or None)
+                st.success(f"Queued {queued} emails for delivery!")
+            except ValueError as e:
+                st.error(str(e))
+
+    with performance_panel.section("Outbox stats"):
+        outbox = get_outbox_stats()
+    st.caption(f"Outbox: {outbox['queued'] + outbox['sending']} pending, {outbox['sent']} sent, {outbox['failed']} failed")
 
 # Function to delete a contact by ID
 def delete_contact(contact_id):
@@ -104,7 +158,7 @@ def delete_contact(contact_id):
 
 # Function to search for contacts by name
 def search_contact_by_name(search_name):
-    conn = get_db_connection()
+    conn = read_connection(primary=get_db_connection)
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM contacts WHERE name LIKE ?', ('%' + search_name + '%',))
     contacts = cursor.fetchall()
@@ -113,7 +167,7 @@ def search_contact_by_name(search_name):
 
 # Function to display contacts
 def display_contacts():
-    conn = get_db_connection()
+    conn = read_connection(primary=get_db_connection)
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM contacts')
     contacts = cursor.fetchall()
@@ -121,7 +175,8 @@ def display_contacts():
     return contacts
 
 # Get the contacts and convert them to a dataframe for display
-contacts = display_contacts()
+with performance_panel.section("Load contacts"):
+    contacts = display_contacts()
 if contacts:
     # Convert the list of contacts into a DataFrame
     contacts_df = pd.DataFrame(contacts, columns=['id', 'title', 'gender', 'name', 'email', 'phone', 'message', 'address_line', 'suburb', 'postcode', 'state', 'country'])
@@ -131,6 +186,29 @@ if contacts:
 else:
     st.write("No contacts available.")
 
+# Find likely duplicate contacts and merge each group into its oldest record
+with st.expander("Find Duplicate Contacts"):
+    if st.button("Scan for Duplicates"):
+        conn = read_connection(primary=get_db_connection)
+        st.session_state.duplicate_clusters = duplicate_clusters(find_duplicates(conn))
+        conn.close()
+    clusters = st.session_state.get("duplicate_clusters")
+    if clusters is not None:
+        if not clusters:
+            st.write("No duplicates found.")
+        names = {contact['id']: f"{contact['name']} <{contact['email']}>" for contact in contacts or []}
+        for cluster in clusters:
+            survivor, duplicates = cluster[0], cluster[1:]
+            st.write(f"Keep {survivor}: {names.get(survivor, '')} — merge "
+                     + ", ".join(f"{contact_id}: {names.get(contact_id, '')}" for contact_id in duplicates))
+            if st.button("Merge", key=f"merge_{survivor}"):
+                conn = get_db_connection()
+                merge_contacts(conn, survivor, duplicates)
+                conn.close()
+                st.session_state.duplicate_clusters = [c for c in clusters if c != cluster]
+                st.success(f"Merged {len(duplicates)} contacts into {survivor}.")
+                st.rerun()
+
 # Mapping of full state names to abbreviations (and vice versa)
 state_mapping = {
     "New South Wales": "NSW",
@@ -257,3 +335,5 @@ if delete_name:
                 st.rerun()  # Refresh the app to remove the deleted contact
     else:
         st.warning(f"No contact found with the name '{delete_name}'.")
+
+performance_panel.render()
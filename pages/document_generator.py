@@ -1,18 +1,37 @@
 import streamlit as st
 import sqlite3
+import logging
 from fpdf import FPDF
-import base64
+import json
 from io import BytesIO
 from datetime import datetime
 from sqlite3 import Error
 from streamlit_drawable_canvas import st_canvas
 from PIL import Image
+import hashlib
+import threading
+import zlib
 import tempfile
+import time
+from collections import OrderedDict
+from blob_store import read_blob
+from crm_services import read_connection
+from crm_services.signatures import compact_signature, ensure_signature_store, store_signature
+from document_store import DOCUMENT_STORE_DIR, get_or_create_document
+from export_documents import EXPORT_STATUSES, export_documents
+import query_metrics
+import performance_panel
+import process_metrics
+
+# Attribute this run's queries to the page and time it for the performance panel
+performance_panel.start_page()
+
+logger = logging.getLogger('crm.pages.document_generator')
 
 # Function to connect to the database
 def get_db_connection():
     try:
-        conn = sqlite3.connect('crm.db')
+        conn = query_metrics.connect('crm.db')
         conn.row_factory = sqlite3.Row
         return conn
     except Error as e:
@@ -21,25 +40,43 @@ def get_db_connection():
     
 # Function to save the signature to the database
 def save_signature_to_db(contact_id, signature_image):
-    conn = sqlite3.connect('crm.db')
+    ensure_signature_store()
+    conn = query_metrics.connect('crm.db')
     cursor = conn.cursor()
     
-    # Convert image to bytes and store it in the database
-    with BytesIO() as buffer:
-        signature_image.save(buffer, format="PNG")
-        signature_bytes = buffer.getvalue()
+    # Crop the drawing and reduce it to black and white before storing it
+    signature_bytes = compact_signature(signature_image)
+    if signature_bytes is None:
+        conn.close()
+        st.warning("Please draw your signature before saving.")
+        return
 
     # Get the current timestamp when the signature is applied
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    previous_hashes = [row[0] for row in cursor.execute(
+        'SELECT signature_hash FROM application_documents WHERE contact_id = ? AND signature_hash IS NOT NULL',
+        (contact_id,)
+    )]
+    signature_hash = store_signature(cursor, signature_bytes)
     cursor.execute(''' 
         UPDATE application_documents
-        SET signature = ?, timestamp = ?
+        SET signature_hash = ?, signature = NULL, timestamp = ?
         WHERE contact_id = ?
-    ''', (sqlite3.Binary(signature_bytes), timestamp, contact_id))
+    ''', (signature_hash, timestamp, contact_id))
+
+    # Drop replaced signatures nobody else references
+    for previous_hash in set(previous_hashes) - {signature_hash}:
+        cursor.execute('''
+            DELETE FROM signatures
+            WHERE hash = ? AND NOT EXISTS (
+                SELECT 1 FROM application_documents WHERE signature_hash = ?
+            )
+        ''', (previous_hash, previous_hash))
     
     conn.commit()
     conn.close()
+    fetch_signature_metadata.clear()
     st.success(f"Signature saved successfully! Applied on {timestamp}")
 
 # Function to create the signature canvas
@@ -74,42 +111,60 @@ def draw_signature(contact_id):
             # Reset the drawing flag
             st.session_state.drawing_signature = False
 
-# Function to fetch signature and timestamp from the database
-def fetch_signature_and_timestamp_from_db(contact_id):
-    conn = sqlite3.connect('crm.db')
+# Function to fetch what is known about a contact's signature without reading the image
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_signature_metadata(contact_id):
+    # Only runs when Streamlit's cache misses
+    performance_panel.record_cache_miss('signature metadata')
+    ensure_signature_store()
+    conn = query_metrics.connect('crm.db')
     cursor = conn.cursor()
+    # length() on a BLOB is answered from the record header, the image is not loaded
     cursor.execute('''
-        SELECT signature, timestamp
-        FROM application_documents
-        WHERE contact_id = ?
+        SELECT s.hash, length(s.image), s.width, s.height, d.timestamp
+        FROM application_documents d
+        JOIN signatures s ON s.hash = d.signature_hash
+        WHERE d.contact_id = ?
     ''', (contact_id,))
-    
     result = cursor.fetchone()
     conn.close()
 
-    if result and result[0]:
-        signature_image = BytesIO(result[0])  # Convert the binary data into BytesIO object for FPDF
-        timestamp = result[1]  # The timestamp when the signature was applied
-        return signature_image, timestamp
-    return None, None
+    if result:
+        return {
+            'hash': result[0],
+            'size_bytes': result[1],
+            'width': result[2],
+            'height': result[3],
+            'timestamp': result[4],
+        }
+    return None
+
+# Function to fetch signature and timestamp from the database
+def fetch_signature_and_timestamp_from_db(contact_id):
+    performance_panel.record_cache_lookup('signature metadata')
+    metadata = fetch_signature_metadata(contact_id)
+    if metadata is None:
+        return None, None
+
+    # Stream the image in chunks through incremental blob I/O. signatures has no INTEGER
+    # PRIMARY KEY, so its rowids can change (e.g. on VACUUM); find the row by hash each time
+    conn = query_metrics.connect('crm.db')
+    try:
+        row = conn.execute('SELECT rowid FROM signatures WHERE hash = ?', (metadata['hash'],)).fetchone()
+        signature_image = read_blob(conn, 'signatures', 'image', row[0]) if row else None
+    except (ValueError, sqlite3.Error):
+        signature_image = None  # Replaced since the metadata was cached
+    finally:
+        conn.close()
+    if signature_image is None:
+        fetch_signature_metadata.clear()
+        return None, None
+    return signature_image, metadata['timestamp']
 
 # Function to fetch signature from the database
 def fetch_signature_from_db(contact_id):
-    conn = sqlite3.connect('crm.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT signature
-        FROM application_documents
-        WHERE contact_id = ?
-    ''', (contact_id,))
-    
-    signature = cursor.fetchone()
-    conn.close()
-
-    if signature and signature[0]:
-        signature_image = BytesIO(signature[0])  # Convert the binary data into BytesIO object for FPDF
-        return signature_image
-    return None
+    signature_image, _ = fetch_signature_and_timestamp_from_db(contact_id)
+    return signature_image
 
 # Function to fetch contact and application details together
 def fetch_contact_with_application(contact_id):
@@ -123,27 +178,200 @@ def fetch_contact_with_application(contact_id):
                 c.phone,
                 a.interest,
                 a.reason,
-                a.skillsets
+                a.skillsets,
+                d.document_name
             FROM contacts c
             INNER JOIN applications a ON c.id = a.contact_id
+            LEFT JOIN application_documents d ON d.id = (
+                SELECT MAX(id) FROM application_documents WHERE contact_id = c.id
+            )
             WHERE c.id = ?
         ''', (contact_id,))
         result = cursor.fetchone()
         
-        print(f"DEBUG: SQL Result: {result}")  # Debugging line
+        # The row is contact PII; only record whether it was found
+        logger.debug("Fetched contact with application", extra={'contact_id': contact_id, 'found': result is not None})
         
         if result:
             return dict(result)
         return None
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e, extra={'contact_id': contact_id})
         return None
     finally:
         if conn:
             conn.close()
 
+# Decoded signatures keyed by the SHA-256 of the stored PNG, most recently used last
+SIGNATURE_CACHE_SIZE = 256
+_signature_cache = OrderedDict()
+_signature_cache_lock = threading.Lock()
+
+# Function to decode a stored signature once into the image record FPDF embeds
+def decode_signature(signature_bytes):
+    digest = hashlib.sha256(signature_bytes).hexdigest()
+    with _signature_cache_lock:
+        info = _signature_cache.get(digest)
+        if info is not None:
+            _signature_cache.move_to_end(digest)
+    performance_panel.record_cache('decoded signatures', hit=info is not None)
+    if info is not None:
+        return digest, info
+
+    image = Image.open(BytesIO(signature_bytes))
+    if image.mode != '1':
+        # Flatten any transparency onto white paper; signatures only need gray levels
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image).convert('L')
+
+    # Same record FPDF builds when it parses an image file, minus the file
+    info = {
+        'w': image.width,
+        'h': image.height,
+        'cs': 'DeviceGray',
+        'bpc': 1 if image.mode == '1' else 8,
+        'f': 'FlateDecode',
+        'data': zlib.compress(image.tobytes()),
+    }
+    with _signature_cache_lock:
+        _signature_cache[digest] = info
+        if len(_signature_cache) > SIGNATURE_CACHE_SIZE:
+            _signature_cache.popitem(last=False)
+    return digest, info
+
+# Function to place a signature held in memory onto the current page
+def embed_signature(pdf, signature, x, y, w, h):
+    signature_bytes = signature.getvalue() if hasattr(signature, 'getvalue') else bytes(signature)
+    digest, info = decode_signature(signature_bytes)
+    name = f"signature-{digest}.png"
+    if name not in pdf.images:
+        # FPDF skips loading a file for images it already knows; it drops 'data'
+        # after writing, so each document gets its own copy of the record
+        pdf.images[name] = dict(info, i=len(pdf.images) + 1)
+    pdf.image(name, x=x, y=y, w=w, h=h)
+
+# Function to fetch everything needed to render documents for many contacts in one query
+def fetch_document_batch(contact_ids):
+    ensure_signature_store()
+    conn = read_connection(primary=get_db_connection)
+    try:
+        cursor = conn.cursor()
+        # Ids are passed as one JSON array so the statement does not hit the parameter limit
+        cursor.execute('''
+            SELECT
+                c.id AS contact_id,
+                c.name,
+                c.email,
+                c.phone,
+                a.interest,
+                a.reason,
+                a.skillsets,
+                d.id AS document_id,
+                d.document_name,
+                d.signature_hash,
+                s.image AS signature,
+                d.timestamp
+            FROM contacts c
+            INNER JOIN applications a ON a.id = (
+                SELECT MAX(id) FROM applications WHERE contact_id = c.id
+            )
+            LEFT JOIN application_documents d ON d.id = (
+                SELECT MAX(id) FROM application_documents WHERE contact_id = c.id
+            )
+            LEFT JOIN signatures s ON s.hash = d.signature_hash
+            WHERE c.id IN (SELECT value FROM json_each(?))
+            ORDER BY c.id
+        ''', (json.dumps([int(contact_id) for contact_id in contact_ids]),))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+# Bump whenever create_document's output changes so stored documents are regenerated
+DOCUMENT_TEMPLATE_VERSION = 1
+
+# Function to return the stored PDF for a record, rendering it only when its inputs have changed
+def get_or_create_stored_document(record, load_signature, store_dir=DOCUMENT_STORE_DIR):
+    # The "Document signed on" date is when the stored file was rendered: an unchanged document is
+    # served as first issued, while editing the application or re-signing renders a new, newly dated one
+    signature_hash = record.get('signature_hash')
+    inputs = {
+        'template_version': DOCUMENT_TEMPLATE_VERSION,
+        'name': record['name'],
+        'email': record['email'],
+        'phone': record['phone'],
+        'interest': record['interest'],
+        'reason': record['reason'],
+        'skillsets': record['skillsets'],
+        'document_name': record['document_name'],
+        'signature_hash': signature_hash,
+        'signature_timestamp': record.get('timestamp') if signature_hash else None,
+    }
+
+    def render():
+        signature_image = load_signature() if signature_hash else None
+        pdf_output = create_document(
+            inputs['name'], inputs['email'], inputs['phone'], inputs['document_name'],
+            inputs['interest'], inputs['reason'], inputs['skillsets'],
+            signature_image, inputs['signature_timestamp']
+        )
+        return pdf_output.getvalue()
+
+    document_path, created = get_or_create_document(inputs, render, store_dir)
+    performance_panel.record_cache('stored documents', hit=not created)
+    return document_path, created
+
+# Function to point application_documents at stored files, given (contact_id, document_name, path) entries
+def record_document_paths(entries):
+    """Rows already pointing at their file are left alone, so only stale or missing paths cause a write"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for contact_id, document_name, document_path in entries:
+            cursor.execute('''
+                UPDATE application_documents
+                SET document_path = ?
+                WHERE id = (SELECT MAX(id) FROM application_documents WHERE contact_id = ?)
+                  AND document_path IS NOT ?
+            ''', (document_path, contact_id, document_path))
+            if cursor.rowcount == 0 and cursor.execute(
+                    'SELECT 1 FROM application_documents WHERE contact_id = ?', (contact_id,)).fetchone() is None:
+                cursor.execute('''
+                    INSERT INTO application_documents (contact_id, document_name, document_path)
+                    VALUES (?, ?, ?)
+                ''', (contact_id, document_name, document_path))
+        conn.commit()
+    finally:
+        conn.close()
+
+# Layout of the application form: heading, field to print under it, whether the
+# value wraps over several lines, and the spacing after the section
+APPLICATION_FORM_LAYOUT = [
+    ("Position Applied For:", "interest", False, 5),
+    ("Name:", "contact_name", False, 5),
+    ("Email:", "contact_email", False, 5),
+    ("Phone Number:", "contact_phone", False, 5),
+    ("Reason for Application:", "reason", True, 5),
+    ("Skillsets:", "skillsets", True, 10),
+]
+
+# Function to render the form fields of the layout onto a page
+def render_form_fields(pdf, fields, layout=APPLICATION_FORM_LAYOUT):
+    for heading, field, wraps, spacing in layout:
+        pdf.set_font("Arial", size=14, style='B')
+        pdf.cell(200, 10, txt=heading, ln=True)
+        pdf.set_font("Arial", size=12)
+        if wraps:
+            pdf.multi_cell(200, 10, txt=f"{fields[field]}")
+        else:
+            pdf.cell(200, 10, txt=f"{fields[field]}", ln=True)
+        pdf.ln(spacing)
+
+pdf_render_seconds = process_metrics.histogram('crm_pdf_render_seconds', 'Time to render one application PDF')
+
 # Function to create a form-like document with the signature next to the header
 def create_document(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, signature_image=None, timestamp=None):
+    started = time.perf_counter()
     pdf = FPDF()
     pdf.add_page()
 
@@ -154,46 +382,14 @@ def create_document(contact_name, contact_email, contact_phone, document_name, i
     pdf.ln(10)
 
     # Add form fields section
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Position Applied For:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"{interest}", ln=True)
-    pdf.ln(5)
-
-    # Name field (First and Last)
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Name:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"{contact_name}", ln=True)
-    pdf.ln(5)
-
-    # Email field
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Email:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"{contact_email}", ln=True)
-    pdf.ln(5)
-
-    # Phone field
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Phone Number:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt=f"{contact_phone}", ln=True)
-    pdf.ln(5)
-
-    # Reason field
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Reason for Application:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(200, 10, txt=f"{reason}")
-    pdf.ln(5)
-
-    # Skillsets field
-    pdf.set_font("Arial", size=14, style='B')
-    pdf.cell(200, 10, txt="Skillsets:", ln=True)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(200, 10, txt=f"{skillsets}")
-    pdf.ln(10)
+    render_form_fields(pdf, {
+        "interest": interest,
+        "contact_name": contact_name,
+        "contact_email": contact_email,
+        "contact_phone": contact_phone,
+        "reason": reason,
+        "skillsets": skillsets,
+    })
 
     # Document info
     pdf.set_font("Arial", size=14, style='B')
@@ -208,14 +404,7 @@ def create_document(contact_name, contact_email, contact_phone, document_name, i
 
     # If signature_image is provided, place it next to the signature text
     if signature_image:
-        # Save the BytesIO signature image to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            signature_image.seek(0)  # Rewind the image to the start
-            temp_file.write(signature_image.read())  # Save to temp file
-            temp_file_path = temp_file.name  # Get the path of the temporary file
-
-        # Now add the image to the PDF
-        pdf.image(temp_file_path, x=30, y=pdf.get_y(), w=40, h=20)  # Adjust the x, y position as needed
+        embed_signature(pdf, signature_image, x=30, y=pdf.get_y(), w=40, h=20)  # Adjust the x, y position as needed
 
     pdf.ln(30)  # Space after signature
 
@@ -235,22 +424,98 @@ def create_document(contact_name, contact_email, contact_phone, document_name, i
     pdf_output.write(pdf.output(dest='S').encode('latin1'))  # Write to memory buffer
     pdf_output.seek(0)  # Reset the buffer pointer to the beginning of the file
 
+    pdf_render_seconds.observe(time.perf_counter() - started)
     return pdf_output
 
 # Function to provide the PDF download link
-def generate_and_download_pdf(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, contact_id, signature_image):
-
-    # Fetch the signature image and timestamp from the database
-    signature_image, timestamp = fetch_signature_and_timestamp_from_db(contact_id)
-
-    # Create the document
-    pdf_output = create_document(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, signature_image)
-
-    # Provide PDF download link
-    pdf_output.seek(0)
-    b64_pdf = base64.b64encode(pdf_output.read()).decode('utf-8')
-    href = f'<a href="data:file/pdf;base64,{b64_pdf}" download="{document_name}.pdf">Download the document</a>'
-    st.markdown(href, unsafe_allow_html=True)
+def generate_and_download_pdf(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, contact_id):
+
+    # Identify the signature by hash; the image is only read if the document must be rendered
+    performance_panel.record_cache_lookup('signature metadata')
+    signature_info = fetch_signature_metadata(contact_id)
+    record = {
+        'name': contact_name,
+        'email': contact_email,
+        'phone': contact_phone,
+        'interest': interest,
+        'reason': reason,
+        'skillsets': skillsets,
+        'document_name': document_name,
+        'signature_hash': signature_info['hash'] if signature_info else None,
+        'timestamp': signature_info['timestamp'] if signature_info else None,
+    }
+    document_path, _ = get_or_create_stored_document(record, lambda: fetch_signature_from_db(contact_id))
+    # Also when the file already existed: the row may still name a stale path, e.g. after a restore
+    record_document_paths([(contact_id, document_name, document_path)])
+
+    # Serve the stored file; a base64 data URL would hold the PDF in memory three times over
+    with open(document_path, 'rb') as document_file:
+        st.download_button(
+            "Download the document",
+            data=document_file,
+            file_name=f"{document_name}.pdf",
+            mime="application/pdf"
+        )
+
+# Function to generate documents for several contacts at once and offer them as a zip
+def batch_document_section(contacts):
+    # Imported here because the batch engine itself imports this module
+    from batch_documents import generate_document_zip
+
+    with st.expander("Batch Generate Documents"):
+        contact_labels = {f"{contact['name']} ({contact['email']})": contact['id'] for contact in contacts}
+        selected = st.multiselect("Contacts", list(contact_labels))
+        select_all = st.checkbox("All contacts")
+
+        if st.button("Generate Batch"):
+            contact_ids = list(contact_labels.values()) if select_all else [contact_labels[label] for label in selected]
+            if not contact_ids:
+                st.warning("Select at least one contact.")
+                return
+            zip_buffer = BytesIO()
+            with st.spinner(f"Generating documents for {len(contact_ids)} contacts..."):
+                count = generate_document_zip(contact_ids, zip_buffer)
+            st.success(f"Generated {count} documents.")
+            st.download_button(
+                "Download Documents (zip)",
+                data=zip_buffer.getvalue(),
+                file_name=f"application_documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                mime="application/zip"
+            )
+
+# Function to export stored documents and signatures as a zip, filtered by contact, date range and status
+def document_export_section(contacts):
+    with st.expander("Export Documents"):
+        contact_labels = {f"{contact['name']} ({contact['email']})": contact['id'] for contact in contacts}
+        selected = st.multiselect("Contacts (leave empty for all)", list(contact_labels), key="export_contacts")
+        filter_dates = st.checkbox("Filter by date")
+        if filter_dates:
+            start_date = st.date_input("From", key="export_start_date")
+            end_date = st.date_input("To", key="export_end_date")
+        else:
+            start_date = end_date = None
+        status = st.selectbox("Status", ["Any"] + list(EXPORT_STATUSES), key="export_status")
+
+        if st.button("Build Export"):
+            contact_ids = [contact_labels[label] for label in selected] or None
+            # Spool the archive to disk while it is built; download_button keeps its own copy of the
+            # bytes, so the file is closed (and deleted) as soon as they have been handed over
+            with tempfile.TemporaryFile() as export_file:
+                conn = read_connection(primary=get_db_connection)
+                try:
+                    with st.spinner("Exporting documents..."):
+                        documents, signatures = export_documents(conn, export_file, contact_ids, start_date,
+                                                                 end_date, None if status == "Any" else status)
+                finally:
+                    conn.close()
+                export_file.seek(0)
+                st.success(f"Exported {documents} documents and {signatures} signatures.")
+                st.download_button(
+                    "Download Export (zip)",
+                    data=export_file.read(),  # A BufferedRandom is not among the file types it accepts
+                    file_name=f"document_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                    mime="application/zip"
+                )
 
 # Function to fetch contacts and display the dropdown menu
 def document_page():
@@ -261,12 +526,13 @@ def document_page():
         st.session_state.drawing_signature = False
 
     # Fetch contacts and display the dropdown menu
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM contacts")
-    contacts = cursor.fetchall()  # This will return a list of Row objects
+    with performance_panel.section("Load contacts"):
+        conn = read_connection(primary=get_db_connection)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM contacts")
+        contacts = cursor.fetchall()  # This will return a list of Row objects
 
-    conn.close()
+        conn.close()
 
     # Display a dropdown menu with the list of contacts
     if contacts:
@@ -279,7 +545,8 @@ def document_page():
         contact_id = selected_contact[0]  # Assuming contact[0] is the contact_id
 
         # Fetch the contact and application details together
-        contact_data = fetch_contact_with_application(contact_id)
+        with performance_panel.section("Load contact details"):
+            contact_data = fetch_contact_with_application(contact_id)
 
         if contact_data:
             contact_name = contact_data["name"]
@@ -288,7 +555,7 @@ def document_page():
             interest = contact_data["interest"]
             reason = contact_data["reason"]
             skillsets = contact_data["skillsets"]
-            document_name = contact_data["document_name"]
+            document_name = contact_data["document_name"] or f"Application Form {contact_id}"
 
             # Display the contact information
             st.write(f"Contact ID: {contact_id}")
@@ -307,17 +574,29 @@ def document_page():
             if st.session_state.drawing_signature:
                 draw_signature(contact_id)
 
-            # Fetch signature from the database and pass to PDF generation
-            signature_image = fetch_signature_from_db(contact_id)
+            # Show whether a signature is on file; the image itself is only read when generating
+            performance_panel.record_cache_lookup('signature metadata')
+            signature_info = fetch_signature_metadata(contact_id)
+            if signature_info:
+                st.caption(f"Signature on file ({signature_info['width']}x{signature_info['height']}, "
+                           f"{signature_info['size_bytes']:,} bytes), applied on {signature_info['timestamp']}")
+            else:
+                st.caption("No signature on file.")
 
             # Button to generate and download PDF
             if st.button("Generate and Download Document"):
-                generate_and_download_pdf(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, contact_id, signature_image)
+                with performance_panel.section("Generate document"):
+                    generate_and_download_pdf(contact_name, contact_email, contact_phone, document_name, interest, reason, skillsets, contact_id)
         else:
             st.write("No data found for this contact.")
+
+        with performance_panel.section("Batch and export"):
+            batch_document_section(contacts)
+            document_export_section(contacts)
     else:
         st.write("No contacts found in the database.")
 
 # Run the document generation page
 if __name__ == "__main__":
     document_page()
+    performance_panel.render()
@@ -0,0 +1,191 @@
+import unittest
+import sqlite3
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup_db import (
+    write_backup_manifest,
+    list_backups,
+    select_backup,
+    restore_database,
+    backups_to_keep,
+    BackupScheduler
+)
+
+class TestBackupRestore(unittest.TestCase):
+    def setUp(self):
+        """Create a scratch directory with a live database and two snapshots"""
+        self.work_dir = tempfile.mkdtemp()
+        self.backup_dir = os.path.join(self.work_dir, "database_backups")
+        os.makedirs(self.backup_dir)
+        self.target_db = os.path.join(self.work_dir, "crm.db")
+
+        self._make_db(self.target_db, ["Live User"])
+        self.old_backup = self._make_backup("20250101_000000", ["Old User"])
+        self.new_backup = self._make_backup("20250201_000000", ["New User", "Other User"])
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def _make_db(self, path, names):
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+            CREATE TABLE budgets (
+                id INTEGER PRIMARY KEY,
+                contact_id INTEGER,
+                FOREIGN KEY (contact_id) REFERENCES contacts (id)
+            );
+        ''')
+        conn.executemany('INSERT INTO contacts (name) VALUES (?)', [(n,) for n in names])
+        conn.commit()
+        conn.close()
+
+    def _make_backup(self, timestamp, names):
+        path = os.path.join(self.backup_dir, f"crm_backup_{timestamp}.db")
+        self._make_db(path, names)
+        write_backup_manifest(path, timestamp, {"contacts": len(names), "budgets": 0})
+        return path
+
+    def _contact_names(self):
+        conn = sqlite3.connect(self.target_db)
+        names = [row[0] for row in conn.execute('SELECT name FROM contacts ORDER BY id')]
+        conn.close()
+        return names
+
+    def test_list_backups(self):
+        """Backups are listed oldest first with their manifests"""
+        backups = list_backups(self.backup_dir)
+        self.assertEqual([b["path"] for b in backups], [self.old_backup, self.new_backup])
+        self.assertEqual(backups[1]["tables"]["contacts"], 2)
+        self.assertIsNotNone(backups[1]["sha256"])
+
+    def test_select_backup_before_timestamp(self):
+        """Point-in-time selection picks the newest snapshot not after the cutoff"""
+        self.assertEqual(select_backup(self.backup_dir)["path"], self.new_backup)
+        self.assertEqual(select_backup(self.backup_dir, before=datetime(2025, 1, 15))["path"], self.old_backup)
+        with self.assertRaises(ValueError):
+            select_backup(self.backup_dir, before="2024-12-31T00:00:00")
+
+    def test_restore_database(self):
+        """Restoring replaces the live database and reports timings"""
+        timings = restore_database(self.new_backup, self.target_db)
+        self.assertEqual(self._contact_names(), ["New User", "Other User"])
+        self.assertIn("total", timings)
+        self.assertFalse(os.path.exists(self.target_db + ".restore"))
+
+    def test_restore_rejects_foreign_key_violations(self):
+        """A snapshot with dangling references leaves the live database untouched"""
+        conn = sqlite3.connect(self.old_backup)
+        conn.execute('INSERT INTO budgets (contact_id) VALUES (999)')
+        conn.commit()
+        conn.close()
+        write_backup_manifest(self.old_backup, "20250101_000000", {"contacts": 1, "budgets": 1})
+
+        with self.assertRaises(ValueError):
+            restore_database(self.old_backup, self.target_db)
+        self.assertEqual(self._contact_names(), ["Live User"])
+
+        restore_database(self.old_backup, self.target_db, allow_fk_violations=True)
+        self.assertEqual(self._contact_names(), ["Old User"])
+
+    def test_restore_rejects_checksum_mismatch(self):
+        """A snapshot changed since its manifest was written is refused before anything is copied"""
+        conn = sqlite3.connect(self.new_backup)
+        conn.execute("UPDATE contacts SET name = 'Tampered' WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        with self.assertRaisesRegex(ValueError, "Checksum mismatch"):
+            restore_database(self.new_backup, self.target_db)
+        self.assertEqual(self._contact_names(), ["Live User"])
+        self.assertFalse(os.path.exists(self.target_db + ".restore"))
+
+class TestBackupRetention(unittest.TestCase):
+    def _manifests(self, times):
+        return [{"path": t.isoformat(), "created_at": t.isoformat()} for t in times]
+
+    def test_backups_to_keep_grandfather_father_son(self):
+        """Each tier keeps the newest snapshot of its most recent buckets"""
+        now = datetime(2025, 3, 31, 12, 30)
+        # Two snapshots an hour for the last three hours, then one a day for sixty days
+        times = [now - timedelta(minutes=30 * i) for i in range(6)]
+        times += [now - timedelta(days=d) for d in range(1, 61)]
+        keep = backups_to_keep(self._manifests(times), {"hourly": 2, "daily": 3, "weekly": 0, "monthly": 3})
+
+        expected = {
+            now,                                   # hourly + daily + monthly (March)
+            now - timedelta(minutes=60),           # hourly (11:00 bucket)
+            now - timedelta(days=1),               # daily
+            now - timedelta(days=2),               # daily
+            now - timedelta(days=31),              # monthly (February)
+            now - timedelta(days=59),              # monthly (January)
+        }
+        self.assertEqual(keep, {t.isoformat() for t in expected})
+
+class TestBackupScheduler(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, "crm.db")
+        self.backup_dir = os.path.join(self.work_dir, "database_backups")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT)')
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_skips_run_when_nothing_changed(self):
+        """A second run without commits is skipped; a commit makes the next one run"""
+        scheduler = BackupScheduler(self.db_path, self.backup_dir)
+        self.assertTrue(scheduler.run_backup("scheduled"))
+        self.assertIsNone(scheduler.run_backup("scheduled"))
+        self.assertEqual(scheduler.metrics["skipped"], 1)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO contacts (name) VALUES ('Someone')")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(scheduler.pending_changes(), 1)
+        manifest = scheduler.run_backup("1 changes")
+        self.assertTrue(manifest)
+        self.assertEqual(scheduler.metrics["last_run"]["size_bytes"], manifest["size_bytes"])
+        self.assertTrue(os.path.exists(os.path.join(self.backup_dir, "backup_metrics.json")))
+
+    def test_change_threshold_counts_rows_in_wal_mode(self):
+        """Changed rows are counted even in WAL mode, where the header counter stands still"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        scheduler = BackupScheduler(self.db_path, self.backup_dir, change_threshold=5)
+        self.assertTrue(scheduler.run_backup("scheduled"))
+        self.assertEqual(scheduler.pending_changes(), 0)
+
+        conn.executemany("INSERT INTO contacts (name) VALUES (?)", [('A',), ('B',), ('C',)])
+        conn.commit()
+        conn.execute("UPDATE contacts SET name = 'D' WHERE name = 'A'")
+        conn.commit()
+        self.assertEqual(scheduler.pending_changes(), 4)
+
+        # A new table is counted from the next poll on, and its creation counts as a change
+        conn.execute('CREATE TABLE budgets (id INTEGER PRIMARY KEY, name TEXT)')
+        conn.commit()
+        self.assertEqual(scheduler.pending_changes(), 5)
+        conn.execute("INSERT INTO budgets (name) VALUES ('Q1')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(scheduler.pending_changes(), 6)
+
+        manifest = scheduler.run_backup("6 changes")
+        self.assertEqual(manifest["change_count"], 6)
+        self.assertEqual(scheduler.pending_changes(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
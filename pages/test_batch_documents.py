@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image
+import warnings
+warnings.filterwarnings('ignore', category=UserWarning)
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_documents import (
+    document_filename,
+    render_document_job,
+    generate_document_zip
+)
+from pages.document_generator import record_document_paths
+
+def make_record(contact_id, document_name="Application Form", signature=None):
+    return {
+        'contact_id': contact_id,
+        'document_id': None,
+        'name': f'Test User {contact_id}',
+        'email': f'test{contact_id}@test.com',
+        'phone': '1234567890',
+        'interest': 'Developer',
+        'reason': 'Test reason',
+        'skillsets': 'Python, SQL',
+        'document_name': document_name,
+        'signature_hash': 'test-hash' if signature else None,
+        'signature': signature,
+        'timestamp': '2025-01-01 10:00:00',
+    }
+
+class TestBatchDocuments(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def test_document_filename(self):
+        """File names are unique per contact and safe for zip entries"""
+        self.assertEqual(document_filename(make_record(7, "Form / A")), "000007_Form _ A.pdf")
+        self.assertEqual(document_filename(make_record(7, None)), "000007_Application Form 7.pdf")
+
+    def test_render_document_job_with_signature(self):
+        """Workers render a PDF from a prefetched record into the document store"""
+        buffer = BytesIO()
+        Image.new('RGB', (60, 30), color='black').save(buffer, format="PNG")
+        record = make_record(1, signature=buffer.getvalue())
+        contact_id, document_name, path, created = render_document_job(record, self.store_dir)
+        self.assertEqual((contact_id, document_name), (1, "Application Form"))
+        self.assertTrue(created)
+        with open(path, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+        # Unchanged inputs reuse the stored file; changed inputs render a new one
+        self.assertEqual(render_document_job(record, self.store_dir)[2:], (path, False))
+        record['phone'] = '0987654321'
+        self.assertNotEqual(render_document_job(record, self.store_dir)[2], path)
+
+    def test_generate_document_zip(self):
+        """Every prefetched record ends up as one PDF in the archive"""
+        records = [make_record(i) for i in range(1, 6)]
+        output = BytesIO()
+        with patch('batch_documents.fetch_document_batch', return_value=records) as fetch, \
+                patch('batch_documents.record_document_paths') as record_paths:
+            count = generate_document_zip([1, 2, 3, 4, 5], output, max_workers=2, store_dir=self.store_dir)
+        fetch.assert_called_once_with([1, 2, 3, 4, 5])
+        self.assertEqual(count, 5)
+        self.assertEqual(len(record_paths.call_args[0][0]), 5)
+
+        # Reused documents are still recorded, in case a row names a stale path
+        with patch('batch_documents.fetch_document_batch', return_value=records), \
+                patch('batch_documents.record_document_paths') as record_paths:
+            generate_document_zip([1, 2, 3, 4, 5], BytesIO(), max_workers=2, store_dir=self.store_dir)
+        self.assertEqual(len(record_paths.call_args[0][0]), 5)
+
+        with zipfile.ZipFile(output) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 5)
+            self.assertTrue(archive.read(names[0]).startswith(b'%PDF'))
+
+    def test_record_document_paths(self):
+        """Stale paths are repointed, matching rows are left alone and missing rows are added"""
+        db_path = os.path.join(self.store_dir, 'crm.db')
+        conn = sqlite3.connect(db_path)
+        conn.executescript('''
+            CREATE TABLE application_documents (id INTEGER PRIMARY KEY, contact_id INTEGER, document_name TEXT,
+                                                document_path TEXT);
+            INSERT INTO application_documents (contact_id, document_name, document_path)
+            VALUES (1, 'Form', 'old/restored.pdf'), (2, 'Form', 'store/b.pdf');
+        ''')
+        conn.commit()
+        with patch('pages.document_generator.get_db_connection', lambda: sqlite3.connect(db_path)):
+            record_document_paths([(1, 'Form', 'store/a.pdf'), (2, 'Form', 'store/b.pdf'), (3, 'Form', 'store/c.pdf')])
+        rows = conn.execute('SELECT contact_id, document_path FROM application_documents ORDER BY id').fetchall()
+        conn.close()
+        self.assertEqual(rows, [(1, 'store/a.pdf'), (2, 'store/b.pdf'), (3, 'store/c.pdf')])
+
+if __name__ == '__main__':
+    unittest.main()
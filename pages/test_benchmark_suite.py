@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_suite import compare_results, find_baseline, percentile, record_run, run_scale, summarize
+from generate_data import generate_database
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_summarize(self):
+        """Percentiles interpolate between sorted samples"""
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.5)
+        summary = summarize([5.0, 1.0, 3.0, 2.0, 4.0])
+        self.assertEqual((summary['samples'], summary['min_ms'], summary['p50_ms'], summary['max_ms']), (5, 1.0, 3.0, 5.0))
+        self.assertEqual(summary['p95_ms'], 4.8)
+
+    def test_regressions_against_baseline(self):
+        """A function regresses when its median grows past the threshold by a meaningful amount"""
+        baseline = {'small': {'slow': {'p50_ms': 10.0}, 'tiny': {'p50_ms': 0.1}, 'steady': {'p50_ms': 10.0}}}
+        current = {'small': {'slow': {'p50_ms': 14.0}, 'tiny': {'p50_ms': 0.3}, 'steady': {'p50_ms': 11.0},
+                             'new': {'p50_ms': 1.0}}}
+        rows = {row['function']: row for row in compare_results(current, baseline, threshold=0.25)}
+        self.assertTrue(rows['slow']['regressed'])
+        self.assertFalse(rows['tiny']['regressed'])  # Tripled, but only by 0.2ms
+        self.assertFalse(rows['steady']['regressed'])
+        self.assertNotIn('new', rows)
+
+    def test_results_keyed_by_commit(self):
+        """Runs are stored per commit, dirty runs apart, and the baseline falls back sensibly"""
+        results = {'baseline': None, 'runs': {}}
+        record_run(results, 'aaa111', False, {'small': {'f': {'p50_ms': 1.0}}})
+        record_run(results, 'aaa111', False, {'medium': {'f': {'p50_ms': 2.0}}})
+        record_run(results, 'aaa111', True, {'small': {'f': {'p50_ms': 1.5}}})
+        self.assertEqual(set(results['runs']), {'aaa111', 'aaa111-dirty'})
+        self.assertEqual(set(results['runs']['aaa111']['results']), {'small', 'medium'})
+
+        self.assertEqual(find_baseline(results, 'aaa111-dirty'), 'aaa111')
+        self.assertIsNone(find_baseline(results, 'aaa111'))  # Uncommitted runs are never the baseline by default
+        record_run(results, 'bbb222', False, {'small': {'f': {'p50_ms': 1.0}}})
+        results['baseline'] = 'bbb222'
+        self.assertEqual(find_baseline(results, 'ccc333'), 'bbb222')
+        self.assertEqual(find_baseline(results, 'ccc333', 'aaa'), 'aaa111')
+        with self.assertRaises(ValueError):
+            find_baseline(results, 'ccc333', 'zzz')
+
+    def test_run_scale(self):
+        """The page functions are timed against the given database"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        db_path = os.path.join(directory, 'bench.db')
+        generate_database(db_path, {'contacts': 50, 'applications': 20, 'documents': 10, 'signatures': 5,
+                                    'budgets': 10, 'line_items': 40, 'products': 40, 'expenses': 400}, progress=False)
+        results = run_scale(db_path, ['get_budget_line_items', 'calculate_line_item_totals'], repeat=4)
+        self.assertEqual(set(results), {'get_budget_line_items', 'calculate_line_item_totals'})
+        self.assertEqual(results['get_budget_line_items']['samples'], 4)
+        self.assertLessEqual(results['calculate_line_item_totals']['p50_ms'], results['calculate_line_item_totals']['max_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
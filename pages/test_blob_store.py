@@ -0,0 +1,56 @@
+import unittest
+import sqlite3
+import os
+import sys
+from io import BytesIO
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import (
+    SubstrBlobReader,
+    open_blob,
+    iter_blob,
+    read_blob,
+    copy_blob
+)
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('CREATE TABLE signatures (hash TEXT PRIMARY KEY, image BLOB NOT NULL)')
+        self.payload = bytes(range(256)) * 1000  # 256,000 bytes
+        cursor = self.conn.execute("INSERT INTO signatures (hash, image) VALUES ('abc', ?)", (self.payload,))
+        self.rowid = cursor.lastrowid
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_iter_blob_yields_chunks(self):
+        """Blobs are returned in bounded chunks that add up to the whole value"""
+        chunks = list(iter_blob(self.conn, 'signatures', 'image', self.rowid, chunk_size=100000))
+        self.assertEqual([len(chunk) for chunk in chunks], [100000, 100000, 56000])
+        self.assertEqual(b''.join(chunks), self.payload)
+
+    def test_substr_reader_matches_blob(self):
+        """The substr() fallback reads the same bytes as incremental blob I/O"""
+        reader = SubstrBlobReader(self.conn, 'signatures', 'image', self.rowid)
+        self.assertEqual(len(reader), len(self.payload))
+        self.assertEqual(reader.read(10), self.payload[:10])
+        self.assertEqual(reader.read(), self.payload[10:])
+        self.assertEqual(reader.read(), b'')
+
+    def test_read_and_copy_blob(self):
+        """Whole-blob helpers rewind and count what they copied"""
+        self.assertEqual(read_blob(self.conn, 'signatures', 'image', self.rowid).read(), self.payload)
+        destination = BytesIO()
+        self.assertEqual(copy_blob(self.conn, 'signatures', 'image', self.rowid, destination), len(self.payload))
+        self.assertEqual(destination.getvalue(), self.payload)
+
+    def test_missing_blob(self):
+        """Reading a row that does not exist fails loudly"""
+        with self.assertRaises((ValueError, sqlite3.Error)):
+            open_blob(self.conn, 'signatures', 'image', 999)
+
+if __name__ == '__main__':
+    unittest.main()
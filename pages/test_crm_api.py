@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+import threading
+import http.client
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crm_services
+from crm_services.api import CRMServer
+
+SCHEMA = '''
+    CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, gender TEXT, name TEXT NOT NULL,
+                           email TEXT NOT NULL, phone TEXT NOT NULL, message TEXT NOT NULL, address_line TEXT,
+                           suburb TEXT, postcode TEXT, state TEXT, country TEXT);
+    CREATE TABLE budgets (id INTEGER PRIMARY KEY AUTOINCREMENT, contact_id INTEGER, budget_name TEXT NOT NULL,
+                          total_budget DECIMAL(10, 2), start_date DATE, end_date DATE, currency TEXT,
+                          status TEXT DEFAULT 'Active');
+'''
+
+class TestCrmApi(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        conn = crm_services.connect(self.db_path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.server = CRMServer(('127.0.0.1', 0), self.db_path, pool_size=2)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=10)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.db_path)
+
+    def request(self, method, path, body=None, headers=None):
+        self.client.request(method, path, body=None if body is None else json.dumps(body), headers=headers or {})
+        response = self.client.getresponse()
+        data = response.read()
+        return response.status, response.getheader('ETag'), json.loads(data) if data else None
+
+    def test_bulk_create_and_pagination(self):
+        """An array creates every record; listings page through them with a total"""
+        contacts = [{'name': f"Person {i}", 'email': f"p{i}@example.com", 'phone': '0400', 'message': 'Hi'}
+                    for i in range(5)]
+        status, _, body = self.request('POST', '/api/contacts', contacts)
+        self.assertEqual(status, 201)
+        self.assertEqual(len(body['ids']), 5)
+
+        status, _, page = self.request('GET', '/api/contacts?limit=2&offset=2')
+        self.assertEqual(status, 200)
+        self.assertEqual([c['name'] for c in page['items']], ['Person 2', 'Person 3'])
+        self.assertEqual((page['total'], page['next_offset']), (5, 4))
+
+        contact_id = body['ids'][0]
+        self.request('POST', '/api/budgets', {'contact_id': contact_id, 'budget_name': 'Support'})
+        _, _, budgets = self.request('GET', f"/api/budgets?contact_id={contact_id}")
+        self.assertEqual(budgets['items'][0]['status'], 'Active')
+        _, _, budgets = self.request('GET', f"/api/budgets?contact_id={contact_id + 1}")
+        self.assertEqual(budgets['total'], 0)
+
+    def test_etag_follows_data_version(self):
+        """If-None-Match answers 304 until a write commits"""
+        status, etag, _ = self.request('GET', '/api/contacts')
+        self.assertEqual(status, 200)
+        status, _, body = self.request('GET', '/api/contacts', headers={'If-None-Match': etag})
+        self.assertEqual((status, body), (304, None))
+
+        self.request('POST', '/api/contacts', {'name': 'Ada', 'email': 'ada@example.com', 'phone': '1',
+                                               'message': 'Hi'})
+        status, new_etag, body = self.request('GET', '/api/contacts', headers={'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(body['total'], 1)
+
+    def test_errors(self):
+        """Bad input is reported as JSON without breaking the keep-alive connection"""
+        status, _, body = self.request('POST', '/api/contacts', {'name': 'No email'})
+        self.assertEqual(status, 400)
+        self.assertIn('Missing required fields', body['error'])
+        self.assertEqual(self.request('POST', '/api/unknown', {'a': 1})[0], 404)
+        self.assertEqual(self.request('PATCH', '/api/contacts/7', {'phone': '2'})[0], 404)
+        status, _, body = self.request('PATCH', '/api/contacts/7', {'contact_id': 7, 'conn': None})
+        self.assertEqual(status, 400)
+        self.assertIn('Unknown fields: conn, contact_id', body['error'])
+        self.assertEqual(self.request('DELETE', '/api/expenses/1')[0], 405)
+        self.assertEqual(self.request('GET', '/api/contacts?limit=lots')[0], 400)
+        # Same connection still serves requests
+        self.assertEqual(self.request('GET', '/api/contacts')[0], 200)
+
+if __name__ == '__main__':
+    unittest.main()
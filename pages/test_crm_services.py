@@ -0,0 +1,190 @@
+import unittest
+import sqlite3
+import os
+import io
+import sys
+import json
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crm_services
+from crm_services import ValidationError, NotFoundError
+from crm_services.__main__ import main
+
+SCHEMA = '''
+    CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, gender TEXT, name TEXT NOT NULL,
+                           email TEXT NOT NULL, phone TEXT NOT NULL, message TEXT NOT NULL, address_line TEXT,
+                           suburb TEXT, postcode TEXT, state TEXT, country TEXT);
+    CREATE TABLE budgets (id INTEGER PRIMARY KEY AUTOINCREMENT, contact_id INTEGER, budget_name TEXT NOT NULL,
+                          total_budget DECIMAL(10, 2), start_date DATE, end_date DATE, currency TEXT,
+                          status TEXT DEFAULT 'Active');
+    CREATE TABLE budget_line_items (id INTEGER PRIMARY KEY AUTOINCREMENT, budget_id INTEGER,
+                                    line_item_name TEXT NOT NULL, allocated_amount DECIMAL(10, 2),
+                                    spent_amount DECIMAL(10, 2) DEFAULT 0.00, status TEXT DEFAULT 'Active');
+    CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, line_item_id INTEGER, product_name TEXT NOT NULL,
+                           product_group TEXT, rate DECIMAL(10, 2), frequency TEXT, service_name TEXT,
+                           description TEXT, status TEXT DEFAULT 'Active');
+    CREATE TABLE expenses (id INTEGER PRIMARY KEY AUTOINCREMENT, line_item_id INTEGER, product_id INTEGER,
+                           amount DECIMAL(10, 2), quantity DECIMAL(10, 2), date_incurred DATE, description TEXT,
+                           status TEXT DEFAULT 'Active');
+'''
+
+def contact(name, email=None):
+    return {'name': name, 'email': email or f"{name.lower()}@example.com", 'phone': '0400000000', 'message': 'Hi'}
+
+class TestCrmServices(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.conn = crm_services.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def tearDown(self):
+        self.conn.close()
+        os.remove(self.db_path)
+
+    def test_contacts_crud_and_validation(self):
+        """Contacts are validated, paginated, updated and deleted without Streamlit"""
+        ids = crm_services.create_contacts(self.conn, [contact(name) for name in ('Ada', 'Bob', 'Cy')])
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(crm_services.count_contacts(self.conn), 3)
+        page = crm_services.list_contacts(self.conn, limit=2, offset=1)
+        self.assertEqual([c['name'] for c in page], ['Bob', 'Cy'])
+
+        with self.assertRaises(ValidationError):
+            crm_services.create_contacts(self.conn, [contact('Dee'), contact('Eve', email='not-an-email')])
+        # A failed bulk create inserts nothing
+        self.assertEqual(crm_services.count_contacts(self.conn), 3)
+        with self.assertRaises(ValidationError):
+            crm_services.update_contact(self.conn, ids[0], nickname='A')
+
+        self.assertTrue(crm_services.update_contact(self.conn, ids[0], phone='0411111111'))
+        self.assertEqual(crm_services.get_contact(self.conn, ids[0])['phone'], '0411111111')
+        self.assertTrue(crm_services.delete_contact(self.conn, ids[1]))
+        self.assertFalse(crm_services.delete_contact(self.conn, ids[1]))
+        self.assertIsNone(crm_services.get_contact(self.conn, ids[1]))
+
+    def test_budget_line_items_and_expenses(self):
+        """Line items total their expenses and allocations are checked against the budget"""
+        contact_id = crm_services.create_contact(self.conn, **contact('Ada'))
+        budget_id = crm_services.create_budget(self.conn, contact_id=contact_id, budget_name='Support',
+                                               total_budget=1000, currency='AUD')
+        line_item_id = crm_services.create_line_item(self.conn, budget_id=budget_id, line_item_name='Therapy',
+                                                     allocated_amount=600)
+        product_id = crm_services.create_product(self.conn, line_item_id=line_item_id, product_name='Session',
+                                                 rate=100, frequency='weekly')
+        crm_services.add_expenses(self.conn, [
+            {'line_item_id': line_item_id, 'product_id': product_id, 'amount': 100, 'quantity': 2},
+            {'line_item_id': line_item_id, 'product_id': product_id, 'amount': 50, 'quantity': 1},
+        ])
+
+        line_items = crm_services.list_line_items(self.conn, budget_id)
+        self.assertEqual(line_items[0]['spent_amount'], 250)
+        self.assertEqual(line_items[0]['status'], 'Active')
+        self.assertEqual(crm_services.line_item_totals(self.conn, line_item_id)['remaining'], 350.0)
+        self.assertEqual(crm_services.get_budget_details(self.conn, budget_id)['remaining_budget'], 400)
+        self.assertEqual(crm_services.count_expenses(self.conn, line_item_id), 2)
+        self.assertTrue(crm_services.validate_budget_allocation(self.conn, budget_id, 400))
+        self.assertFalse(crm_services.validate_budget_allocation(self.conn, budget_id, 401))
+        self.assertTrue(crm_services.validate_budget_allocation(self.conn, budget_id, 1000, line_item_id))
+        with self.assertRaises(NotFoundError):
+            crm_services.validate_budget_allocation(self.conn, 999, 1)
+
+        dashboard = crm_services.line_item_dashboard(self.conn, line_item_id, expense_limit=1, expense_offset=1)
+        self.assertEqual(dashboard['line_item']['currency'], 'AUD')
+        self.assertEqual([p['product_name'] for p in dashboard['products']], ['Session'])
+        self.assertEqual([e['total_amount'] for e in dashboard['expenses']], [200])
+        self.assertEqual(dashboard['expense_count'], 2)
+        self.assertEqual(dashboard['totals'], crm_services.line_item_totals(self.conn, line_item_id))
+        with self.assertRaises(NotFoundError):
+            crm_services.line_item_dashboard(self.conn, 999)
+
+        self.assertTrue(crm_services.delete_line_item(self.conn, line_item_id))
+        self.assertEqual(crm_services.count_products(self.conn, line_item_id), 0)
+
+    def test_expense_fields_are_stored_as_given(self):
+        """add_expense writes the status it is given and treats a missing amount or quantity as zero spend"""
+        contact_id = crm_services.create_contact(self.conn, **contact('Ada'))
+        budget_id = crm_services.create_budget(self.conn, contact_id=contact_id, budget_name='Support',
+                                               total_budget=1000, currency='AUD')
+        line_item_id = crm_services.create_line_item(self.conn, budget_id=budget_id, line_item_name='Therapy',
+                                                     allocated_amount=600)
+        pending_id = crm_services.add_expense(self.conn, line_item_id=line_item_id, amount=100, quantity=1,
+                                              status='Pending')
+        draft_id = crm_services.add_expense(self.conn, line_item_id=line_item_id, amount=None, quantity=None)
+
+        self.assertEqual(crm_services.get_expense(self.conn, pending_id)['status'], 'Pending')
+        self.assertEqual(crm_services.get_expense(self.conn, draft_id)['status'], 'Active')
+        self.assertEqual(crm_services.list_line_items(self.conn, budget_id)[0]['spent_amount'], 100)
+
+    def test_budget_tree(self):
+        """A contact's budgets load with nested line items, products and expenses in one statement"""
+        contact_id = crm_services.create_contact(self.conn, **contact('Ada'))
+        budget_ids = crm_services.create_budgets(self.conn, [
+            {'contact_id': contact_id, 'budget_name': 'Support', 'total_budget': 1000, 'currency': 'AUD'},
+            {'contact_id': contact_id, 'budget_name': 'Empty', 'total_budget': 50, 'currency': 'AUD'},
+        ])
+        line_item_ids = crm_services.create_line_items(self.conn, [
+            {'budget_id': budget_ids[0], 'line_item_name': 'Therapy', 'allocated_amount': 600},
+            {'budget_id': budget_ids[0], 'line_item_name': 'Transport', 'allocated_amount': 100},
+        ])
+        product_ids = crm_services.create_products(self.conn, [
+            {'line_item_id': line_item_ids[0], 'product_name': 'Session', 'rate': 100},
+            {'line_item_id': line_item_ids[0], 'product_name': 'Report', 'rate': 80},
+        ])
+        crm_services.add_expenses(self.conn, [
+            {'line_item_id': line_item_ids[0], 'product_id': product_ids[0], 'amount': 100, 'quantity': 2,
+             'date_incurred': '2024-02-01'},
+            {'line_item_id': line_item_ids[0], 'product_id': product_ids[0], 'amount': 100, 'quantity': 1,
+             'date_incurred': '2024-01-01'},
+            {'line_item_id': line_item_ids[0], 'product_id': product_ids[1], 'amount': 80, 'quantity': 1},
+        ])
+
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        trees = crm_services.budget_trees(self.conn, contact_id=contact_id)
+        self.conn.set_trace_callback(None)
+        self.assertEqual(len(statements), 1)
+
+        support, empty = trees
+        self.assertEqual((support['allocated'], support['spent']), (700, 380))
+        therapy, transport = support['line_items']
+        self.assertEqual(therapy['spent'], 380)
+        self.assertEqual([p['spent'] for p in therapy['products']], [300, 80])
+        self.assertEqual([e['date_incurred'] for e in therapy['products'][0]['expenses']],
+                         ['2024-01-01', '2024-02-01'])
+        self.assertEqual((transport['spent'], transport['products']), (0, []))
+        self.assertEqual((empty['spent'], empty['line_items']), (0, []))
+
+        self.assertEqual(crm_services.budget_tree(self.conn, budget_ids[1])['budget_name'], 'Empty')
+        self.assertEqual(crm_services.budget_trees(self.conn, [budget_ids[1], 999]), [empty])
+        with self.assertRaises(NotFoundError):
+            crm_services.budget_tree(self.conn, 999)
+
+    def test_cli(self):
+        """The CLI creates from JSON, lists JSON lines and reports errors with exit status 1"""
+        out, err = io.StringIO(), io.StringIO()
+        records = json.dumps([contact('Ada'), contact('Bob')])
+        with redirect_stdout(out), redirect_stderr(err):
+            self.assertEqual(main(['contacts', 'create', '--data', records, '--db', self.db_path]), 0)
+            self.assertEqual(main(['contacts', 'list', '--limit', '1', '--offset', '1', '--db', self.db_path]), 0)
+            self.assertEqual(main(['contacts', 'get', '99', '--db', self.db_path]), 1)
+            self.assertEqual(main(['contacts', 'create', '--data', json.dumps({'name': 'Cy'}),
+                                   '--db', self.db_path]), 1)
+            changes = self.db_path + '.json'
+            self.addCleanup(os.remove, changes)
+            with open(changes, 'w', encoding='utf-8') as f:
+                json.dump({'phone': '0400 000 000'}, f)
+            self.assertEqual(main(['contacts', 'update', '1', '--file', changes, '--db', self.db_path]), 0)
+            self.assertEqual(main(['contacts', 'update', '1', '--data', json.dumps({'contact_id': 1}),
+                                   '--db', self.db_path]), 1)
+        self.assertEqual(self.conn.execute('SELECT phone FROM contacts WHERE id = 1').fetchone()[0], '0400 000 000')
+        listed = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([c['name'] for c in listed], ['Bob'])
+        self.assertIn('Missing required fields', err.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import sqlite3
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe_contacts import (
+    normalize_name,
+    normalize_email,
+    normalize_phone,
+    blocking_keys,
+    find_duplicates,
+    duplicate_clusters,
+    merge_contacts,
+    find_contacts_by_email
+)
+
+class TestDedupeContacts(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript('''
+            CREATE TABLE contacts (id INTEGER PRIMARY KEY, title TEXT, gender TEXT, name TEXT, email TEXT, phone TEXT,
+                                   message TEXT, address_line TEXT, suburb TEXT, postcode TEXT, state TEXT, country TEXT);
+            CREATE TABLE applications (id INTEGER PRIMARY KEY, contact_id INTEGER);
+            CREATE TABLE application_documents (id INTEGER PRIMARY KEY, contact_id INTEGER);
+            CREATE TABLE budgets (id INTEGER PRIMARY KEY, contact_id INTEGER);
+        ''')
+        self.conn.executemany('INSERT INTO contacts (id, name, email, phone, suburb) VALUES (?, ?, ?, ?, ?)', [
+            (1, 'Jane Smith', 'jane.smith@gmail.com', '0298765432', None),
+            (2, 'Dr. JANE SMITH', 'janesmith+crm@gmail.com', '+61 2 9876 5432', 'Newtown'),
+            (3, 'Jane Smyth', 'jsmyth@example.com', '(02) 9876-5432', None),
+            (4, 'John Smith', 'john@example.com', '0411111111', None),
+            (5, 'Jon Smith', 'jon.other@example.com', '0422222222', None),
+        ])
+        self.conn.executemany('INSERT INTO budgets (contact_id) VALUES (?)', [(2,), (2,), (4,)])
+        self.conn.executemany('INSERT INTO applications (contact_id) VALUES (?)', [(3,)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_normalization(self):
+        """Formatting differences in names, emails and phones normalize away"""
+        self.assertEqual(normalize_name("Dr. Jane  O'Neil"), 'jane o neil')
+        self.assertEqual(normalize_email(' Jane.Smith+news@GoogleMail.com '), 'janesmith@gmail.com')
+        self.assertEqual(normalize_email('jane.smith@example.com'), 'jane.smith@example.com')
+        self.assertEqual(normalize_phone('+61 2 9876 5432'), normalize_phone('(02) 9876-5432'))
+        self.assertEqual(blocking_keys('jane smith', 'jane@example.com', '98765432'),
+                         ['e:jane@example.com', 'd:example.com:jan', 'p:98765432'])
+
+    def test_find_duplicates(self):
+        """Only records sharing a blocking key and scoring above the threshold are reported"""
+        matches = find_duplicates(self.conn)
+        self.assertEqual([(a, b) for a, b, _ in matches], [(1, 2), (1, 3), (2, 3)])
+        self.assertEqual(matches[0][2], 1.0)
+        self.assertEqual(duplicate_clusters(matches), [[1, 2, 3]])
+        # Similar names alone (4 and 5) are not enough at the default threshold
+        self.assertNotIn(4, [a for a, _, _ in matches])
+
+    def test_merge_contacts(self):
+        """Merging repoints related rows, fills blanks and deletes the duplicates in one go"""
+        moved = merge_contacts(self.conn, 1, [2, 3])
+        self.assertEqual(moved, {'applications': 1, 'application_documents': 0, 'budgets': 2, 'contacts': 2})
+        self.assertEqual(self.conn.execute('SELECT id, suburb FROM contacts WHERE id <= 3').fetchall(), [(1, 'Newtown')])
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM budgets WHERE contact_id = 1').fetchone()[0], 2)
+
+    def test_find_contacts_by_email(self):
+        """Existing contacts are found regardless of case and surrounding spaces"""
+        self.assertEqual(find_contacts_by_email(self.conn, ' JOHN@example.com'), [4])
+        self.assertEqual(find_contacts_by_email(self.conn, 'nobody@example.com'), [])
+
+if __name__ == '__main__':
+    unittest.main()
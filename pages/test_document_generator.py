@@ -14,8 +14,12 @@ from document_generator import (
     save_signature_to_db,
     fetch_signature_from_db,
     fetch_contact_with_application,
-    create_document
+    create_document,
+    decode_signature,
+    compact_signature
 )
+import numpy as np
+from unittest.mock import patch
 
 class TestDocumentGenerator(unittest.TestCase):
     def setUp(self):
@@ -97,6 +101,19 @@ class TestDocumentGenerator(unittest.TestCase):
         self.assertIsNotNone(fetched_signature)
         self.assertIsInstance(fetched_signature, BytesIO)
 
+    def test_fetch_signature_after_rowid_changes(self):
+        """The cached metadata finds the signature by hash even if its rowid has moved"""
+        save_signature_to_db(1, Image.new('RGB', (60, 30), color='red'))
+        expected = fetch_signature_from_db(1).getvalue()
+
+        # signatures has no INTEGER PRIMARY KEY, so VACUUM may renumber it; move the row by hand
+        conn = sqlite3.connect('crm.db')
+        conn.execute('UPDATE signatures SET rowid = rowid + 1000')
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(fetch_signature_from_db(1).getvalue(), expected)
+
     def test_fetch_contact_with_application(self):
         """Test fetching contact data with associated application"""
         try:
@@ -170,6 +187,52 @@ class TestDocumentGenerator(unittest.TestCase):
         self.assertIsNotNone(pdf_output)
         self.assertTrue(pdf_output.getvalue().startswith(b'%PDF'))
 
+    def test_create_document_with_signature_in_memory(self):
+        """Signatures are embedded from memory without touching temp files"""
+        buffer = BytesIO()
+        Image.new('RGBA', (50, 20), color=(0, 0, 0, 255)).save(buffer, format="PNG")
+
+        with patch('tempfile.NamedTemporaryFile') as temp_file:
+            pdf_output = create_document(
+                contact_name="Test User",
+                contact_email="test@test.com",
+                contact_phone="1234567890",
+                document_name="Signed Document",
+                interest="Developer",
+                reason="Test reason",
+                skillsets="Python, SQL",
+                signature_image=BytesIO(buffer.getvalue())
+            )
+            temp_file.assert_not_called()
+        self.assertIn(b'/Subtype /Image', pdf_output.getvalue())
+
+    def test_decode_signature_is_cached_by_content(self):
+        """Identical signature bytes are decoded only once"""
+        buffer = BytesIO()
+        Image.new('1', (40, 10), color=1).save(buffer, format="PNG")
+
+        first_digest, first_info = decode_signature(buffer.getvalue())
+        second_digest, second_info = decode_signature(bytes(buffer.getvalue()))
+        self.assertEqual(first_digest, second_digest)
+        self.assertIs(first_info, second_info)
+        self.assertEqual(first_info['bpc'], 1)
+
+    def test_compact_signature_crops_to_ink(self):
+        """Canvas drawings are cropped to the strokes and stored as 1-bit PNGs"""
+        canvas = np.zeros((200, 500, 4), dtype=np.uint8)  # Transparent, like st_canvas
+        canvas[50:60, 100:300] = (0, 0, 0, 255)
+
+        signature = Image.open(BytesIO(compact_signature(canvas)))
+        self.assertEqual(signature.mode, '1')
+        self.assertEqual(signature.size, (204, 14))  # Strokes plus a 2px margin
+        self.assertEqual(signature.getpixel((0, 0)), 255)
+        self.assertEqual(signature.getpixel((100, 7)), 0)
+
+    def test_compact_signature_blank_canvas(self):
+        """An untouched canvas has no signature to store"""
+        self.assertIsNone(compact_signature(np.zeros((200, 500, 4), dtype=np.uint8)))
+        self.assertIsNone(compact_signature(Image.new('RGB', (50, 20), color='white')))
+
     def test_fetch_signature_nonexistent_contact(self):
         """Test fetching signature for non-existent contact"""
         signature = fetch_signature_from_db(999)
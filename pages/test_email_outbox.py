@@ -0,0 +1,124 @@
+import unittest
+import sqlite3
+import os
+import sys
+import smtplib
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_outbox import (
+    OutboxWorker,
+    enqueue_email,
+    outbox_stats
+)
+
+class FakePool:
+    """Stands in for SMTPPool, failing for recipients listed in errors"""
+
+    def __init__(self, errors=None):
+        self.size = 2
+        self.errors = errors or {}
+        self.delivered = []
+
+    def send(self, message):
+        error = self.errors.get(message['To'])
+        if error:
+            raise error
+        self.delivered.append(message['To'])
+
+    def close(self):
+        pass
+
+class TestEmailOutbox(unittest.TestCase):
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.pool = FakePool({
+            'flaky@example.com': smtplib.SMTPServerDisconnected('Connection unexpectedly closed'),
+            'gone@example.com': smtplib.SMTPRecipientsRefused({'gone@example.com': (550, b'No such user')}),
+        })
+        self.worker = OutboxWorker(self.db_path, self.pool, batch_size=10, max_attempts=3, base_delay=60, jitter=0)
+        self.conn = sqlite3.connect(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.worker.close()
+        os.remove(self.db_path)
+
+    def status_of(self, email_id):
+        return self.conn.execute('SELECT status, attempts FROM email_outbox WHERE id = ?', (email_id,)).fetchone()
+
+    def test_delivers_queued_emails(self):
+        """Queued emails are delivered in a batch and marked sent"""
+        ids = [enqueue_email(self.conn, f'user{i}@example.com', 'Hi', 'Body') for i in range(5)]
+        self.assertEqual(outbox_stats(self.conn)['queued'], 5)
+        self.assertEqual(self.worker.run_once(), 5)
+        self.assertEqual(len(self.pool.delivered), 5)
+        self.assertEqual([self.status_of(email_id) for email_id in ids], [('sent', 1)] * 5)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_transient_failure_backs_off_then_fails(self):
+        """Transient failures are retried with exponential backoff until attempts run out"""
+        email_id = enqueue_email(self.conn, 'flaky@example.com', 'Hi', 'Body')
+        self.worker.run_once()
+        self.assertEqual(self.status_of(email_id), ('queued', 1))
+        next_attempt = self.conn.execute('SELECT next_attempt_at FROM email_outbox WHERE id = ?', (email_id,)).fetchone()[0]
+        self.assertGreaterEqual(next_attempt - time.time(), 55)
+
+        # Not due yet, so nothing is claimed
+        self.assertEqual(self.worker.run_once(), 0)
+        self.assertEqual([self.worker.retry_delay(n) for n in (1, 2, 3)], [60, 120, 240])
+
+        for _ in range(2):
+            self.conn.execute('UPDATE email_outbox SET next_attempt_at = 0 WHERE id = ?', (email_id,))
+            self.conn.commit()
+            self.worker.run_once()
+        self.assertEqual(self.status_of(email_id), ('failed', 3))
+
+    def test_permanent_failure_is_not_retried(self):
+        """Refused recipients fail immediately"""
+        email_id = enqueue_email(self.conn, 'gone@example.com', 'Hi', 'Body')
+        self.worker.run_once()
+        self.assertEqual(self.status_of(email_id), ('failed', 1))
+
+    def test_unexpected_error_fails_only_that_email(self):
+        """An email that cannot be built or sent fails on its own; the rest of its batch is marked sent"""
+        self.pool.errors['broken@example.com'] = ValueError('cannot encode message')
+        broken_id = enqueue_email(self.conn, 'broken@example.com', 'Hi', 'Body')
+        ok_id = enqueue_email(self.conn, 'user@example.com', 'Hi', 'Body')
+        self.assertEqual(self.worker.run_once(), 2)
+        self.assertEqual(self.status_of(broken_id), ('failed', 1))
+        self.assertEqual(self.status_of(ok_id), ('sent', 1))
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_run_forever_survives_errors(self):
+        """The worker thread keeps polling after an error outside a single delivery"""
+        calls = []
+        def failing_run_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('boom')
+            return 0
+        self.worker.run_once = failing_run_once
+        self.worker.poll_interval = 0.01
+        self.worker.start()
+        deadline = time.time() + 5
+        while len(calls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.worker.stop()
+        self.assertGreaterEqual(len(calls), 2)
+
+    def test_expired_claim_is_reclaimed(self):
+        """Emails claimed by a worker that died are picked up again after the lease"""
+        email_id = enqueue_email(self.conn, 'user@example.com', 'Hi', 'Body')
+        self.conn.execute("UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                          (time.time() - self.worker.lease - 1, email_id))
+        self.conn.commit()
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(self.status_of(email_id), ('sent', 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sqlite3
+import os
+import sys
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_documents import (
+    select_documents,
+    export_documents
+)
+
+class TestExportDocuments(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript('''
+            CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE signatures (hash TEXT PRIMARY KEY, image BLOB NOT NULL);
+            CREATE TABLE application_documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                contact_id INTEGER,
+                document_name TEXT,
+                document_path TEXT,
+                signature BLOB,
+                timestamp TIMESTAMP,
+                signature_hash TEXT
+            );
+            INSERT INTO contacts VALUES (1, 'Ada Lovelace'), (2, 'Alan Turing');
+        ''')
+        self.signature = b'\x89PNG' + bytes(range(256)) * 400
+        self.conn.execute("INSERT INTO signatures VALUES ('sig1', ?)", (self.signature,))
+
+        self.pdf_path = os.path.join(self.store_dir, 'ada.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.3 test document')
+        self.conn.executemany('''
+            INSERT INTO application_documents (contact_id, document_name, document_path, timestamp, signature_hash)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (1, 'Application Form', self.pdf_path, '2025-01-10 09:00:00', 'sig1'),
+            (2, 'Application Form', None, '2025-02-10 09:00:00', None),
+        ])
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def test_select_documents_filters(self):
+        """Documents can be selected by contact, date range and status"""
+        self.assertEqual(len(list(select_documents(self.conn))), 2)
+        self.assertEqual([row['contact_id'] for row in select_documents(self.conn, contact_ids=[2])], [2])
+        self.assertEqual([row['contact_id'] for row in select_documents(self.conn, end_date='2025-01-10')], [1])
+        self.assertEqual([row['contact_id'] for row in select_documents(self.conn, start_date='2025-02-01')], [2])
+        self.assertEqual([row['contact_id'] for row in select_documents(self.conn, status='signed')], [1])
+        self.assertEqual([row['contact_id'] for row in select_documents(self.conn, status='pending')], [2])
+        with self.assertRaises(ValueError):
+            list(select_documents(self.conn, status='archived'))
+
+    def test_export_documents_streams_pdfs_and_signatures(self):
+        """The archive holds each stored PDF, its signature and a manifest of every selected document"""
+        output = BytesIO()
+        documents, signatures = export_documents(self.conn, output)
+        self.assertEqual((documents, signatures), (1, 1))
+
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(archive.read('000001_Ada Lovelace/000001_Application Form.pdf'),
+                             b'%PDF-1.3 test document')
+            self.assertEqual(archive.read('000001_Ada Lovelace/000001_Application Form_signature.png'),
+                             self.signature)
+            manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode('utf-8'))))
+        self.assertEqual(len(manifest), 2)
+        self.assertEqual(manifest[1]['note'], 'document not generated')
+
+if __name__ == '__main__':
+    unittest.main()
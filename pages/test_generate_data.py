@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_data import generate_database
+
+COUNTS = {'contacts': 300, 'applications': 150, 'documents': 90, 'signatures': 30,
+          'budgets': 60, 'line_items': 400, 'products': 500, 'expenses': 4000}
+
+class TestGenerateData(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'synthetic.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_generated_database(self):
+        """Row counts match, spent amounts add up and every child points at an existing parent"""
+        row_counts, _ = generate_database(self.db_path, COUNTS, seed=1, progress=False)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for table, count in row_counts.items():
+                self.assertEqual(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0], count)
+            self.assertEqual(row_counts['expenses'], COUNTS['expenses'])
+            self.assertEqual(row_counts['budget_line_items'], COUNTS['line_items'])
+
+            self.assertEqual(conn.execute('''
+                SELECT COUNT(*) FROM budget_line_items l
+                WHERE ABS(l.spent_amount - (SELECT COALESCE(SUM(amount * quantity), 0)
+                                            FROM expenses e WHERE e.line_item_id = l.id)) > 0.01
+            ''').fetchone()[0], 0)
+            self.assertEqual(conn.execute('''
+                SELECT COUNT(*) FROM expenses e JOIN products p ON p.id = e.product_id
+                WHERE p.line_item_id != e.line_item_id
+            ''').fetchone()[0], 0)
+            self.assertEqual(conn.execute('PRAGMA foreign_key_check').fetchall(), [])
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            self.assertIn('idx_expenses_line_item_id', indexes)
+
+            # Skewed: the busiest budget has many times the average number of line items
+            busiest = conn.execute('''
+                SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM budget_line_items GROUP BY budget_id)
+            ''').fetchone()[0]
+            self.assertGreater(busiest, 3 * COUNTS['line_items'] / COUNTS['budgets'])
+        finally:
+            conn.close()
+
+    def test_same_seed_same_data(self):
+        """The same seed and counts give byte-identical databases; another seed does not"""
+        generate_database(self.db_path, COUNTS, seed=7, progress=False)
+        again = os.path.join(self.directory, 'again.db')
+        generate_database(again, COUNTS, seed=7, progress=False)
+        other = os.path.join(self.directory, 'other.db')
+        generate_database(other, COUNTS, seed=8, progress=False)
+        with open(self.db_path, 'rb') as a, open(again, 'rb') as b, open(other, 'rb') as c:
+            first = a.read()
+            self.assertEqual(first, b.read())
+            self.assertNotEqual(first, c.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import io
+import json
+import logging
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging_config
+from logging_config import bind_context, configure_logging, log_context, parse_levels, shutdown_logging
+
+class TestLoggingConfig(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        configure_logging(self.stream, level='INFO', levels={'crm.test.quiet': 'WARNING'}, log_format='json')
+        self.addCleanup(configure_logging, sys.stderr, level=logging_config.LOG_LEVEL, levels={}, log_format='json')
+        self.addCleanup(bind_context)
+        self.logger = logging.getLogger('crm.test')
+
+    def records(self):
+        shutdown_logging()  # Stops the listener after it has written everything queued
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_records_with_context(self):
+        """Records are JSON lines carrying extra fields and the bound correlation ids"""
+        bind_context(session_id='s1', rerun_id=7, page='budgets')
+        self.logger.info("Loaded %d rows", 3, extra={'table': 'budgets'})
+        with log_context(request_id='abc123'):
+            self.logger.warning("Inside request")
+        self.logger.info("After request")
+        logging.getLogger('crm.test.quiet').info("Filtered out by its own level")
+
+        first, inside, after = self.records()
+        self.assertEqual(first['msg'], "Loaded 3 rows")
+        self.assertEqual(first['level'], 'INFO')
+        self.assertEqual(first['logger'], 'crm.test')
+        self.assertEqual((first['table'], first['session_id'], first['rerun_id'], first['page']),
+                         ('budgets', 's1', 7, 'budgets'))
+        self.assertEqual(inside['request_id'], 'abc123')
+        self.assertNotIn('request_id', after)
+
+    def test_sampling_and_exceptions(self):
+        """Sampled records keep one in N, and tracebacks are logged as a separate field"""
+        for i in range(10):
+            self.logger.info("Hot path event", extra={'sample': 4, 'i': i})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("Failed")
+
+        records = self.records()
+        self.assertEqual([r['i'] for r in records if r['msg'] == "Hot path event"], [0, 4, 8])
+        self.assertTrue(all(r['sample'] == 4 for r in records if r['msg'] == "Hot path event"))
+        failed = records[-1]
+        self.assertEqual(failed['msg'], "Failed")
+        self.assertIn('ValueError: boom', failed['exc'])
+
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels(' crm.db=debug, crm.api=WARNING ,'), {'crm.db': 'DEBUG', 'crm.api': 'WARNING'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import sqlite3
+import os
+import sys
+import socketserver
+import threading
+import smtplib
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_sender import (
+    SMTPPool,
+    build_message,
+    send_bulk,
+    mail_merge
+)
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for smtplib to deliver messages to a list in memory"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode('utf-8')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address.endswith('@refused.test'):
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline().decode('utf-8')
+                    if data_line in ('.\r\n', ''):
+                        break
+                    lines.append(data_line)
+                self.server.messages.append((recipients, ''.join(lines)))
+                self.reply('250 Queued')
+            elif command in ('NOOP', 'RSET'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.messages = []
+        self.connections = 0
+
+class TestMailSender(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalSMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pool = SMTPPool('127.0.0.1', self.server.server_address[1], password='', size=2, starttls=False)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pool_reuses_connections(self):
+        """Many messages are sent over at most pool-size connections"""
+        messages = (build_message(f'user{i}@example.com', 'Hello', f'Body {i}') for i in range(20))
+        sent, failures = send_bulk(self.pool, messages)
+        self.assertEqual((sent, failures), (20, []))
+        self.assertEqual(len(self.server.messages), 20)
+        self.assertLessEqual(self.pool.connections_opened, 2)
+
+    def test_rejected_recipient_keeps_connection(self):
+        """A refused recipient is reported without dropping the pooled connection"""
+        messages = [build_message('nobody@refused.test', 'Hi', 'Body'), build_message('ok@example.com', 'Hi', 'Body')]
+        sent, failures = send_bulk(self.pool, messages, workers=1)
+        self.assertEqual(sent, 1)
+        self.assertEqual([recipient for recipient, _ in failures], ['nobody@refused.test'])
+        self.assertEqual(self.pool.connections_opened, 1)
+
+    def test_failed_handshake_closes_socket(self):
+        """A connection whose STARTTLS fails is closed, not leaked"""
+        pool = SMTPPool('127.0.0.1', self.server.server_address[1], password='', size=1, starttls=True)
+        with patch.object(smtplib.SMTP, 'close', autospec=True, side_effect=smtplib.SMTP.close) as close:
+            with self.assertRaises(smtplib.SMTPNotSupportedError):
+                pool._connect()
+        close.assert_called_once()
+        self.assertIsNone(close.call_args.args[0].sock)
+        self.assertEqual(pool.connections_opened, 0)
+
+    def test_unexpected_error_keeps_worker_running(self):
+        """A message failing with something other than an SMTP error is reported and the rest still go out"""
+        class BrokenPool:
+            def send(self, message):
+                if message['To'] == 'broken@example.com':
+                    raise UnicodeEncodeError('ascii', 'é', 0, 1, 'ordinal not in range(128)')
+                self.pool.send(message)
+        broken = BrokenPool()
+        broken.pool = self.pool
+        messages = [build_message('broken@example.com', 'Hi', 'Body')] * 3 + \
+                   [build_message(f'user{i}@example.com', 'Hi', 'Body') for i in range(10)]
+        sent, failures = send_bulk(broken, messages, workers=1)
+        self.assertEqual(sent, 10)
+        self.assertEqual([recipient for recipient, _ in failures], ['broken@example.com'] * 3)
+
+    def test_mail_merge_to_filtered_contacts(self):
+        """Each matching contact receives a message rendered from their own fields"""
+        conn = sqlite3.connect(':memory:')
+        conn.execute('''CREATE TABLE contacts (id INTEGER PRIMARY KEY, title TEXT, gender TEXT, name TEXT, email TEXT,
+                        phone TEXT, address_line TEXT, suburb TEXT, postcode TEXT, state TEXT, country TEXT)''')
+        conn.executemany("INSERT INTO contacts (name, email, state) VALUES (?, ?, ?)", [
+            ('Ada', 'ada@example.com', 'NSW'),
+            ('Alan', 'alan@example.com', 'VIC'),
+            ('Grace', 'grace@example.com', 'NSW'),
+        ])
+        sent, failures = mail_merge(self.pool, conn, 'Hello {name}', 'Dear {name} from {state}, {title}', state='NSW')
+        conn.close()
+        self.assertEqual((sent, failures), (2, []))
+        bodies = {recipients[0]: body for recipients, body in self.server.messages}
+        self.assertIn('Dear Ada from NSW, \r\n', bodies['ada@example.com'])
+        self.assertIn('Dear Grace from NSW', bodies['grace@example.com'])
+
+if __name__ == '__main__':
+    unittest.main()
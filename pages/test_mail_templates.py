@@ -0,0 +1,88 @@
+import unittest
+import sqlite3
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_templates import (
+    compile_template,
+    render_merge,
+    benchmark_render
+)
+from email_outbox import ensure_outbox, enqueue_emails
+from crm_services.expenses import add_expense
+
+class TestMailTemplates(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript('''
+            CREATE TABLE contacts (id INTEGER PRIMARY KEY, title TEXT, gender TEXT, name TEXT, email TEXT, phone TEXT,
+                                   address_line TEXT, suburb TEXT, postcode TEXT, state TEXT, country TEXT);
+            CREATE TABLE applications (id INTEGER PRIMARY KEY, contact_id INTEGER, interest TEXT, reason TEXT, skillsets TEXT);
+            CREATE TABLE budgets (id INTEGER PRIMARY KEY, contact_id INTEGER, total_budget DECIMAL(10, 2),
+                                  current_spent DECIMAL(10, 2), status TEXT);
+            CREATE TABLE budget_line_items (id INTEGER PRIMARY KEY, budget_id INTEGER, line_item_name TEXT,
+                                            allocated_amount DECIMAL(10, 2), spent_amount DECIMAL(10, 2));
+            CREATE TABLE expenses (id INTEGER PRIMARY KEY, line_item_id INTEGER, product_id INTEGER,
+                                   amount DECIMAL(10, 2), quantity DECIMAL(10, 2), date_incurred DATE,
+                                   description TEXT, status TEXT);
+            INSERT INTO contacts (id, name, email, state) VALUES
+                (1, 'Ada Lovelace', 'ada@example.com', 'NSW'),
+                (2, 'Alan', 'alan@example.com', 'VIC');
+            INSERT INTO applications (contact_id, interest) VALUES (1, 'Analyst'), (1, 'Engineer');
+            INSERT INTO budgets (contact_id, total_budget, current_spent, status) VALUES
+                (1, 1000, 0, 'Active'), (1, 500, 0, 'Closed');
+            INSERT INTO budget_line_items (id, budget_id, line_item_name, allocated_amount) VALUES
+                (1, 1, 'Travel', 600), (2, 1, 'Meals', 400), (3, 2, 'Venue', 500);
+            INSERT INTO expenses (line_item_id, amount, quantity) VALUES (1, 100, 2), (2, 50, 1);
+        ''')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_compile_template(self):
+        """Templates compile to one positional format string, once per source"""
+        compiled = compile_template('Hi {first_name}, {{literal}} {budget_total:,.2f} {first_name}')
+        self.assertEqual(compiled.fields, ('first_name', 'budget_total'))
+        self.assertEqual(compiled.format_string, 'Hi {0}, {{literal}} {1:,.2f} {0}')
+        self.assertEqual(compiled.render(('Ada', 1500)), 'Hi Ada, {literal} 1,500.00 Ada')
+        self.assertIs(compile_template('Hi {first_name}'), compile_template('Hi {first_name}'))
+        with self.assertRaises(ValueError):
+            compile_template('Hi {unknown}')
+
+    def test_render_merge_fetches_all_fields(self):
+        """Contact, latest application and budget summary fields render for every contact"""
+        rendered = list(render_merge(self.conn, [
+            'Hi {first_name}',
+            '{interest}: {budget_remaining:,.2f} of {budget_total:,.2f} across {budget_count} ({active_budgets} active)',
+        ]))
+        self.assertEqual(rendered, [
+            (1, 'ada@example.com', ['Hi Ada', 'Engineer: 1,250.00 of 1,500.00 across 2 (1 active)']),
+            (2, 'alan@example.com', ['Hi Alan', ': 0.00 of 0.00 across 0 (0 active)']),
+        ])
+        self.assertEqual([row[0] for row in render_merge(self.conn, ['{name}'], state='VIC')], [2])
+        self.assertEqual([row[0] for row in render_merge(self.conn, ['{name}'], contact_ids=[1])], [1])
+
+    def test_budget_spent_follows_expenses(self):
+        """An expense added through the service layer shows up in the merged spent and remaining amounts"""
+        add_expense(self.conn, line_item_id=3, amount=40, quantity=2.5)
+        rendered = list(render_merge(self.conn, ['{budget_spent:.2f}/{budget_remaining:.2f}'], contact_ids=[1]))
+        self.assertEqual(rendered, [(1, 'ada@example.com', ['350.00/1150.00'])])
+
+    def test_merge_streams_into_outbox(self):
+        """A merge can be streamed straight into the outbox on the same connection"""
+        ensure_outbox(self.conn)
+        emails = ((email, subject, body) for _, email, (subject, body)
+                  in render_merge(self.conn, ['Hello {first_name}', 'Body for {name}']))
+        self.assertEqual(enqueue_emails(self.conn, emails), 2)
+        self.assertEqual(self.conn.execute('SELECT subject FROM email_outbox ORDER BY id').fetchall(),
+                         [('Hello Ada',), ('Hello Alan',)])
+
+    def test_render_throughput(self):
+        """Compiled templates render well over 100k messages per second"""
+        self.assertGreater(benchmark_render('Dear {title} {name}, you have {budget_remaining:,.2f} left.', 20000), 100000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sqlite3
+import os
+import sys
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_metrics
+import performance_panel
+from query_metrics import QueryMetrics, InstrumentedConnection
+
+class TestPerformancePanel(unittest.TestCase):
+    def setUp(self):
+        self.metrics = QueryMetrics()
+        for patcher in (patch.object(query_metrics, 'metrics', self.metrics),
+                        patch.object(query_metrics, 'script_session_id', return_value='session-1')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+        self.conn.execute('CREATE TABLE products (id INTEGER PRIMARY KEY, line_item_id INTEGER, name TEXT)')
+        self.rerun = query_metrics.begin_rerun('budget_line_items')
+        self.rerun.trace_origins = True
+
+    def tearDown(self):
+        self.conn.close()
+
+    def get_line_item_products(self, line_item_id):
+        return self.conn.execute('SELECT * FROM products WHERE line_item_id = ?', (line_item_id,)).fetchall()
+
+    def test_repeated_statements_name_their_caller(self):
+        """A statement run once per item is reported with the function that issued it"""
+        with performance_panel.section('Line item detail'):
+            for line_item_id in range(4):
+                self.get_line_item_products(line_item_id)
+        self.conn.execute('SELECT count(*) FROM products').fetchone()
+
+        self.assertEqual([(s['section'], s['statements']) for s in self.rerun.sections], [('Line item detail', 4)])
+        repeated = performance_panel.repeated_statements(self.rerun, threshold=3)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['sql'], 'SELECT * FROM products WHERE line_item_id = ?')
+        self.assertEqual(repeated[0]['count'], 4)
+        self.assertEqual(len(repeated[0]['origins']), 1)
+        self.assertTrue(repeated[0]['origins'][0].startswith('get_line_item_products (test_performance_panel.py:'))
+        self.assertEqual(performance_panel.repeated_statements(self.rerun, threshold=5), [])
+
+    def test_cache_hit_ratio(self):
+        """Hits and misses are counted per cache and combined into one ratio"""
+        performance_panel.record_cache('decoded signatures', hit=True)
+        performance_panel.record_cache('decoded signatures', hit=False)
+        performance_panel.record_cache_lookup('signature metadata')
+        performance_panel.record_cache_lookup('signature metadata')
+        performance_panel.record_cache_miss('signature metadata')
+        rows, ratio = performance_panel.cache_summary(self.rerun)
+        self.assertEqual(rows, [('decoded signatures', 1, 2), ('signature metadata', 1, 2)])
+        self.assertEqual(ratio, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
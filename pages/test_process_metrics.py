@@ -0,0 +1,73 @@
+import unittest
+import sqlite3
+import os
+import sys
+import http.client
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import process_metrics
+from process_metrics import Registry, Counter, Gauge, Histogram
+from query_metrics import InstrumentedConnection, query_duration
+
+class TestProcessMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_text_format(self):
+        """Counters, gauges and cumulative histogram buckets render in the Prometheus text format"""
+        sends = self.registry.register(Counter, 'crm_sends_total', 'Sends', ['outcome'])
+        sends.labels('sent').inc()
+        sends.labels('sent').inc(2)
+        sends.labels('a "quoted"\nvalue').inc()
+        depth = self.registry.register(Gauge, 'crm_depth', 'Depth')
+        depth.set_function(lambda: 7)
+        latency = self.registry.register(Histogram, 'crm_latency_seconds', 'Latency', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value)
+
+        lines = self.registry.render().splitlines()
+        self.assertIn('# TYPE crm_sends_total counter', lines)
+        self.assertIn('crm_sends_total{outcome="sent"} 3', lines)
+        self.assertIn('crm_sends_total{outcome="a \\"quoted\\"\\nvalue"} 1', lines)
+        self.assertIn('crm_depth 7', lines)
+        self.assertIn('crm_latency_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('crm_latency_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('crm_latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn('crm_latency_seconds_count 4', lines)
+        self.assertIn('crm_latency_seconds_sum 3.65', lines)
+
+        # Declaring again returns the same metric; a different type is refused
+        self.assertIs(self.registry.register(Counter, 'crm_sends_total', 'Sends', ['outcome']), sends)
+        with self.assertRaises(ValueError):
+            self.registry.register(Gauge, 'crm_sends_total', 'Sends', ['outcome'])
+        with self.assertRaises(ValueError):
+            sends.labels()
+
+    def test_queries_and_endpoint(self):
+        """Instrumented statements are observed by operation and served on /metrics"""
+        selects = query_duration.labels('select')
+        before = sum(selects.counts)
+        conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+        conn.execute('SELECT 1').fetchall()
+        conn.close()
+        self.assertEqual(sum(selects.counts), before + 1)
+
+        server = process_metrics.start_metrics_server(0)
+        try:
+            client = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+            client.request('GET', '/metrics')
+            response = client.getresponse()
+            body = response.read().decode('utf-8')
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader('Content-Type').startswith('text/plain; version=0.0.4'))
+        self.assertIn('crm_db_query_duration_seconds_count{operation="select"}', body)
+        self.assertIn('# TYPE crm_process_start_time_seconds gauge', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import sqlite3
+import os
+import sys
+import logging
+import tempfile
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_metrics
+from query_metrics import QueryMetrics, InstrumentedConnection, params_shape
+
+class TestQueryMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = QueryMetrics()
+        patcher = patch.object(query_metrics, 'metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+        self.conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+        self.conn.executemany('INSERT INTO items (name) VALUES (?)', [('a',), ('b',), ('c',)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def stats_for(self, sql):
+        return next(s for s in self.metrics.statement_stats() if s['sql'] == sql)
+
+    def test_statements_are_timed_and_counted(self):
+        """Each statement's executions, rows fetched and errors are aggregated by its text"""
+        for _ in range(2):
+            self.conn.execute('SELECT * FROM items\n   WHERE id > ?', (0,)).fetchall()
+        list(self.conn.execute('SELECT name FROM items'))
+        self.conn.execute('SELECT count(*) FROM items').fetchone()
+        with self.assertRaises(sqlite3.OperationalError):
+            self.conn.execute('SELECT missing FROM items')
+
+        select = self.stats_for('SELECT * FROM items WHERE id > ?')
+        self.assertEqual((select['count'], select['rows']), (2, 6))
+        self.assertEqual(sum(select['histogram'].values()), 2)
+        self.assertEqual(self.stats_for('SELECT name FROM items')['rows'], 3)
+        self.assertEqual(self.stats_for('SELECT count(*) FROM items')['rows'], 1)
+        self.assertEqual(self.stats_for('INSERT INTO items (name) VALUES (?)')['rows'], 3)
+        self.assertEqual(self.stats_for('SELECT missing FROM items')['errors'], 1)
+        self.assertEqual(params_shape({'limit': 1, 'id': 2}), 'named: id, limit')
+        self.assertEqual(params_shape((1, 2)), '2 positional')
+
+    def test_queries_attributed_to_rerun(self):
+        """Statements run during a page rerun are listed under that rerun"""
+        with patch.object(query_metrics, 'script_session_id', return_value='session-1'):
+            first = query_metrics.begin_rerun('budgets')
+            self.conn.execute('SELECT * FROM items').fetchall()
+            second = query_metrics.begin_rerun('budgets')
+            self.conn.execute('SELECT * FROM items WHERE id = ?', (1,)).fetchall()
+            self.conn.execute('SELECT * FROM items WHERE id = ?', (2,)).fetchall()
+            self.assertIs(query_metrics.current_rerun(), second)
+        self.assertEqual([q.sql for q in first.queries], ['SELECT * FROM items'])
+        self.assertEqual(second.query_count, 2)
+        self.assertEqual({q.page for q in second.queries}, {'budgets'})
+        self.assertEqual(self.metrics.reruns(), [first, second])
+        # Outside a Streamlit run nothing is attributed
+        self.assertIsNone(query_metrics.begin_rerun('budgets'))
+
+    def test_idle_sessions_are_retired(self):
+        """Reruns of sessions that went quiet, or beyond the session cap, move to the bounded history"""
+        quiet = self.metrics.begin_rerun('session-quiet', 'budgets')
+        quiet.last_active -= query_metrics.RERUN_IDLE_SECONDS + 1
+        busy = self.metrics.begin_rerun('session-busy', 'budgets')
+        self.assertEqual(list(self.metrics.active_reruns), ['session-busy'])
+        self.assertEqual(self.metrics.reruns(), [quiet, busy])
+
+        with patch.object(query_metrics, 'MAX_ACTIVE_RERUNS', 3):
+            for n in range(5):
+                self.metrics.begin_rerun(f'session-{n}', 'budgets')
+        self.assertEqual(list(self.metrics.active_reruns), ['session-2', 'session-3', 'session-4'])
+        self.assertIn(busy, self.metrics.finished_reruns)
+
+    def test_slow_query_log(self):
+        """Statements over the threshold are written to the slow-query log with their shape"""
+        handle, log_path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        handler = logging.FileHandler(log_path)
+        query_metrics.slow_query_logger.addHandler(handler)
+        try:
+            with patch.object(query_metrics, 'SLOW_QUERY_MS', 0.0):
+                self.conn.execute('SELECT name FROM items WHERE id = ?', (2,)).fetchall()
+        finally:
+            query_metrics.slow_query_logger.removeHandler(handler)
+            handler.close()
+        with open(log_path) as log_file:
+            logged = log_file.read()
+        os.remove(log_path)
+        self.assertIn('rows=1', logged)
+        self.assertIn('params=1 positional', logged)
+        self.assertIn('SELECT name FROM items WHERE id = ?', logged)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+import sqlite3
+import os
+import sys
+import shutil
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replicate_db import (
+    Replicator,
+    open_read_replica,
+    remove_change_capture,
+    replication_status,
+    REPLICA_ENV_VAR
+)
+
+class TestReplication(unittest.TestCase):
+    def setUp(self):
+        """Create a primary with a generated column and a BLOB column"""
+        self.work_dir = tempfile.mkdtemp()
+        self.primary_path = os.path.join(self.work_dir, "crm.db")
+        self.follower_path = os.path.join(self.work_dir, "follower", "crm_follower.db")
+        os.makedirs(os.path.dirname(self.follower_path))
+
+        self.primary = sqlite3.connect(self.primary_path)
+        self.primary.executescript('''
+            CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+            CREATE TABLE budgets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                contact_id INTEGER,
+                total_budget DECIMAL(10, 2),
+                current_spent DECIMAL(10, 2) DEFAULT 0.00,
+                remaining_budget AS (total_budget - current_spent)
+            );
+            CREATE TABLE application_documents (id INTEGER PRIMARY KEY, signature BLOB);
+            INSERT INTO contacts (name) VALUES ('Seeded User');
+        ''')
+        self.primary.commit()
+        self.replicator = Replicator(self.primary_path, self.follower_path, batch_size=2)
+
+    def tearDown(self):
+        self.replicator.close()
+        self.primary.close()
+        os.environ.pop(REPLICA_ENV_VAR, None)
+        shutil.rmtree(self.work_dir)
+
+    def _follower_rows(self, sql):
+        conn = sqlite3.connect(self.follower_path)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def _drain(self):
+        while self.replicator.ship_once():
+            pass
+
+    def test_seed_copies_existing_rows(self):
+        """The follower starts as a copy of the primary"""
+        self.assertEqual(self._follower_rows('SELECT name FROM contacts'), [('Seeded User',)])
+
+    def test_changes_are_applied_in_order(self):
+        """Inserts, updates and deletes reach the follower in commit order"""
+        self.primary.execute("INSERT INTO contacts (name) VALUES ('New User')")
+        self.primary.execute("UPDATE contacts SET name = 'Renamed User' WHERE name = 'Seeded User'")
+        self.primary.execute("INSERT INTO budgets (contact_id, total_budget, current_spent) VALUES (1, 100, 40)")
+        self.primary.execute("INSERT INTO application_documents (id, signature) VALUES (1, ?)", (b'\x89PNG\x00',))
+        self.primary.execute("DELETE FROM contacts WHERE name = 'New User'")
+        self.primary.commit()
+
+        self.assertEqual(self.replicator.lag()['pending_changes'], 5)
+        self._drain()
+
+        self.assertEqual(self._follower_rows('SELECT id, name FROM contacts'), [(1, 'Renamed User')])
+        self.assertEqual(self._follower_rows('SELECT remaining_budget FROM budgets'), [(60,)])
+        self.assertEqual(self._follower_rows('SELECT signature FROM application_documents'), [(b'\x89PNG\x00',)])
+        self.assertEqual(self.replicator.lag()['pending_changes'], 0)
+
+    def test_reals_arrive_exactly(self):
+        """REAL values keep every digit on the way to the follower"""
+        values = [0.1 + 0.2, 1234567.891234567, -2.5e-300]
+        for value in values:
+            self.primary.execute("INSERT INTO budgets (contact_id, total_budget) VALUES (1, ?)", (value,))
+        self.primary.commit()
+        self._drain()
+        self.assertEqual(self._follower_rows('SELECT total_budget FROM budgets ORDER BY id'),
+                         [(value,) for value in values])
+
+    def test_uncommitted_changes_are_not_shipped(self):
+        """Only committed transactions are visible to the replicator"""
+        self.primary.execute("INSERT INTO contacts (name) VALUES ('Pending User')")
+        self.assertEqual(self.replicator.ship_once(), 0)
+        self.primary.rollback()
+        self.assertEqual(self._follower_rows('SELECT COUNT(*) FROM contacts'), [(1,)])
+
+    def test_schema_additions_reach_follower(self):
+        """Tables and columns added while replicating arrive with the rows they already hold"""
+        self.primary.execute("INSERT INTO application_documents (id, signature) VALUES (1, x'89')")
+        self.primary.commit()
+        self._drain()
+
+        # Same steps as ensure_signature_store; the UPDATE still fires the old trigger
+        self.primary.executescript('''
+            CREATE TABLE signatures (hash TEXT PRIMARY KEY, image BLOB NOT NULL);
+            INSERT INTO signatures (hash, image) VALUES ('abc', x'00');
+            ALTER TABLE application_documents ADD COLUMN signature_hash TEXT;
+            UPDATE application_documents SET signature_hash = 'abc', signature = NULL WHERE id = 1;
+        ''')
+        self._drain()
+        self.assertEqual(self._follower_rows('SELECT hash, image FROM signatures'), [('abc', b'\x00')])
+        self.assertEqual(self._follower_rows('SELECT signature, signature_hash FROM application_documents'),
+                         [(None, 'abc')])
+
+        # Later changes to the new table and column are captured
+        self.primary.execute("INSERT INTO signatures (hash, image) VALUES ('def', x'01')")
+        self.primary.execute("INSERT INTO application_documents (id, signature_hash) VALUES (2, 'def')")
+        self.primary.commit()
+        self._drain()
+        self.assertEqual(self._follower_rows('SELECT hash FROM signatures ORDER BY hash'), [('abc',), ('def',)])
+        self.assertEqual(self._follower_rows('SELECT signature_hash FROM application_documents ORDER BY id'),
+                         [('abc',), ('def',)])
+
+    def test_status_is_read_only(self):
+        """--status reports lag without installing capture or touching the follower"""
+        self.primary.execute("INSERT INTO contacts (name) VALUES ('Pending User')")
+        self.primary.commit()
+        self.assertEqual(replication_status(self.primary_path, self.follower_path)['pending_changes'], 1)
+        self.replicator.close()
+        remove_change_capture(self.primary)
+        schema = self.primary.execute('PRAGMA schema_version').fetchone()[0]
+        follower_mtime = os.stat(self.follower_path).st_mtime_ns
+
+        status = replication_status(self.primary_path, self.follower_path)
+        self.assertFalse(status['capture'])
+        self.assertIsNone(status['pending_changes'])
+        self.assertEqual(self.primary.execute('PRAGMA schema_version').fetchone()[0], schema)
+        self.assertEqual(self.primary.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0], 0)
+        self.assertEqual(os.stat(self.follower_path).st_mtime_ns, follower_mtime)
+        self.replicator = Replicator(self.primary_path, self.follower_path)
+
+    def test_open_read_replica(self):
+        """Pages read from the follower only when it is configured"""
+        self.assertIsNone(open_read_replica())
+        os.environ[REPLICA_ENV_VAR] = self.follower_path
+        conn = open_read_replica()
+        self.assertEqual(conn.execute('SELECT name FROM contacts').fetchone()['name'], 'Seeded User')
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO contacts (name) VALUES ('Nope')")
+        conn.close()
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        """Given the primary, the replica is only used once it has applied every committed change"""
+        os.environ[REPLICA_ENV_VAR] = self.follower_path
+        conn = open_read_replica(self.primary)
+        self.assertIsNotNone(conn)
+        conn.close()
+
+        self.primary.execute("INSERT INTO contacts (name) VALUES ('Just Written')")
+        self.primary.commit()
+        self.assertIsNone(open_read_replica(self.primary))
+
+        self._drain()
+        conn = open_read_replica(self.primary)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM contacts WHERE name = 'Just Written'").fetchone()[0], 1)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
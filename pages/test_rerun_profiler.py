@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rerun_profiler import RerunCapture
+
+def build_rows(count):
+    return [{'id': i, 'name': f"Contact {i}"} for i in range(count)]
+
+class TestRerunProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir)
+
+    def test_capture_saves_profile_and_snapshot(self):
+        """A capture saves timestamped .prof and .tracemalloc files and summarises both"""
+        was_tracing = tracemalloc.is_tracing()
+        capture = RerunCapture('budgets', self.profile_dir).start()
+        rows = build_rows(5000)
+        result = capture.stop()
+        self.assertEqual(tracemalloc.is_tracing(), was_tracing)
+
+        self.assertTrue(os.path.basename(result['profile_path']).startswith('budgets_'))
+        self.assertGreater(pstats.Stats(result['profile_path']).total_calls, 0)
+        snapshot = tracemalloc.Snapshot.load(result['snapshot_path'])
+        self.assertTrue(snapshot.traces)
+
+        self.assertTrue(any(f['function'].startswith('build_rows (test_rerun_profiler.py:')
+                            for f in result['functions']))
+        self.assertTrue(any('test_rerun_profiler.py' in a['site'] for a in result['allocations']))
+        self.assertEqual(len(rows), 5000)
+
+if __name__ == '__main__':
+    unittest.main()
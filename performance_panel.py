@@ -0,0 +1,217 @@
+"""Opt-in performance panel for the Streamlit pages.
+
+Open any page with ?perf=1 (or set CRM_PERF_PANEL=1 for every session) and
+the sidebar shows, for the run that just finished: total run time, time and
+statements per section() the page marks, the number of SQL statements,
+statements repeated with identical text (the N+1 pattern, e.g. one
+get_line_item_products query per line item) with the function that issued
+them, the hit ratio of the caches the page consulted and the peak Python
+memory allocated. ?perf=0 switches it off again.
+
+?profile=1 profiles one run with cProfile and tracemalloc (see
+rerun_profiler): the .prof and allocation snapshot are saved and the top
+functions and allocation sites are shown at the bottom of the page. Set
+CRM_PROFILE_RERUNS=1 to profile every run.
+
+Pages call start_page() at the top of the script and render() at the end.
+A fragment rerun adds its statements and sections to the full run it came
+from; the sidebar is only redrawn by a full run.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import streamlit as st
+
+import logging_config
+import process_metrics
+import query_metrics
+from rerun_profiler import RerunCapture
+
+PERF_PANEL_DEFAULT = os.environ.get('CRM_PERF_PANEL', '0') == '1'
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('CRM_N_PLUS_ONE_THRESHOLD', '3'))
+PROFILE_EVERY_RUN = os.environ.get('CRM_PROFILE_RERUNS', '0') == '1'
+SESSION_KEY = 'perf_panel'
+CAPTURE_KEY = 'perf_capture'
+
+page_run_duration = process_metrics.histogram('crm_page_run_duration_seconds',
+                                              'Time from start_page() to render() of a page run', ['page'])
+cache_lookups = process_metrics.counter('crm_cache_lookups_total', 'Lookups in the named cache', ['cache'])
+cache_misses = process_metrics.counter('crm_cache_misses_total', 'Lookups that missed the named cache', ['cache'])
+
+# Whether this module turned tracemalloc on, so it only ever stops its own tracing
+_tracing_started = False
+
+# Function to tell whether the panel is on for this session; ?perf=1 / ?perf=0 switch it
+def panel_enabled():
+    flag = st.query_params.get('perf')
+    if flag in ('0', '1'):
+        st.session_state[SESSION_KEY] = flag == '1'
+    return st.session_state.get(SESSION_KEY, PERF_PANEL_DEFAULT)
+
+# Function to tell whether this run should be profiled; ?profile=1 applies to one run only
+def profile_requested():
+    if st.query_params.get('profile') == '1':
+        # Drop the parameter so the next interaction is not profiled too
+        del st.query_params['profile']
+        return True
+    return PROFILE_EVERY_RUN
+
+# Function to start timing a run of the current page
+def start_page(page=None):
+    """Call at the top of a page script in place of query_metrics.begin_rerun()"""
+    global _tracing_started
+    logging_config.configure_logging()
+    process_metrics.start_metrics_server_from_env()
+    if sys._getframe(1).f_globals.get('__name__') != '__main__':
+        # A page imported by another module (batch_documents imports document_generator)
+        # is not a new run; keep counting against the page that imported it
+        return query_metrics.current_rerun()
+    rerun = query_metrics.begin_rerun(page)
+    if rerun is None:
+        return None
+    # Tag everything logged on this script thread with the run it belongs to
+    logging_config.bind_context(session_id=rerun.session_id, rerun_id=rerun.rerun_id, page=rerun.page)
+    if panel_enabled():
+        rerun.trace_origins = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        tracemalloc.reset_peak()
+        rerun.traced_memory_start = tracemalloc.get_traced_memory()[0]
+    elif _tracing_started and st.session_state.get(SESSION_KEY) is False:
+        # Tracing slows every allocation, so stop once the panel is switched off
+        tracemalloc.stop()
+        _tracing_started = False
+
+    # A run cut short by st.rerun() or st.stop() never reached render()
+    previous = st.session_state.pop(CAPTURE_KEY, None)
+    if isinstance(previous, RerunCapture):
+        previous.abandon()
+    if profile_requested():
+        try:
+            st.session_state[CAPTURE_KEY] = RerunCapture(rerun.page).start()
+        except ValueError as e:
+            st.session_state[CAPTURE_KEY] = f"Profiling skipped: {e}"
+    return rerun
+
+# Function to time a part of the page and count the statements it issued
+@contextmanager
+def section(name):
+    rerun = query_metrics.current_rerun()
+    started = time.perf_counter()
+    queries = rerun.query_count if rerun is not None else 0
+    try:
+        yield
+    finally:
+        if rerun is not None:
+            rerun.sections.append({
+                'section': name,
+                'ms': (time.perf_counter() - started) * 1000,
+                'statements': rerun.query_count - queries,
+            })
+
+# Function to count a lookup in a named cache; pair with record_cache_miss() when the miss is seen elsewhere
+def record_cache_lookup(name):
+    cache_lookups.labels(name).inc()
+    rerun = query_metrics.current_rerun()
+    if rerun is not None:
+        rerun.cache_lookups.setdefault(name, [0, 0])[0] += 1
+
+# Function to count a miss in a named cache, e.g. from inside a st.cache_data function body
+def record_cache_miss(name):
+    cache_misses.labels(name).inc()
+    rerun = query_metrics.current_rerun()
+    if rerun is not None:
+        rerun.cache_lookups.setdefault(name, [0, 0])[1] += 1
+
+# Function to count a lookup whose outcome is known at the call site
+def record_cache(name, hit):
+    record_cache_lookup(name)
+    if not hit:
+        record_cache_miss(name)
+
+# Function to find statements run repeatedly with the same text in one rerun
+def repeated_statements(rerun, threshold=None):
+    """Groups of at least threshold executions of one statement, most executions first"""
+    threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+    groups = {}
+    for record in rerun.queries:
+        group = groups.setdefault(record.sql, {'sql': record.sql, 'count': 0, 'total_ms': 0.0, 'origins': []})
+        group['count'] += 1
+        group['total_ms'] += record.duration_ms
+        if record.origin and record.origin not in group['origins']:
+            group['origins'].append(record.origin)
+    repeated = [group for group in groups.values() if group['count'] >= threshold]
+    return sorted(repeated, key=lambda group: group['count'], reverse=True)
+
+# Function to summarise a rerun's cache lookups as (name, hits, lookups) plus the overall hit ratio
+def cache_summary(rerun):
+    rows = [(name, lookups - misses, lookups) for name, (lookups, misses) in sorted(rerun.cache_lookups.items())]
+    lookups = sum(row[2] for row in rows)
+    ratio = sum(row[1] for row in rows) / lookups if lookups else None
+    return rows, ratio
+
+# Function to show a finished capture's top functions and allocation sites below the page
+def render_profile(profile):
+    with st.expander(f"🔬 Profile of this run ({profile['name']})", expanded=True):
+        saved = [path for path in (profile['profile_path'], profile['snapshot_path']) if path]
+        st.caption("Saved " + " and ".join(saved))
+        st.write("Top functions by cumulative time")
+        st.dataframe(
+            [{'function': f['function'], 'calls': f['calls'], 'own ms': round(f['own_ms'], 2),
+              'cumulative ms': round(f['cumulative_ms'], 2)} for f in profile['functions']],
+            hide_index=True, use_container_width=True
+        )
+        st.write("Top allocation sites still held at the end of the run")
+        st.dataframe(
+            [{'site': a['site'], 'KB': round(a['size_kb'], 1), 'blocks': a['blocks']} for a in profile['allocations']],
+            hide_index=True, use_container_width=True
+        )
+
+# Function to finish this run's profile and draw the panel; call at the very end of the page
+def render():
+    rerun = query_metrics.current_rerun()
+    if rerun is None:
+        return
+    page_run_duration.labels(rerun.page).observe(time.perf_counter() - rerun.started)
+    capture = st.session_state.pop(CAPTURE_KEY, None)
+    if isinstance(capture, RerunCapture):
+        render_profile(capture.stop())
+    elif capture is not None:
+        st.warning(capture)
+    if not panel_enabled():
+        return
+    total_ms = (time.perf_counter() - rerun.started) * 1000
+    peak_bytes = None
+    if rerun.traced_memory_start is not None and tracemalloc.is_tracing():
+        peak_bytes = tracemalloc.get_traced_memory()[1] - rerun.traced_memory_start
+    caches, hit_ratio = cache_summary(rerun)
+
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun time", f"{total_ms:,.0f} ms")
+        col2.metric("SQL statements", rerun.query_count, help=f"{rerun.query_ms:,.1f} ms spent in SQLite")
+        col1.metric("Cache hit ratio", f"{hit_ratio:.0%}" if hit_ratio is not None else "–")
+        col2.metric("Peak memory", f"{peak_bytes / 1024 / 1024:,.1f} MB" if peak_bytes is not None else "–",
+                    help="Most Python memory held above the start of this run, across all sessions")
+
+        if rerun.sections:
+            st.caption("Sections")
+            st.dataframe(
+                [{'section': s['section'], 'ms': round(s['ms'], 1), 'statements': s['statements']}
+                 for s in rerun.sections],
+                hide_index=True
+            )
+
+        for group in repeated_statements(rerun):
+            origins = ", ".join(group['origins']) or "unknown caller"
+            st.warning(f"Possible N+1: {group['count']}× `{group['sql'][:120]}` "
+                       f"({group['total_ms']:,.1f} ms) from {origins}")
+
+        if caches:
+            st.caption("Caches")
+            st.dataframe([{'cache': name, 'hits': hits, 'lookups': lookups} for name, hits, lookups in caches],
+                         hide_index=True)
@@ -0,0 +1,273 @@
+"""Process metrics in the Prometheus text format.
+
+Modules declare counters, gauges and histograms once at import time and
+update them on their hot paths; an update is a dict lookup and a short
+lock, so instrumenting a query or a send costs about a microsecond. Gauges
+that describe state owned elsewhere (pool sizes, queue depth) are given a
+function instead and are only evaluated when scraped.
+
+    python -m crm_services.api --metrics-port 9464
+    CRM_METRICS_PORT=9464 streamlit run homepage.py
+
+serves GET /metrics on 127.0.0.1 for Prometheus to scrape. Each process
+needs its own port; without one nothing is served and updates only
+accumulate in memory.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+METRICS_PORT = os.environ.get('CRM_METRICS_PORT')
+METRICS_HOST = os.environ.get('CRM_METRICS_HOST', '127.0.0.1')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; from a cached SQLite lookup up to a slow backup or SMTP handshake
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger('crm.metrics')
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+class CounterValue:
+    __slots__ = ('lock', 'value')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name):
+        yield name, (), self.value
+
+class GaugeValue:
+    __slots__ = ('lock', 'value', 'function')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Report function() at scrape time instead of a stored value"""
+        self.function = function
+
+    def samples(self, name):
+        yield name, (), self.function() if self.function is not None else self.value
+
+class HistogramValue:
+    __slots__ = ('lock', 'bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)  # First bucket whose upper bound is >= value
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self, name):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip((*self.bounds, float('inf')), counts):
+            cumulative += count
+            yield name + '_bucket', (('le', format_value(float(bound))),), cumulative
+        yield name + '_sum', (), total
+        yield name + '_count', (), cumulative
+
+class Metric:
+    """A named family of values, one per combination of label values"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # Report 0 from the start rather than no sample at all
+
+    def new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *label_values):
+        """The value for these label values (strings); keep it to skip the lookup on a hot path"""
+        value = self.values.get(label_values)
+        if value is None:
+            if len(label_values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {label_values}")
+            with self.lock:
+                value = self.values.setdefault(tuple(map(str, label_values)), self.new_value())
+        return value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            base_labels = tuple(zip(self.labelnames, label_values))
+            try:
+                samples = list(value.samples(self.name))
+            except Exception:  # A gauge function failing must not break the whole scrape
+                continue
+            for sample_name, extra_labels, sample in samples:
+                lines.append(f"{sample_name}{format_labels(base_labels + extra_labels)} {format_value(sample)}")
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def new_value(self):
+        return CounterValue()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def new_value(self):
+        return GaugeValue()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def new_value(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric_class, name, documentation, labelnames=(), **kwargs):
+        """Create a metric, or return the existing one so re-executed page scripts can declare theirs again"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge, name, documentation, labelnames)
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+process_start_time = gauge('crm_process_start_time_seconds', 'Start time of the process since the epoch')
+process_start_time.set(time.time())
+gauge('crm_process_cpu_seconds', 'CPU time used by the process').set_function(time.process_time)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        payload = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would drown out the process's own output
+
+# Function to serve /metrics from a daemon thread; returns the server (port 0 picks a free port)
+def start_metrics_server(port, host=METRICS_HOST, registry=REGISTRY):
+    server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+_server = None
+_server_lock = threading.Lock()
+
+# Function to start the endpoint once per process when CRM_METRICS_PORT is set
+def start_metrics_server_from_env():
+    global _server
+    if _server is not None or not METRICS_PORT:
+        return _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = start_metrics_server(METRICS_PORT)
+                logger.info("Serving metrics on http://%s:%s/metrics", METRICS_HOST, _server.server_port)
+            except OSError as e:
+                # Another process holds the port; don't retry on every page run
+                logger.error("Could not serve metrics on port %s: %s", METRICS_PORT, e)
+                _server = False
+    return _server
@@ -0,0 +1,401 @@
+"""Instrumented SQLite connections.
+
+connect() returns a sqlite3 connection whose cursors time every statement
+(execute plus fetching its rows), count the rows returned and record the
+shape of the parameters (never their values). Per-statement totals and
+latency histograms are kept for the life of the process, statements slower
+than CRM_SLOW_QUERY_MS are appended to the slow-query log, and statements
+issued while a Streamlit page runs are attributed to that page's rerun
+(pages call begin_rerun() at the top of the script). When a rerun asks for
+it, each statement also records the function that issued it. With the
+crm.db logger at DEBUG, one statement in CRM_STATEMENT_LOG_SAMPLE is logged.
+
+Set CRM_QUERY_METRICS=0 to get plain, uninstrumented connections.
+"""
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import process_metrics
+
+QUERY_METRICS_ENABLED = os.environ.get('CRM_QUERY_METRICS', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('CRM_SLOW_QUERY_MS', '250'))
+SLOW_QUERY_LOG = os.environ.get('CRM_SLOW_QUERY_LOG', 'slow_queries.log')
+# Upper bounds (ms) of the latency histogram buckets; slower statements land in a final overflow bucket
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RERUN_HISTORY = 50           # Finished reruns kept for inspection
+MAX_QUERIES_PER_RERUN = 5000  # Statements kept per rerun; later ones are only counted
+RERUN_IDLE_SECONDS = 600     # Reruns with no statements for this long are treated as finished
+MAX_ACTIVE_RERUNS = 200      # Sessions tracked at once; the least recently active are retired first
+STATEMENT_LOG_SAMPLE = int(os.environ.get('CRM_STATEMENT_LOG_SAMPLE', '100'))
+
+slow_query_logger = logging.getLogger('crm.slow_queries')
+statement_logger = logging.getLogger('crm.db')  # Per-statement debug records, e.g. CRM_LOG_LEVELS=crm.db=DEBUG
+
+query_duration = process_metrics.histogram(
+    'crm_db_query_duration_seconds', 'SQLite statement time including fetching its rows', ['operation'],
+    buckets=[bound / 1000 for bound in HISTOGRAM_BUCKETS_MS]
+)
+query_errors = process_metrics.counter('crm_db_query_errors_total', 'SQLite statements that raised', ['operation'])
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Statement text with whitespace collapsed, used as the aggregation key"""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+# Statement keyword -> operation label; anything else is 'other' so the label set stays small
+OPERATIONS = {'select': 'select', 'with': 'select', 'insert': 'insert', 'replace': 'insert',
+              'update': 'update', 'delete': 'delete'}
+
+@lru_cache(maxsize=1024)
+def statement_operation(sql):
+    """'select', 'insert', 'update', 'delete' or 'other' for a normalized statement"""
+    return OPERATIONS.get(sql.split(' ', 1)[0].lower(), 'other')
+
+def params_shape(parameters):
+    """Describe parameters without their values, e.g. '3 positional' or 'named: id, limit'"""
+    if not parameters:
+        return 'none'
+    if isinstance(parameters, dict):
+        return 'named: ' + ', '.join(sorted(parameters))
+    return f"{len(parameters)} positional"
+
+class StatementStats:
+    """Running totals and a latency histogram for one statement text"""
+    __slots__ = ('sql', 'count', 'total_ms', 'max_ms', 'rows', 'errors', 'buckets')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def observe(self, duration_ms, rows, error):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += rows
+        self.errors += error
+        for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given fraction of executions"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BUCKETS_MS[index] if index < len(HISTOGRAM_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def as_dict(self):
+        return {
+            'sql': self.sql, 'count': self.count, 'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0, 'max_ms': self.max_ms,
+            'p50_ms': self.percentile(0.5), 'p95_ms': self.percentile(0.95),
+            'rows': self.rows, 'errors': self.errors,
+            'histogram': dict(zip([*map(str, HISTOGRAM_BUCKETS_MS), 'inf'], self.buckets)),
+        }
+
+class QueryRecord:
+    """One executed statement"""
+    __slots__ = ('sql', 'shape', 'started', 'duration_ms', 'rows', 'error', 'rerun', 'origin')
+
+    def __init__(self, sql, shape, rerun):
+        self.sql = normalize_sql(sql)
+        self.shape = shape
+        self.started = time.time()
+        self.duration_ms = 0.0
+        self.rows = 0
+        self.error = False
+        self.rerun = rerun
+        self.origin = None
+
+    @property
+    def page(self):
+        return self.rerun.page if self.rerun else None
+
+    @property
+    def rerun_id(self):
+        return self.rerun.rerun_id if self.rerun else None
+
+class RerunStats:
+    """Statements issued by one run of a Streamlit page script.
+
+    sections, cache_lookups and traced_memory_start are filled in by
+    performance_panel; set trace_origins to record which function issued
+    each statement.
+    """
+    def __init__(self, rerun_id, session_id, page):
+        self.rerun_id = rerun_id
+        self.session_id = session_id
+        self.page = page
+        self.started = time.perf_counter()
+        self.last_active = self.started
+        self.queries = []
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.sections = []
+        self.cache_lookups = {}
+        self.trace_origins = False
+        self.traced_memory_start = None
+
+    def add(self, record):
+        self.query_count += 1
+        self.query_ms += record.duration_ms
+        self.last_active = time.perf_counter()
+        if len(self.queries) < MAX_QUERIES_PER_RERUN:
+            self.queries.append(record)
+
+class QueryMetrics:
+    """Process-wide registry of statement statistics and page reruns"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.active_reruns = {}
+        self.finished_reruns = deque(maxlen=RERUN_HISTORY)
+        self.next_rerun_id = 1
+
+    def begin_rerun(self, session_id, page):
+        with self.lock:
+            previous = self.active_reruns.pop(session_id, None)
+            if previous is not None:
+                self.finished_reruns.append(previous)
+            self._retire_idle_reruns()
+            rerun = RerunStats(self.next_rerun_id, session_id, page)
+            self.next_rerun_id += 1
+            self.active_reruns[session_id] = rerun
+            return rerun
+
+    def _retire_idle_reruns(self):
+        """Move reruns of sessions that have gone quiet into the bounded history.
+
+        Sessions do not tell us when they end, so without this every browser
+        tab ever opened would keep its last rerun (and its statements) alive.
+        Called with the lock held.
+        """
+        cutoff = time.perf_counter() - RERUN_IDLE_SECONDS
+        idle = [sid for sid, rerun in self.active_reruns.items() if rerun.last_active < cutoff]
+        excess = len(self.active_reruns) - len(idle) - (MAX_ACTIVE_RERUNS - 1)
+        if excess > 0:
+            busy = sorted((r for sid, r in self.active_reruns.items() if sid not in idle),
+                          key=lambda r: r.last_active)
+            idle.extend(r.session_id for r in busy[:excess])
+        for rerun in sorted((self.active_reruns.pop(sid) for sid in idle), key=lambda r: r.rerun_id):
+            self.finished_reruns.append(rerun)
+
+    def rerun_for(self, session_id):
+        return self.active_reruns.get(session_id)
+
+    def finish(self, record):
+        with self.lock:
+            stats = self.statements.get(record.sql)
+            if stats is None:
+                stats = self.statements[record.sql] = StatementStats(record.sql)
+            stats.observe(record.duration_ms, record.rows, record.error)
+            if record.rerun is not None:
+                record.rerun.add(record)
+        operation = statement_operation(record.sql)
+        query_duration.labels(operation).observe(record.duration_ms / 1000)
+        if record.error:
+            query_errors.labels(operation).inc()
+        if record.duration_ms >= SLOW_QUERY_MS:
+            log_slow_query(record)
+        if statement_logger.isEnabledFor(logging.DEBUG):
+            statement_logger.debug("Statement", extra={
+                'sql': record.sql, 'ms': round(record.duration_ms, 3), 'rows': record.rows,
+                'params': record.shape, 'error': record.error, 'sample': STATEMENT_LOG_SAMPLE})
+
+    def statement_stats(self):
+        """Per-statement totals, slowest total time first"""
+        with self.lock:
+            stats = [s.as_dict() for s in self.statements.values()]
+        return sorted(stats, key=lambda s: s['total_ms'], reverse=True)
+
+    def reruns(self):
+        """Finished reruns (oldest first) followed by the ones still running"""
+        with self.lock:
+            return [*self.finished_reruns, *self.active_reruns.values()]
+
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.finished_reruns.clear()
+
+metrics = QueryMetrics()
+
+def log_slow_query(record):
+    if not slow_query_logger.handlers:
+        handler = logging.FileHandler(SLOW_QUERY_LOG, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.propagate = False
+    slow_query_logger.warning(
+        "%.1fms rows=%d page=%s rerun=%s params=%s%s %s", record.duration_ms, record.rows, record.page,
+        record.rerun_id, record.shape, " error" if record.error else "", record.sql
+    )
+
+def script_session_id():
+    """Id of the Streamlit session running on this thread, or None outside Streamlit"""
+    if 'streamlit' not in sys.modules:
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+def script_page_name():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    page = ctx.pages_manager.get_pages().get(ctx.page_script_hash, {})
+    return page.get('page_name') or os.path.splitext(os.path.basename(ctx.main_script_path))[0]
+
+# Function to start attributing statements to a new run of the current page
+def begin_rerun(page=None):
+    """Call at the top of a page script; does nothing outside a Streamlit run"""
+    session_id = script_session_id()
+    if session_id is None:
+        return None
+    return metrics.begin_rerun(session_id, page or script_page_name())
+
+# Function to get the stats of the rerun in progress on this thread
+def current_rerun():
+    session_id = script_session_id()
+    return metrics.rerun_for(session_id) if session_id is not None else None
+
+# Function to name the application code that issued a statement, e.g. 'get_line_item_products (budget_line_items.py:64)'
+def query_origin():
+    """First caller outside this module and the service layer"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module != __name__ and module != 'crm_services' and not module.startswith('crm_services.'):
+            code = frame.f_code
+            return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        frame = frame.f_back
+    return None
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement until its rows have been fetched"""
+    _record = None
+    _started = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self._run(sql, params_shape(parameters), super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(sql, 'batch', super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._run(sql_script, 'script', super().executescript, sql_script)
+
+    def _run(self, sql, shape, method, *args):
+        self._finish()
+        rerun = current_rerun()
+        record = QueryRecord(sql, shape, rerun)
+        if rerun is not None and rerun.trace_origins:
+            record.origin = query_origin()
+        start = time.perf_counter()
+        try:
+            method(*args)
+        except sqlite3.Error:
+            record.error = True
+            record.duration_ms = (time.perf_counter() - start) * 1000
+            metrics.finish(record)
+            raise
+        record.duration_ms = (time.perf_counter() - start) * 1000
+        if self.description is None:
+            # Nothing to fetch: count the rows the statement changed
+            record.rows = max(self.rowcount, 0)
+            metrics.finish(record)
+        else:
+            self._record = record
+        return self
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._record is not None:
+                self._record.duration_ms += (time.perf_counter() - start) * 1000
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None:
+            metrics.finish(record)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._record is not None:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._record is not None:
+            self._record.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._record is not None:
+            self._finish()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are instrumented"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+# Function to open a database connection that records its queries
+def connect(database, **kwargs):
+    if QUERY_METRICS_ENABLED:
+        kwargs.setdefault('factory', InstrumentedConnection)
+    return sqlite3.connect(database, **kwargs)
@@ -0,0 +1,408 @@
+import sqlite3
+import json
+import logging
+import os
+import threading
+import time
+import logging_config
+import query_metrics
+
+PRIMARY_DB = 'crm.db'
+REPLICA_ENV_VAR = 'CRM_READ_REPLICA'
+LOG_TABLE = 'replication_log'
+STATE_TABLE = 'replication_state'
+# Bookkeeping that belongs to each database file rather than to the data (see backup_db)
+LOCAL_TABLES = ('backup_change_count',)
+TRIGGER_PREFIX = 'replication_'
+
+logger = logging.getLogger('crm.replication')
+
+# Seconds since the epoch, computed inside SQLite so triggers can timestamp changes
+SQL_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+def replicated_tables(conn):
+    """Return the application tables whose changes are shipped to the follower"""
+    rows = conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT IN (?, ?)
+        ORDER BY name
+    ''', (LOG_TABLE, STATE_TABLE)).fetchall()
+    return [row[0] for row in rows if row[0] not in LOCAL_TABLES]
+
+def table_columns(conn, table):
+    """Return the stored columns of a table (generated columns are recomputed on apply)"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_xinfo("{table}")') if row[6] == 0]
+
+def _json_payload(columns, prefix):
+    # BLOBs cannot be stored in JSON, so they travel hex encoded as {"$blob": "..."}.
+    # json_object() keeps only 15 significant digits of a REAL, so REALs travel as
+    # {"$real": "..."} printed with the 17 digits that round-trip a double exactly
+    fields = ", ".join(
+        f"'{col}', CASE typeof({prefix}.\"{col}\") "
+        f"WHEN 'blob' THEN json_object('$blob', hex({prefix}.\"{col}\")) "
+        f"WHEN 'real' THEN json_object('$real', printf('%!.17g', {prefix}.\"{col}\")) "
+        f"ELSE {prefix}.\"{col}\" END"
+        for col in columns
+    )
+    return f"json_object({fields})"
+
+def install_change_capture(conn):
+    """Create the change log and (re)create capture triggers on every table.
+
+    Every committed INSERT, UPDATE and DELETE appends a row to replication_log
+    in the same transaction, so the log is exactly the ordered sequence of
+    committed changes. Safe to call repeatedly; triggers are rebuilt so new
+    tables and columns are picked up. The rebuild holds the write lock, so no
+    commit slips through while a table's triggers are being replaced.
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+            row_id INTEGER NOT NULL,
+            payload TEXT,
+            captured_at REAL NOT NULL
+        )
+    ''')
+    for table in replicated_tables(conn):
+        columns = table_columns(conn, table)
+        log_insert = f"INSERT INTO {LOG_TABLE} (table_name, op, row_id, payload, captured_at) VALUES"
+        for event in ("insert", "update", "delete"):
+            conn.execute(f'DROP TRIGGER IF EXISTS {TRIGGER_PREFIX}{table}_{event}')
+        conn.execute(f'''
+            CREATE TRIGGER {TRIGGER_PREFIX}{table}_insert AFTER INSERT ON "{table}"
+            BEGIN
+                {log_insert} ('{table}', 'upsert', NEW.rowid, {_json_payload(columns, 'NEW')}, {SQL_NOW});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER {TRIGGER_PREFIX}{table}_update AFTER UPDATE ON "{table}"
+            BEGIN
+                INSERT INTO {LOG_TABLE} (table_name, op, row_id, payload, captured_at)
+                    SELECT '{table}', 'delete', OLD.rowid, NULL, {SQL_NOW} WHERE OLD.rowid IS NOT NEW.rowid;
+                {log_insert} ('{table}', 'upsert', NEW.rowid, {_json_payload(columns, 'NEW')}, {SQL_NOW});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER {TRIGGER_PREFIX}{table}_delete AFTER DELETE ON "{table}"
+            BEGIN
+                {log_insert} ('{table}', 'delete', OLD.rowid, NULL, {SQL_NOW});
+            END
+        ''')
+    conn.commit()
+
+def remove_change_capture(conn):
+    """Drop the capture triggers and change log.
+
+    While capture is installed every write to the primary also appends to
+    replication_log, which only the Replicator trims. When replication is
+    retired, run `python replicate_db.py FOLLOWER --remove-capture` so the log
+    stops growing; the follower then needs --seed before it is used again.
+    """
+    triggers = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+        (TRIGGER_PREFIX + '%',)
+    ).fetchall()
+    for (name,) in triggers:
+        conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    conn.execute(f'DROP TABLE IF EXISTS {LOG_TABLE}')
+    conn.commit()
+
+def seed_follower(primary_path=PRIMARY_DB, follower_path=None):
+    """Create (or recreate) the follower as a consistent copy of the primary.
+
+    Capture is installed first, then the primary is copied with the backup
+    API; the follower starts from the highest log sequence contained in the
+    copy, so no change is applied twice or missed. Added tables and columns
+    are picked up by the Replicator; re-seed after other schema changes or
+    after restoring a backup over the primary.
+    """
+    primary = sqlite3.connect(primary_path)
+    install_change_capture(primary)
+
+    temp_path = follower_path + '.seed'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    follower = sqlite3.connect(temp_path)
+    primary.backup(follower)
+    primary.close()
+
+    # The follower never captures changes of its own
+    last_seq = follower.execute(f'SELECT COALESCE(MAX(seq), 0) FROM {LOG_TABLE}').fetchone()[0]
+    remove_change_capture(follower)
+    follower.execute(f'''
+        CREATE TABLE {STATE_TABLE} (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            last_seq INTEGER NOT NULL,
+            last_captured_at REAL,
+            applied_at REAL
+        )
+    ''')
+    follower.execute(f'INSERT INTO {STATE_TABLE} (id, last_seq, applied_at) VALUES (1, ?, ?)',
+                     (last_seq, time.time()))
+    follower.commit()
+    follower.execute('PRAGMA journal_mode=WAL')  # Readers never block the apply loop
+    follower.close()
+
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(follower_path + suffix):
+            os.remove(follower_path + suffix)
+    os.replace(temp_path, follower_path)
+    logger.info("Seeded follower", extra={'follower': follower_path, 'seq': last_seq})
+    return last_seq
+
+def replication_lag(primary, follower):
+    """Pending change count, age in seconds of the oldest unapplied change and the follower's position"""
+    last_seq = follower.execute(f'SELECT last_seq FROM {STATE_TABLE} WHERE id = 1').fetchone()[0]
+    capture = primary.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LOG_TABLE,))
+    if capture.fetchone() is None:
+        return {'pending_changes': None, 'lag_seconds': None, 'last_applied_seq': last_seq, 'capture': False}
+    pending, oldest = primary.execute(
+        f'SELECT COUNT(*), MIN(captured_at) FROM {LOG_TABLE} WHERE seq > ?', (last_seq,)
+    ).fetchone()
+    return {
+        'pending_changes': pending,
+        'lag_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+        'last_applied_seq': last_seq,
+        'capture': True,
+    }
+
+def replication_status(primary_path=PRIMARY_DB, follower_path=None):
+    """Report lag without writing to either database, e.g. for --status against production"""
+    primary = sqlite3.connect(f'file:{primary_path}?mode=ro', uri=True)
+    follower = sqlite3.connect(f'file:{follower_path}?mode=ro', uri=True)
+    try:
+        return replication_lag(primary, follower)
+    finally:
+        primary.close()
+        follower.close()
+
+def _decode(value):
+    if isinstance(value, dict) and '$blob' in value:
+        return bytes.fromhex(value['$blob'])
+    if isinstance(value, dict) and '$real' in value:
+        return float(value['$real'])
+    return value
+
+class Replicator:
+    """Ships captured changes from the primary to a follower database in order.
+
+    Each batch is read from replication_log, applied to the follower in a
+    single transaction together with the new high-water mark, then trimmed
+    from the primary. Between batches the loop checks PRAGMA data_version,
+    which only changes when another connection commits, so an idle primary
+    costs one pragma per poll.
+    """
+
+    def __init__(self, primary_path=PRIMARY_DB, follower_path=None, batch_size=500, poll_interval=0.5):
+        self.primary_path = primary_path
+        self.follower_path = follower_path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+
+        if not os.path.exists(follower_path):
+            seed_follower(primary_path, follower_path)
+        self.primary = sqlite3.connect(primary_path, check_same_thread=False)
+        self.follower = sqlite3.connect(follower_path, check_same_thread=False)
+        self.schema_version = None
+        self._refresh_schema()
+
+    def _refresh_schema(self):
+        """Capture and copy tables and columns added to the primary since the follower last saw it.
+
+        Migrations such as ensure_signature_store run while the app is up, so
+        this is checked before every batch. Capture is rebuilt first: anything
+        committed after that is in the log, anything before is in the copy.
+        """
+        install_change_capture(self.primary)
+        self.schema_version = self.primary.execute('PRAGMA schema_version').fetchone()[0]
+
+        existing = set(replicated_tables(self.follower))
+        for table in replicated_tables(self.primary):
+            if table not in existing:
+                sql = self.primary.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()[0]
+                self.follower.execute(sql)
+                self._copy_columns(table, table_columns(self.primary, table), insert=True)
+                logger.info("Copied new table to follower", extra={'table': table})
+                continue
+            follower_columns = set(table_columns(self.follower, table))
+            added = []
+            for row in self.primary.execute(f'PRAGMA table_xinfo("{table}")').fetchall():
+                name, declared_type, hidden = row[1], row[2], row[6]
+                if hidden == 0 and name not in follower_columns:
+                    self.follower.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {declared_type}')
+                    added.append(name)
+            if added:
+                self._copy_columns(table, added, insert=False)
+                logger.info("Copied new columns to follower", extra={'table': table, 'columns': added})
+        self.follower.commit()
+
+    def _copy_columns(self, table, columns, insert):
+        """Copy the primary's current values of columns into the follower, matching rows by rowid"""
+        column_list = ", ".join('"%s"' % c for c in columns)
+        if insert:
+            sql = f'INSERT OR REPLACE INTO "{table}" (rowid, {column_list}) VALUES (?{", ?" * len(columns)})'
+        else:
+            assignments = ", ".join('"%s" = ?' % c for c in columns)
+            sql = f'UPDATE "{table}" SET {assignments} WHERE rowid = ?'
+        cursor = self.primary.execute(f'SELECT rowid, {column_list} FROM "{table}"')
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            self.follower.executemany(sql, rows if insert else [(*row[1:], row[0]) for row in rows])
+
+    def last_applied_seq(self):
+        return self.follower.execute(f'SELECT last_seq FROM {STATE_TABLE} WHERE id = 1').fetchone()[0]
+
+    def ship_once(self):
+        """Apply the next batch of changes; returns the number applied"""
+        if self.primary.execute('PRAGMA schema_version').fetchone()[0] != self.schema_version:
+            self._refresh_schema()
+        last_seq = self.last_applied_seq()
+        changes = self.primary.execute(f'''
+            SELECT seq, table_name, op, row_id, payload, captured_at
+            FROM {LOG_TABLE}
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (last_seq, self.batch_size)).fetchall()
+        if not changes:
+            return 0
+
+        with self.follower:
+            for seq, table, op, row_id, payload, captured_at in changes:
+                if op == 'delete':
+                    self.follower.execute(f'DELETE FROM "{table}" WHERE rowid = ?', (row_id,))
+                    continue
+                # Only the captured columns are set: a change logged by a trigger from before a
+                # column was added must not blank the value copied in by _refresh_schema
+                row = json.loads(payload)
+                values = [_decode(value) for value in row.values()]
+                assignments = ", ".join('"%s" = ?' % c for c in row)
+                cursor = self.follower.execute(f'UPDATE "{table}" SET {assignments} WHERE rowid = ?',
+                                               (*values, row_id))
+                if cursor.rowcount == 0:
+                    column_list = ", ".join('"%s"' % c for c in row)
+                    self.follower.execute(
+                        f'INSERT OR REPLACE INTO "{table}" (rowid, {column_list}) VALUES (?{", ?" * len(row)})',
+                        (row_id, *values)
+                    )
+            self.follower.execute(
+                f'UPDATE {STATE_TABLE} SET last_seq = ?, last_captured_at = ?, applied_at = ? WHERE id = 1',
+                (changes[-1][0], changes[-1][5], time.time())
+            )
+
+        # Only trim what the follower has durably applied
+        self.primary.execute(f'DELETE FROM {LOG_TABLE} WHERE seq <= ?', (changes[-1][0],))
+        self.primary.commit()
+        return len(changes)
+
+    def lag(self):
+        """Return pending change count and age in seconds of the oldest unapplied change"""
+        return replication_lag(self.primary, self.follower)
+
+    def run_forever(self, report_every=60):
+        """Ship changes until stop() is called, printing lag periodically"""
+        data_version = None
+        last_report = time.monotonic()
+        while not self._stop.is_set():
+            current = self.primary.execute('PRAGMA data_version').fetchone()[0]
+            if current != data_version:
+                data_version = current
+                while self.ship_once() == self.batch_size:
+                    pass  # Keep draining full batches before sleeping again
+
+            if time.monotonic() - last_report >= report_every:
+                lag = self.lag()
+                logger.info("Replication lag", extra=lag)
+                last_report = time.monotonic()
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.primary.close()
+        self.follower.close()
+
+def log_position(conn):
+    """Sequence number of the last change captured in conn's database, or None if capture is not installed"""
+    capture = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LOG_TABLE,))
+    if capture.fetchone() is None:
+        return None
+    # AUTOINCREMENT keeps the highest seq ever used here, even after the log is trimmed
+    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (LOG_TABLE,)).fetchone()
+    return row[0] if row else 0
+
+def open_read_replica(primary=None):
+    """Open the follower named by CRM_READ_REPLICA read-only, or return None.
+
+    Pages use this for read-only queries so browsing load stays off the
+    primary. Given a connection to the primary, the follower is only returned
+    once it has applied every change committed there so far, so a read that
+    follows a write (the caller's own included) sees it; otherwise results may
+    trail the primary by the replication lag.
+    """
+    replica_path = os.environ.get(REPLICA_ENV_VAR)
+    if not replica_path or not os.path.exists(replica_path):
+        return None
+    try:
+        conn = query_metrics.connect(f'file:{replica_path}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+    except sqlite3.Error as e:
+        # Every page run would repeat this while the replica is down
+        logger.warning("Read replica unavailable, using primary: %s", e, extra={'sample': 100})
+        return None
+    if primary is None:
+        return conn
+    try:
+        position = log_position(primary)
+        applied = conn.execute(f'SELECT last_seq FROM {STATE_TABLE} WHERE id = 1').fetchone()[0]
+    except sqlite3.Error as e:
+        logger.warning("Read replica unavailable, using primary: %s", e, extra={'sample': 100})
+        position = applied = None
+    if position is None or applied is None or applied < position:
+        conn.close()
+        return None
+    return conn
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Database Replication Service')
+    parser.add_argument('follower', help='Path of the follower database (ideally on another disk)')
+    parser.add_argument('--primary', default=PRIMARY_DB, help='Primary database to replicate')
+    parser.add_argument('--seed', action='store_true', help='(Re)create the follower from the primary and exit')
+    parser.add_argument('--status', action='store_true', help='Print replication lag and exit (read-only)')
+    parser.add_argument('--remove-capture', action='store_true',
+                        help='Drop the change log and triggers from the primary when retiring replication')
+    parser.add_argument('--batch-size', type=int, default=500, help='Changes applied per transaction')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds between change checks')
+
+    args = parser.parse_args()
+    logging_config.configure_logging()
+
+    if args.seed:
+        seed_follower(args.primary, args.follower)
+    elif args.status:
+        print(json.dumps(replication_status(args.primary, args.follower), indent=2))
+    elif args.remove_capture:
+        conn = sqlite3.connect(args.primary)
+        remove_change_capture(conn)
+        conn.close()
+        print(f"✓ Removed change capture from {args.primary}; run --seed before using {args.follower} again")
+    else:
+        replicator = Replicator(args.primary, args.follower, args.batch_size, args.poll_interval)
+        logger.info("Replicating %s -> %s", args.primary, args.follower)
+        try:
+            replicator.run_forever()
+        except KeyboardInterrupt:
+            replicator.stop()
+            logger.info("Replication service stopped")
+        replicator.close()
@@ -0,0 +1,113 @@
+"""cProfile and tracemalloc capture of a single page run.
+
+RerunCapture profiles the calling thread (the Streamlit script thread) and
+traces Python allocations from start() until stop(), then saves both under
+CRM_PROFILE_DIR with a timestamped name:
+
+    profiles/budget_line_items_20250101_120000.prof        # snakeviz / pstats
+    profiles/budget_line_items_20250101_120000.tracemalloc  # tracemalloc.Snapshot.load
+
+Pages do not use this module directly; performance_panel starts a capture
+for runs opened with ?profile=1 (or every run with CRM_PROFILE_RERUNS=1).
+"""
+import cProfile
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get('CRM_PROFILE_DIR', 'profiles')
+PROFILE_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+# Allocations made by tracemalloc itself and the import machinery are noise in every snapshot
+IGNORED_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+class RerunCapture:
+    """Profile and allocation trace of one run, saved as <name>_<timestamp>.prof/.tracemalloc"""
+    def __init__(self, name, directory=None):
+        self.name = name
+        self.directory = directory or PROFILE_DIR
+        self.started_at = datetime.now()
+        self.profiler = cProfile.Profile()
+        self.baseline = None
+        self.started_tracing = False
+
+    def start(self):
+        # Another session may already be tracing (e.g. the performance panel); then only count
+        # what this run adds on top of a baseline snapshot
+        if tracemalloc.is_tracing():
+            self.baseline = tracemalloc.take_snapshot().filter_traces(IGNORED_ALLOCATIONS)
+        else:
+            tracemalloc.start()
+            self.started_tracing = True
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process at a time
+            self.abandon()
+            raise
+        return self
+
+    def stop(self):
+        """Stop profiling, save both files and return the summary shown on the page"""
+        self.profiler.disable()
+        # Tracing can have been stopped underneath us by whoever else started it
+        snapshot = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_ALLOCATIONS)
+            if self.started_tracing:
+                tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        base_path = os.path.join(self.directory,
+                                 f"{self.name}_{self.started_at.strftime(PROFILE_TIMESTAMP_FORMAT)}")
+        profile_path = base_path + '.prof'
+        self.profiler.dump_stats(profile_path)
+        snapshot_path = None
+        if snapshot is not None:
+            snapshot_path = base_path + '.tracemalloc'
+            snapshot.dump(snapshot_path)
+
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'profile_path': profile_path,
+            'snapshot_path': snapshot_path,
+            'functions': top_functions(pstats.Stats(self.profiler)),
+            'allocations': top_allocations(snapshot, self.baseline) if snapshot is not None else [],
+        }
+
+    def abandon(self):
+        """Stop without saving, e.g. when the run ended in st.rerun() before stop() was reached"""
+        self.profiler.disable()
+        if self.started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started_tracing = False
+
+# Function to list the functions with the most cumulative time in a profile
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        # Built-ins are recorded against the pseudo-file '~'
+        where = function if filename == '~' else f"{function} ({os.path.basename(filename)}:{line})"
+        rows.append({'function': where, 'calls': calls, 'own_ms': own * 1000, 'cumulative_ms': cumulative * 1000})
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+# Function to list the source lines holding the most memory allocated during the run
+def top_allocations(snapshot, baseline=None, limit=TOP_ALLOCATIONS):
+    if baseline is None:
+        sites = [(stat.traceback[0], stat.size, stat.count) for stat in snapshot.statistics('lineno')]
+    else:
+        sites = [(stat.traceback[0], stat.size_diff, stat.count_diff)
+                 for stat in snapshot.compare_to(baseline, 'lineno') if stat.size_diff > 0]
+        sites.sort(key=lambda site: site[1], reverse=True)
+    return [{'site': f"{frame.filename}:{frame.lineno}", 'size_kb': size / 1024, 'blocks': count}
+            for frame, size, count in sites[:limit]]